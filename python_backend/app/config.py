@@ -17,19 +17,93 @@ class Settings(BaseSettings):
     # Server settings
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"  # Prometheus /metrics
     
     # Firebase config
     FIREBASE_CREDENTIALS: str = os.getenv("FIREBASE_CREDENTIALS", "")
-    
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "firestore")  # "firestore", "memory" or "sqlite"
+    STORAGE_SQLITE_PATH: str = os.getenv("STORAGE_SQLITE_PATH", "slimsense.db")
+    FIRESTORE_MAX_WORKERS: int = int(os.getenv("FIRESTORE_MAX_WORKERS", "32"))
+    EXPORT_PAGE_SIZE: int = int(os.getenv("EXPORT_PAGE_SIZE", "500"))  # documents per query when streaming exports
+    BULK_WRITE_MAX_ENTRIES: int = int(os.getenv("BULK_WRITE_MAX_ENTRIES", "5000"))  # entries per bulk log request
+
     # API keys
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     NUTRITIONIX_APP_ID: str = os.getenv("NUTRITIONIX_APP_ID", "")
     NUTRITIONIX_API_KEY: str = os.getenv("NUTRITIONIX_API_KEY", "")
-    
+
+    # Nutritionix client
+    NUTRITIONIX_BASE_URL: str = os.getenv("NUTRITIONIX_BASE_URL", "https://trackapi.nutritionix.com")
+    NUTRITIONIX_MAX_CONNECTIONS: int = int(os.getenv("NUTRITIONIX_MAX_CONNECTIONS", "100"))
+    NUTRITIONIX_MAX_CONNECTIONS_PER_HOST: int = int(os.getenv("NUTRITIONIX_MAX_CONNECTIONS_PER_HOST", "20"))
+    NUTRITIONIX_DNS_CACHE_TTL: int = int(os.getenv("NUTRITIONIX_DNS_CACHE_TTL", "300"))
+    NUTRITIONIX_KEEPALIVE_SECONDS: float = float(os.getenv("NUTRITIONIX_KEEPALIVE_SECONDS", "60"))
+    NUTRITIONIX_TIMEOUT_SECONDS: float = float(os.getenv("NUTRITIONIX_TIMEOUT_SECONDS", "10"))
+    NUTRITIONIX_BATCH_ITEMS: int = int(os.getenv("NUTRITIONIX_BATCH_ITEMS", "20"))  # foods per natural-language query
+    NUTRITION_BATCH_MAX: int = int(os.getenv("NUTRITION_BATCH_MAX", "50"))  # foods per batch lookup request
+
+    # Caching
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+    NUTRITION_CACHE_MAX_ENTRIES: int = int(os.getenv("NUTRITION_CACHE_MAX_ENTRIES", "10000"))
+    SEARCH_CACHE_TTL_SECONDS: int = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(60 * 60)))  # 1 hour
+    NUTRIENTS_CACHE_TTL_SECONDS: int = int(os.getenv("NUTRIENTS_CACHE_TTL_SECONDS", str(60 * 60 * 24 * 7)))  # 7 days
+    BARCODE_CACHE_TTL_SECONDS: int = int(os.getenv("BARCODE_CACHE_TTL_SECONDS", str(60 * 60 * 24 * 30)))  # 30 days
+    BARCODE_NEGATIVE_TTL_SECONDS: int = int(os.getenv("BARCODE_NEGATIVE_TTL_SECONDS", str(60 * 60 * 24)))  # 1 day
+    BARCODE_BATCH_MAX: int = int(os.getenv("BARCODE_BATCH_MAX", "100"))
+
+    # Local food catalog answering searches before Nutritionix
+    FOOD_CATALOG_ENABLED: bool = os.getenv("FOOD_CATALOG_ENABLED", "True").lower() == "true"
+    FOOD_CATALOG_PATH: str = os.getenv("FOOD_CATALOG_PATH", "")  # JSON lines, also records new Nutritionix results
+    FOOD_CATALOG_MIN_RESULTS: int = int(os.getenv("FOOD_CATALOG_MIN_RESULTS", "3"))  # fewer local matches go upstream
+    # Memory-mapped nutrient store built by scripts/build_nutrient_store.py
+    NUTRIENT_STORE_PATH: str = os.getenv("NUTRIENT_STORE_PATH", "")
+
+    # OpenAI client
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "")  # empty uses the OpenAI API
+    OPENAI_MAX_CONCURRENCY: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+    OPENAI_TIMEOUT_SECONDS: float = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+    FORECAST_LLM_EXPLANATION: bool = os.getenv("FORECAST_LLM_EXPLANATION", "False").lower() == "true"
+    WEIGHT_LOSS_PLAN_LLM_TIPS: bool = os.getenv("WEIGHT_LOSS_PLAN_LLM_TIPS", "False").lower() == "true"
+
+    # AI response caching
+    AI_CACHE_TTL_SECONDS: int = int(os.getenv("AI_CACHE_TTL_SECONDS", str(60 * 60 * 24 * 7)))  # 7 days
+    AI_CACHE_MAX_ENTRIES: int = int(os.getenv("AI_CACHE_MAX_ENTRIES", "5000"))
+    AI_CACHE_CALORIE_STEP: int = int(os.getenv("AI_CACHE_CALORIE_STEP", "50"))
+    AI_CACHE_MINUTES_STEP: int = int(os.getenv("AI_CACHE_MINUTES_STEP", "5"))
+
+    # Background AI jobs
+    AI_JOB_BROKER: str = os.getenv("AI_JOB_BROKER", "memory")  # "memory" or "redis"
+    AI_JOB_WORKERS: int = int(os.getenv("AI_JOB_WORKERS", "4"))  # in-process workers, 0 to disable
+    AI_JOB_RESULT_TTL_SECONDS: int = int(os.getenv("AI_JOB_RESULT_TTL_SECONDS", str(60 * 60 * 24)))  # 1 day
+    AI_JOB_WEBHOOK_TIMEOUT_SECONDS: float = float(os.getenv("AI_JOB_WEBHOOK_TIMEOUT_SECONDS", "10"))
+    # Comma-separated webhook hosts allowed to resolve to private addresses
+    AI_JOB_WEBHOOK_ALLOWED_HOSTS: str = os.getenv("AI_JOB_WEBHOOK_ALLOWED_HOSTS", "")
+    # Redis broker: a job taken by a worker that has not finished within the
+    # lease is requeued when a worker starts, at most AI_JOB_MAX_ATTEMPTS times
+    AI_JOB_LEASE_SECONDS: int = int(os.getenv("AI_JOB_LEASE_SECONDS", "900"))
+    AI_JOB_MAX_ATTEMPTS: int = int(os.getenv("AI_JOB_MAX_ATTEMPTS", "3"))
+
+    # Background account deletion
+    ACCOUNT_DELETION_CONCURRENCY: int = int(os.getenv("ACCOUNT_DELETION_CONCURRENCY", "4"))  # batch commits in flight per job
+    ACCOUNT_DELETION_LEASE_SECONDS: int = int(os.getenv("ACCOUNT_DELETION_LEASE_SECONDS", "120"))
+    ACCOUNT_DELETION_SWEEP_SECONDS: int = int(os.getenv("ACCOUNT_DELETION_SWEEP_SECONDS", "300"))  # 0 to disable resuming
+
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-placeholder")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 1 day
+    # Endpoints that only need the caller's ID trust the signed token's
+    # subject instead of loading the user profile. Tokens of accounts deleted
+    # through another worker then stay valid until they expire.
+    AUTH_TRUST_TOKEN_CLAIMS: bool = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "False").lower() == "true"
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+    # Password hashing: "thread" or "process" pool, and the bcrypt work factor
+    PASSWORD_HASH_POOL: str = os.getenv("PASSWORD_HASH_POOL", "thread")
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
     
     # CORS
     CORS_ORIGINS: list = ["*"]
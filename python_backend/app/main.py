@@ -1,12 +1,18 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
 import firebase_admin
 from firebase_admin import credentials, firestore
+import asyncio
 import os
 from loguru import logger
 
 from .config import settings
 from .routers import ai, nutrition, users, weight
+from . import storage
+from .services import account_deletion, ai_jobs, food_catalog
+from .utils import database, metrics, passwords
+from .utils.http_clients import open_http_clients, close_http_clients
+from .utils.cache import close_redis_client
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -22,8 +28,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Record per-route latency and Firestore usage for /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Initialize Firebase
 try:
     # Check if credentials file exists
@@ -51,6 +62,28 @@ app.include_router(
 )
 
 
+@app.on_event("startup")
+async def startup_event():
+    """Create shared resources before serving requests"""
+    await open_http_clients()
+    if settings.FOOD_CATALOG_ENABLED:
+        await asyncio.to_thread(food_catalog.load_catalog_file)
+    ai_jobs.start_workers()
+    account_deletion.start_runner()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release shared resources when the server stops"""
+    await ai_jobs.stop_workers()
+    await account_deletion.stop_runner()
+    await close_http_clients()
+    await close_redis_client()
+    database.shutdown_executor()
+    storage.close_client()
+    passwords.shutdown_executor()
+
+
 @app.get("/")
 async def root():
     """Root endpoint that returns API information"""
@@ -67,6 +100,13 @@ async def health_check():
     return {"status": "healthy"}
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        """Metrics in the Prometheus text format"""
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -3,3 +3,4 @@ from .user import UserBase, UserCreate, UserUpdate, UserInDB
 from .weight import WeightLog, WeightLogCreate, WeightStats
 from .nutrition import FoodLog, FoodLogCreate, NutritionSummary, MealRecommendation
 from .ai import WeightLossRecommendation, WorkoutRecommendation, PromptTemplate
+from .bulk import BulkItemResult, BulkWriteResult
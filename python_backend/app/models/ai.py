@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
+from datetime import datetime
 
 
 class PromptTemplate(BaseModel):
@@ -53,3 +54,55 @@ class WeightProgressForecast(BaseModel):
     challenges: List[str]
     recommendations: List[str]
     explanation: str
+
+
+class WeightLossPlanJobParams(BaseModel):
+    """Parameters for a queued weight loss plan"""
+    target_weight: float
+    dietary_preferences: Optional[List[str]] = None
+
+
+class MealJobParams(BaseModel):
+    """Parameters for a queued meal recommendation"""
+    calories: int
+    meal_type: str
+    dietary_restrictions: Optional[List[str]] = None
+    available_ingredients: Optional[List[str]] = None
+
+
+class WorkoutJobParams(BaseModel):
+    """Parameters for a queued workout recommendation"""
+    fitness_level: str
+    goal: str
+    available_minutes: int
+    available_equipment: Optional[List[str]] = None
+
+
+class DietAnalysisJobParams(BaseModel):
+    """Parameters for a queued dietary analysis"""
+    food_logs_days: int = 7
+
+
+class WeightForecastJobParams(BaseModel):
+    """Parameters for a queued weight forecast"""
+    target_weight: Optional[float] = None
+
+
+class AIJobCreate(BaseModel):
+    """Request to run an AI generation in the background"""
+    kind: str  # weight-loss-plan, meal, workout, analyze-diet or forecast-weight
+    params: Dict[str, Any] = {}
+    webhook_url: Optional[str] = None  # receives the finished job as a POST
+
+
+class AIJob(BaseModel):
+    """State of a background AI generation"""
+    id: str
+    kind: str
+    status: str  # queued, running, succeeded or failed
+    attempts: int = 0  # times a worker has started the job
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class BulkItemResult(BaseModel):
+    """Outcome of one entry in a bulk write"""
+    index: int
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkWriteResult(BaseModel):
+    """Outcome of a bulk write, with one result per submitted entry in order"""
+    written: int
+    failed: int
+    results: List[BulkItemResult]
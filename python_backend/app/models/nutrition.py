@@ -61,6 +61,7 @@ class NutritionSummary(BaseModel):
     carbs_goal: Optional[int] = None
     fat_goal: Optional[int] = None
     meal_breakdown: Dict[str, List[FoodLog]]
+    meal_totals: Optional[Dict[str, Dict[str, float]]] = None  # count and macros per meal type
     remaining_calories: Optional[int] = None
     nutrient_percentages: Optional[Dict[str, float]] = None
 
@@ -80,6 +81,14 @@ class FoodSearchResult(BaseModel):
     is_custom: bool = False
 
 
+class FoodNutritionQuery(BaseModel):
+    """One food in a batch nutrition lookup"""
+    food_name: str
+    serving_size: float = 1.0
+    serving_unit: str = "serving"
+    brand: Optional[str] = None
+
+
 class FoodNutritionDetails(BaseModel):
     """Detailed nutrition information for a food item"""
     food_name: str
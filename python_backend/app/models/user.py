@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
 
@@ -48,6 +48,7 @@ class UserInDB(UserBase):
     current_weight: float
     target_weight: float
     starting_weight: float
+    target_date: Optional[datetime] = None
     bmi: Optional[float] = None
     bmi_category: Optional[str] = None
     calorie_goal: Optional[int] = None
@@ -60,3 +61,15 @@ class UserInDB(UserBase):
 
     class Config:
         orm_mode = True
+
+
+class AccountDeletionJob(BaseModel):
+    """Progress of a background account deletion"""
+    id: str
+    status: str  # queued, running, succeeded or failed
+    phase: str
+    deleted: Dict[str, int]
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
@@ -34,6 +34,9 @@ class WeightStats(BaseModel):
     total_change: float
     weekly_change: Optional[float] = None
     monthly_change: Optional[float] = None
+    min_weight: Optional[float] = None
+    max_weight: Optional[float] = None
+    trend_kg_per_week: Optional[float] = None  # least-squares trend over all logs
     bmi: Optional[float] = None
     bmi_category: Optional[str] = None
     weight_logs: List[WeightLog] = []
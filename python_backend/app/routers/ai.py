@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, Depends
+from typing import Any, Dict, List, Optional
 from ..models.ai import (
     WeightLossRecommendation,
     WorkoutRecommendation,
     DietaryAnalysis,
-    WeightProgressForecast
+    WeightProgressForecast,
+    AIJob,
+    AIJobCreate
 )
 from ..models.nutrition import MealRecommendation
 from ..models.user import UserInDB
-from ..services.ai_service import AIService
-from ..utils.auth import get_current_user
+from ..services import ai_jobs
+from ..services.ai_service import AIService, load_recent_food_logs, load_recent_weight_logs
+from ..utils.auth import get_current_user, get_current_user_id
 from ..utils.exception_handler import handle_exceptions
+from ..utils.sse import event_stream_response
 
 router = APIRouter()
 ai_service = AIService()
@@ -33,6 +37,24 @@ async def get_weight_loss_recommendation(
     )
     return recommendation
 
+@router.post("/weight-loss-plan/stream")
+@handle_exceptions
+async def stream_weight_loss_recommendation(
+    target_weight: float,
+    dietary_preferences: Optional[List[str]] = None,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """
+    Stream a personalized weight loss plan as server-sent events, one section
+    (e.g. each sample_meal_plan day) at a time
+    """
+    preferences = dietary_preferences or current_user.dietary_preferences or []
+    return await event_stream_response(ai_service.stream_weight_loss_recommendation(
+        user=current_user,
+        target_weight=target_weight,
+        dietary_preferences=preferences
+    ))
+
 @router.post("/meal", response_model=MealRecommendation)
 @handle_exceptions
 async def get_meal_recommendation(
@@ -54,6 +76,26 @@ async def get_meal_recommendation(
     )
     return recommendation
 
+@router.post("/meal/stream")
+@handle_exceptions
+async def stream_meal_recommendation(
+    calories: int,
+    meal_type: str,
+    dietary_restrictions: Optional[List[str]] = None,
+    available_ingredients: Optional[List[str]] = None,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """
+    Stream a meal recommendation as server-sent events
+    """
+    restrictions = dietary_restrictions or current_user.dietary_preferences or []
+    return await event_stream_response(ai_service.stream_meal_recommendation(
+        calories=calories,
+        meal_type=meal_type,
+        dietary_restrictions=restrictions,
+        available_ingredients=available_ingredients
+    ))
+
 @router.post("/workout", response_model=WorkoutRecommendation)
 @handle_exceptions
 async def get_workout_recommendation(
@@ -61,7 +103,7 @@ async def get_workout_recommendation(
     goal: str,
     available_minutes: int,
     available_equipment: Optional[List[str]] = None,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Generate a personalized workout plan based on fitness level, goals, and available equipment
@@ -75,6 +117,26 @@ async def get_workout_recommendation(
     )
     return recommendation
 
+@router.post("/workout/stream")
+@handle_exceptions
+async def stream_workout_recommendation(
+    fitness_level: str,
+    goal: str,
+    available_minutes: int,
+    available_equipment: Optional[List[str]] = None,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Stream a personalized workout plan as server-sent events
+    """
+    equipment = available_equipment or ["none"]
+    return await event_stream_response(ai_service.stream_workout_recommendation(
+        fitness_level=fitness_level,
+        goal=goal,
+        available_minutes=available_minutes,
+        available_equipment=equipment
+    ))
+
 @router.post("/analyze-diet", response_model=DietaryAnalysis)
 @handle_exceptions
 async def analyze_dietary_habits(
@@ -84,33 +146,28 @@ async def analyze_dietary_habits(
     """
     Analyze dietary habits based on recent food logs
     """
-    from ..services.nutrition_service import NutritionService
-    from datetime import datetime, timedelta
-    
-    nutrition_service = NutritionService()
-    
-    # Get recent food logs
-    food_logs = []
-    for day_offset in range(food_logs_days):
-        log_date = datetime.utcnow() - timedelta(days=day_offset)
-        day_logs = await nutrition_service.get_food_logs_by_date(
-            user_id=current_user.id,
-            date=log_date
-        )
-        food_logs.extend([log.dict() for log in day_logs])
-    
-    if not food_logs:
-        raise HTTPException(
-            status_code=404,
-            detail=f"No food logs found in the last {food_logs_days} days"
-        )
-        
+    food_logs = await load_recent_food_logs(current_user.id, food_logs_days)
     analysis = await ai_service.analyze_dietary_habits(
         food_logs=food_logs,
         user=current_user
     )
     return analysis
 
+@router.post("/analyze-diet/stream")
+@handle_exceptions
+async def stream_dietary_analysis(
+    food_logs_days: int = 7,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """
+    Stream an analysis of recent dietary habits as server-sent events
+    """
+    food_logs = await load_recent_food_logs(current_user.id, food_logs_days)
+    return await event_stream_response(ai_service.stream_dietary_analysis(
+        food_logs=food_logs,
+        user=current_user
+    ))
+
 @router.post("/forecast-weight", response_model=WeightProgressForecast)
 @handle_exceptions
 async def forecast_weight_progress(
@@ -120,30 +177,75 @@ async def forecast_weight_progress(
     """
     Generate a forecast of weight progress based on current trends
     """
-    from ..services.weight_service import WeightService
-    from datetime import datetime, timedelta
+    weight_logs = await load_recent_weight_logs(current_user.id)
     
-    weight_service = WeightService()
-    
-    # Get recent weight logs
-    weight_logs = await weight_service.get_weight_logs(
-        user_id=current_user.id,
-        start_date=datetime.utcnow() - timedelta(days=90),  # Last 90 days
-        end_date=datetime.utcnow()
-    )
-    
-    if not weight_logs:
-        raise HTTPException(
-            status_code=404,
-            detail="No weight logs found to generate forecast"
-        )
-        
     # Use specified target weight or default to user's target
     target = target_weight or current_user.target_weight
     
     forecast = await ai_service.forecast_weight_progress(
         user=current_user,
-        weight_logs=[log.dict() for log in weight_logs],
+        weight_logs=weight_logs,
         target_weight=target
     )
     return forecast
+
+@router.post("/forecast-weight/stream")
+@handle_exceptions
+async def stream_weight_forecast(
+    target_weight: Optional[float] = None,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """
+    Stream a weight progress forecast as server-sent events
+    """
+    weight_logs = await load_recent_weight_logs(current_user.id)
+    return await event_stream_response(ai_service.stream_weight_forecast(
+        user=current_user,
+        weight_logs=weight_logs,
+        target_weight=target_weight or current_user.target_weight
+    ))
+
+@router.get("/cache/stats", response_model=Dict[str, Dict[str, Any]])
+@handle_exceptions
+async def get_cache_stats(
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Get hit/miss counters for the meal and workout recommendation caches
+    """
+    return ai_service.get_cache_stats()
+
+@router.post("/jobs", response_model=AIJob, status_code=202)
+@handle_exceptions
+async def submit_job(
+    job: AIJobCreate,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Queue an AI generation and return its job immediately
+    
+    Poll GET /jobs/{job_id} for the result, or pass a webhook_url to have
+    the finished job POSTed to it.
+    """
+    return await ai_jobs.submit_job(current_user_id, job)
+
+@router.get("/jobs/stats", response_model=Dict[str, Any])
+@handle_exceptions
+async def get_job_stats(
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Get AI job queue depth, outcome counters and wait/run times
+    """
+    return await ai_jobs.get_job_stats()
+
+@router.get("/jobs/{job_id}", response_model=AIJob)
+@handle_exceptions
+async def get_job(
+    job_id: str,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Get the status, and once finished the result, of an AI job
+    """
+    return await ai_jobs.get_job(current_user_id, job_id)
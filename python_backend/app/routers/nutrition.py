@@ -1,17 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta
 from ..models.nutrition import (
     FoodLog,
     FoodLogCreate,
     NutritionSummary,
     FoodSearchResult,
-    FoodNutritionDetails
+    FoodNutritionDetails,
+    FoodNutritionQuery
 )
+from ..models.bulk import BulkWriteResult
 from ..models.user import UserInDB
 from ..services.nutrition_service import NutritionService
-from ..utils.auth import get_current_user
+from ..utils.auth import get_current_user, get_current_user_id
 from ..utils.exception_handler import handle_exceptions
+from ..utils.ndjson import ndjson_response
 
 router = APIRouter()
 nutrition_service = NutritionService()
@@ -21,7 +24,7 @@ nutrition_service = NutritionService()
 async def search_food(
     query: str,
     limit: int = Query(10, ge=1, le=50),
-    current_user: UserInDB = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Search for food items by name
@@ -36,7 +39,7 @@ async def get_food_nutrition(
     serving_size: float = 1.0,
     serving_unit: str = "serving",
     brand: Optional[str] = None,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Get detailed nutrition information for a food item
@@ -49,11 +52,23 @@ async def get_food_nutrition(
     )
     return details
 
+@router.post("/nutrition/batch", response_model=List[Optional[FoodNutritionDetails]])
+@handle_exceptions
+async def get_food_nutrition_batch(
+    items: List[FoodNutritionQuery],
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Get detailed nutrition information for several foods, returned in order;
+    foods that cannot be looked up map to null
+    """
+    return await nutrition_service.get_food_nutrition_batch(items=items)
+
 @router.get("/barcode/{barcode}", response_model=FoodNutritionDetails)
 @handle_exceptions
 async def lookup_barcode(
     barcode: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Look up food information by barcode
@@ -61,17 +76,38 @@ async def lookup_barcode(
     details = await nutrition_service.lookup_barcode(barcode=barcode)
     return details
 
+@router.post("/barcodes", response_model=Dict[str, Optional[FoodNutritionDetails]])
+@handle_exceptions
+async def lookup_barcodes(
+    barcodes: List[str],
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Look up several barcodes at once; unknown barcodes map to null
+    """
+    return await nutrition_service.lookup_barcodes(barcodes=barcodes)
+
+@router.get("/cache/stats", response_model=Dict[str, Dict[str, Any]])
+@handle_exceptions
+async def get_cache_stats(
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Get hit/miss counters for the food search, nutrient and barcode caches
+    """
+    return nutrition_service.get_cache_stats()
+
 @router.post("/log", response_model=str)
 @handle_exceptions
 async def add_food_log(
     food_log: FoodLogCreate,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Add a new food log entry
     """
     # Ensure the user ID matches
-    if food_log.user_id != current_user.id:
+    if food_log.user_id != current_user_id:
         raise HTTPException(
             status_code=403,
             detail="Cannot add food log for another user"
@@ -80,11 +116,64 @@ async def add_food_log(
     log_id = await nutrition_service.add_food_log(food_log=food_log)
     return log_id
 
+@router.post("/logs/bulk", response_model=BulkWriteResult)
+@handle_exceptions
+async def add_food_logs(
+    entries: List[Dict[str, Any]],
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Add many food log entries at once, returning an ID or error per entry
+    """
+    return await nutrition_service.add_food_logs(user_id=current_user_id, entries=entries)
+
+@router.get("/logs", response_model=List[FoodLog])
+@handle_exceptions
+async def get_food_logs(
+    response: Response,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Get food logs for a user within a date range (YYYY-MM-DD, inclusive), newest first
+    
+    When more logs exist, the X-Next-Cursor header holds a cursor to pass
+    back for the next page.
+    """
+    start, end = _parse_range(start_date, end_date)
+    logs, next_cursor = await nutrition_service.get_food_logs_page(
+        user_id=current_user_id,
+        start_date=start,
+        end_date=end,
+        limit=limit,
+        cursor=cursor
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return logs
+
+@router.get("/logs/export")
+@handle_exceptions
+async def export_food_logs(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Stream all food logs in a date range (YYYY-MM-DD, inclusive) as NDJSON, oldest first
+    """
+    start, end = _parse_range(start_date, end_date)
+    logs = nutrition_service.iter_food_logs(user_id=current_user_id, start_date=start, end_date=end)
+    return await ndjson_response(logs, filename="food_logs.ndjson")
+
 @router.get("/logs/{date}", response_model=List[FoodLog])
 @handle_exceptions
 async def get_food_logs_by_date(
     date: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Get all food logs for a user on a specific date (format: YYYY-MM-DD)
@@ -98,7 +187,7 @@ async def get_food_logs_by_date(
         )
         
     logs = await nutrition_service.get_food_logs_by_date(
-        user_id=current_user.id,
+        user_id=current_user_id,
         date=log_date
     )
     return logs
@@ -108,14 +197,14 @@ async def get_food_logs_by_date(
 async def update_food_log(
     log_id: str,
     update_data: dict,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Update an existing food log
     """
     success = await nutrition_service.update_food_log(
         food_log_id=log_id,
-        user_id=current_user.id,
+        user_id=current_user_id,
         update_data=update_data
     )
     return success
@@ -124,26 +213,38 @@ async def update_food_log(
 @handle_exceptions
 async def delete_food_log(
     log_id: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Delete a food log
     """
     success = await nutrition_service.delete_food_log(
         food_log_id=log_id,
-        user_id=current_user.id
+        user_id=current_user_id
     )
     return success
 
 @router.get("/favorites", response_model=List[FoodLog])
 @handle_exceptions
 async def get_favorite_foods(
-    current_user: UserInDB = Depends(get_current_user)
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
-    Get all favorite food logs for a user
+    Get favorite food logs for a user, ordered by food name
+    
+    When more favorites exist, the X-Next-Cursor header holds a cursor to
+    pass back for the next page.
     """
-    favorites = await nutrition_service.get_favorite_foods(user_id=current_user.id)
+    favorites, next_cursor = await nutrition_service.get_favorite_foods(
+        user_id=current_user_id,
+        limit=limit,
+        cursor=cursor
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return favorites
 
 @router.get("/summary/{date}", response_model=NutritionSummary)
@@ -165,6 +266,19 @@ async def get_daily_nutrition_summary(
         
     summary = await nutrition_service.get_daily_nutrition_summary(
         user_id=current_user.id,
-        date=summary_date
+        date=summary_date,
+        user=current_user
     )
     return summary
+
+def _parse_range(start_date: Optional[str], end_date: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Parse optional YYYY-MM-DD bounds into [start, end) datetimes"""
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+        end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) if end_date else None
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid date format. Use YYYY-MM-DD"
+        )
+    return start, end
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
 from typing import Dict, Any
-from ..models.user import UserCreate, UserUpdate, UserInDB
+from ..models.user import UserCreate, UserUpdate, UserInDB, AccountDeletionJob
+from ..services import account_deletion
 from ..services.user_service import UserService
-from ..utils.auth import get_current_user, create_access_token
+from ..utils.auth import get_current_user, get_current_user_id, create_access_token
 from ..utils.exception_handler import handle_exceptions
 from ..config import settings
 
@@ -54,25 +55,38 @@ async def get_current_user_info(current_user: UserInDB = Depends(get_current_use
 @handle_exceptions
 async def update_current_user(
     update_data: UserUpdate,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Update information for the current logged-in user
     """
     updated_user = await user_service.update_user(
-        user_id=current_user.id,
+        user_id=current_user_id,
         user_update=update_data
     )
     return updated_user
 
-@router.delete("/me", response_model=bool)
+@router.delete("/me", response_model=AccountDeletionJob, status_code=202)
 @handle_exceptions
-async def delete_current_user(current_user: UserInDB = Depends(get_current_user)):
+async def delete_current_user(current_user_id: str = Depends(get_current_user_id)):
     """
     Delete the current logged-in user account
+    
+    The account is removed at once and its data is deleted in the
+    background; poll GET /deletions/{job_id} for progress.
+    """
+    return await user_service.delete_user(user_id=current_user_id)
+
+@router.get("/deletions/{job_id}", response_model=AccountDeletionJob)
+@handle_exceptions
+async def get_deletion_job(job_id: str):
+    """
+    Get the progress of an account deletion
+    
+    No token is needed since the account no longer exists; the
+    unguessable job ID returned by DELETE /me is the handle.
     """
-    success = await user_service.delete_user(user_id=current_user.id)
-    return success
+    return await account_deletion.get_runner().get(job_id)
 
 @router.post("/reset-password", response_model=Dict[str, str])
 @handle_exceptions
@@ -85,9 +99,9 @@ async def reset_password(email: str = Body(...)):
 
 @router.get("/nutrition-goals", response_model=Dict[str, Any])
 @handle_exceptions
-async def get_nutrition_goals(current_user: UserInDB = Depends(get_current_user)):
+async def get_nutrition_goals(current_user_id: str = Depends(get_current_user_id)):
     """
     Calculate recommended nutrition goals for the current user
     """
-    goals = await user_service.calculate_nutrition_goals(user_id=current_user.id)
+    goals = await user_service.calculate_nutrition_goals(user_id=current_user_id)
     return goals
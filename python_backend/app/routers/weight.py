@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from ..models.weight import WeightLog, WeightLogCreate, WeightStats
+from ..models.bulk import BulkWriteResult
 from ..models.user import UserInDB
 from ..services.weight_service import WeightService
-from ..utils.auth import get_current_user
+from ..utils.auth import get_current_user, get_current_user_id
 from ..utils.exception_handler import handle_exceptions
+from ..utils.ndjson import ndjson_response
 
 router = APIRouter()
 weight_service = WeightService()
@@ -14,13 +16,13 @@ weight_service = WeightService()
 @handle_exceptions
 async def add_weight_log(
     weight_log: WeightLogCreate,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Add a new weight log entry
     """
     # Ensure the user ID matches
-    if weight_log.user_id != current_user.id:
+    if weight_log.user_id != current_user_id:
         raise HTTPException(
             status_code=403,
             detail="Cannot add weight log for another user"
@@ -29,60 +31,86 @@ async def add_weight_log(
     log_id = await weight_service.add_weight_log(weight_log=weight_log)
     return log_id
 
+@router.post("/logs/bulk", response_model=BulkWriteResult)
+@handle_exceptions
+async def add_weight_logs(
+    entries: List[Dict[str, Any]],
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Add many weight log entries at once, returning an ID or error per entry
+    """
+    return await weight_service.add_weight_logs(user_id=current_user_id, entries=entries)
+
 @router.get("/logs", response_model=List[WeightLog])
 @handle_exceptions
 async def get_weight_logs(
+    response: Response,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     limit: int = Query(100, ge=1, le=1000),
-    current_user: UserInDB = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Get weight logs for a user within a date range
-    """
-    # Parse dates if provided
-    start_datetime = None
-    end_datetime = None
     
-    if start_date:
-        try:
-            start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid start_date format. Use YYYY-MM-DD"
-            )
-            
-    if end_date:
-        try:
-            end_datetime = datetime.strptime(end_date, "%Y-%m-%d")
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid end_date format. Use YYYY-MM-DD"
-            )
-            
-    logs = await weight_service.get_weight_logs(
-        user_id=current_user.id,
-        start_date=start_datetime,
-        end_date=end_datetime,
-        limit=limit
+    Returns the most recent `limit` logs, oldest first. When older logs
+    exist, the X-Next-Cursor header holds a cursor to pass back for them.
+    """
+    logs, next_cursor = await weight_service.get_weight_logs_page(
+        user_id=current_user_id,
+        start_date=_parse_date(start_date, "start_date"),
+        end_date=_parse_date(end_date, "end_date"),
+        limit=limit,
+        cursor=cursor
     )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return logs
 
+@router.get("/logs/export")
+@handle_exceptions
+async def export_weight_logs(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Stream all weight logs in a date range as NDJSON, oldest first
+    """
+    logs = weight_service.iter_weight_logs(
+        user_id=current_user_id,
+        start_date=_parse_date(start_date, "start_date"),
+        end_date=_parse_date(end_date, "end_date")
+    )
+    return await ndjson_response(logs, filename="weight_logs.ndjson")
+
+def _parse_date(value: Optional[str], name: str) -> Optional[datetime]:
+    """Parse an optional YYYY-MM-DD query parameter"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid {name} format. Use YYYY-MM-DD"
+        )
+
 @router.put("/log/{log_id}", response_model=bool)
 @handle_exceptions
 async def update_weight_log(
     log_id: str,
     update_data: dict,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Update an existing weight log
     """
     success = await weight_service.update_weight_log(
         weight_log_id=log_id,
-        user_id=current_user.id,
+        user_id=current_user_id,
         update_data=update_data
     )
     return success
@@ -91,14 +119,14 @@ async def update_weight_log(
 @handle_exceptions
 async def delete_weight_log(
     log_id: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
     """
     Delete a weight log
     """
     success = await weight_service.delete_weight_log(
         weight_log_id=log_id,
-        user_id=current_user.id
+        user_id=current_user_id
     )
     return success
 
@@ -110,5 +138,5 @@ async def get_weight_stats(
     """
     Get weight statistics for a user
     """
-    stats = await weight_service.get_weight_stats(user_id=current_user.id)
+    stats = await weight_service.get_weight_stats(user_id=current_user.id, user=current_user)
     return stats
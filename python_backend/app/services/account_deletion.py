@@ -0,0 +1,340 @@
+"""
+Background cascade delete of user accounts
+
+DELETE /users/me removes the Firebase Auth user and profile document
+straight away, then returns a job handle. Everything else the user owns
+(weight logs, food logs, daily nutrition rollups, weight statistics) is
+deleted by a background job. The job pages through each collection and
+deletes every page in batched writes, with at most
+ACCOUNT_DELETION_CONCURRENCY batches in flight.
+
+Job state lives in Firestore, so it survives restarts. A running job holds
+a lease that it renews after every page. A sweeper in each API process
+picks up queued jobs and jobs whose lease has expired, e.g. because the
+process running them crashed. Deletes are idempotent and every page is a
+fresh query for whatever is left, so a resumed job simply carries on.
+"""
+from ..config import settings
+from ..utils import database
+from .. import storage
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set
+from firebase_admin import auth
+
+# Collections holding one document per log, tagged with user_id
+USER_COLLECTIONS = ("weight_logs", "food_logs", "daily_nutrition")
+# Collections holding a single document per user, keyed by user ID
+USER_DOCUMENTS = ("weight_stats",)
+# Phases run in order; "account" removes the Auth user and profile document
+PHASES = ("account",) + USER_DOCUMENTS + USER_COLLECTIONS
+
+ACTIVE_STATUSES = ("queued", "running")
+# Runs a job may fail before it is marked failed instead of being retried
+MAX_ATTEMPTS = 5
+
+
+def _collection(db, name: str):
+    return db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_" + name)
+
+
+def _jobs(db):
+    return _collection(db, "account_deletions")
+
+
+def _claim_in_transaction(transaction, job_ref, owner: str, now: datetime) -> Optional[Dict[str, Any]]:
+    """
+    Take the lease on a job unless it is finished or another runner holds it
+
+    Returns:
+        The claimed job, or None if it cannot be claimed
+    """
+    snapshot = job_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+    job = snapshot.to_dict()
+    if job["status"] not in ACTIVE_STATUSES:
+        return None
+    lease = job.get("lease_expires_at")
+    if job.get("owner") not in (None, owner) and lease and lease.replace(tzinfo=None) > now:
+        return None
+    claim = {
+        "status": "running",
+        "owner": owner,
+        "lease_expires_at": now + timedelta(seconds=settings.ACCOUNT_DELETION_LEASE_SECONDS),
+        "attempts": job.get("attempts", 0) + 1,
+        "updated_at": now,
+    }
+    transaction.update(job_ref, claim)
+    job.update(claim)
+    return job
+
+
+class AccountDeletionRunner:
+    """Runs account deletion jobs in this process and resumes abandoned ones"""
+
+    def __init__(self, concurrency: Optional[int] = None):
+        """
+        Initialize the runner with a Firestore connection if available
+
+        Args:
+            concurrency: Batch commits in flight per job (defaults to
+                ACCOUNT_DELETION_CONCURRENCY)
+        """
+        self.db = storage.get_client()
+        self.concurrency = max(1, concurrency or settings.ACCOUNT_DELETION_CONCURRENCY)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: Set[asyncio.Task] = set()
+        self._running: Set[str] = set()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def submit(self, user_id: str) -> Dict[str, Any]:
+        """
+        Create a deletion job for a user, remove the account and queue the rest
+
+        Args:
+            user_id: ID of the user to delete
+
+        Returns:
+            The job record
+        """
+        if not self.db:
+            raise ValueError("Firestore not initialized - cannot delete user")
+
+        now = datetime.utcnow()
+        job = {
+            "id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "status": "queued",
+            "phase": PHASES[0],
+            "deleted": {phase: 0 for phase in PHASES},
+            "owner": None,
+            "lease_expires_at": None,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+            "error": None,
+        }
+        # Record the job before deleting anything so a crash part way is resumed
+        await database.set_document(_jobs(self.db).document(job["id"]), job)
+
+        # The account itself goes before the response so the user is signed out at once
+        job["deleted"]["account"] = await self._delete_account(user_id)
+        job["phase"] = PHASES[1]
+        job["updated_at"] = datetime.utcnow()
+        await database.update_document(
+            _jobs(self.db).document(job["id"]),
+            {"phase": job["phase"], "deleted": job["deleted"], "updated_at": job["updated_at"]}
+        )
+
+        self.schedule(job["id"])
+        return job
+
+    async def get(self, job_id: str) -> Dict[str, Any]:
+        """
+        Get a deletion job
+
+        Raises:
+            FileNotFoundError: If the job does not exist
+        """
+        if not self.db:
+            raise ValueError("Firestore not initialized - cannot retrieve deletion job")
+        snapshot = await database.get_document(_jobs(self.db).document(job_id))
+        if not snapshot.exists:
+            raise FileNotFoundError("Deletion job not found")
+        return snapshot.to_dict()
+
+    def schedule(self, job_id: str) -> None:
+        """Run a job on the current event loop unless this process already is"""
+        if job_id in self._running:
+            return
+        self._running.add(job_id)
+        task = asyncio.create_task(self.run(job_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._running.discard(job_id))
+
+    async def run(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Claim a job and delete what is left of the user's data
+
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            The finished job, or None if another runner holds it or it is
+            already finished
+        """
+        job_ref = _jobs(self.db).document(job_id)
+        job = await database.run_transaction(self.db, _claim_in_transaction, job_ref, self.owner, datetime.utcnow())
+        if job is None:
+            return None
+
+        try:
+            for phase in PHASES[PHASES.index(job["phase"]):]:
+                job["phase"] = phase
+                if phase == "account":
+                    job["deleted"][phase] += await self._delete_account(job["user_id"])
+                    await self._save_progress(job_ref, job)
+                elif phase in USER_DOCUMENTS:
+                    await database.delete_document(_collection(self.db, phase).document(job["user_id"]))
+                    job["deleted"][phase] += 1
+                    await self._save_progress(job_ref, job)
+                else:
+                    await self._delete_collection(job_ref, job, phase)
+            job["status"] = "succeeded"
+            job["error"] = None
+        except asyncio.CancelledError:
+            # Shutting down; the lease runs out and the job is resumed later
+            raise
+        except Exception as e:
+            # Queued jobs are picked up again by the next sweep
+            job["status"] = "queued" if job["attempts"] < MAX_ATTEMPTS else "failed"
+            job["error"] = str(e)
+            logging.error(f"Account deletion job {job_id} failed in phase {job['phase']}: {e}")
+
+        if job["status"] != "queued":
+            job["finished_at"] = datetime.utcnow()
+        job["lease_expires_at"] = None
+        await self._save_progress(job_ref, job, final=True)
+        return job
+
+    async def resume(self) -> int:
+        """
+        Schedule queued jobs and running jobs whose lease has expired
+
+        Returns:
+            Number of jobs scheduled
+        """
+        if not self.db:
+            return 0
+        now = datetime.utcnow()
+        snapshots = await database.stream_query(_jobs(self.db).where("status", "in", list(ACTIVE_STATUSES)))
+        scheduled = 0
+        for snapshot in snapshots:
+            lease = snapshot.to_dict().get("lease_expires_at")
+            if lease is None or lease.replace(tzinfo=None) <= now:
+                self.schedule(snapshot.id)
+                scheduled += 1
+        return scheduled
+
+    def start(self) -> None:
+        """Start sweeping for jobs to resume on the running event loop"""
+        if self.db and settings.ACCOUNT_DELETION_SWEEP_SECONDS > 0 and self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop(self) -> None:
+        """Stop sweeping and cancel running jobs, leaving them to be resumed"""
+        tasks = list(self._tasks)
+        if self._sweeper is not None:
+            tasks.append(self._sweeper)
+            self._sweeper = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _sweep(self) -> None:
+        while True:
+            try:
+                scheduled = await self.resume()
+                if scheduled:
+                    logging.info(f"Resumed {scheduled} account deletion job(s)")
+            except Exception as e:
+                logging.error(f"Failed to look for account deletion jobs: {e}")
+            await asyncio.sleep(settings.ACCOUNT_DELETION_SWEEP_SECONDS)
+
+    async def _delete_account(self, user_id: str) -> int:
+        """Delete the Firebase Auth user and profile document"""
+        try:
+            await database.run_blocking(auth.delete_user, user_id)
+        except Exception as e:
+            logging.warning(f"Could not delete Firebase Auth user: {e}")
+        user_ref = self.db.collection("users").document(user_id)
+        snapshot = await database.get_document(user_ref)
+        if not snapshot.exists:
+            return 0
+        await database.delete_document(user_ref)
+        return 1
+
+    async def _delete_collection(self, job_ref, job: Dict[str, Any], phase: str) -> None:
+        """
+        Delete a user's documents from a collection, one page at a time
+
+        Each page holds up to concurrency * MAX_BATCH_WRITES documents and is
+        deleted with that many batches committed in parallel. Progress is
+        saved (and the lease renewed) after every page.
+        """
+        page_size = database.MAX_BATCH_WRITES * self.concurrency
+        # Only the key is needed, so don't transfer the log contents
+        query = (
+            _collection(self.db, phase)
+            .where("user_id", "==", job["user_id"])
+            .select(["user_id"])
+            .limit(page_size)
+        )
+
+        async def delete_refs(refs) -> None:
+            batch = self.db.batch()
+            for ref in refs:
+                batch.delete(ref)
+            await database.commit_batch(batch)
+
+        while True:
+            refs = [snapshot.reference for snapshot in await database.stream_query(query)]
+            if refs:
+                chunks = [
+                    refs[offset:offset + database.MAX_BATCH_WRITES]
+                    for offset in range(0, len(refs), database.MAX_BATCH_WRITES)
+                ]
+                outcomes = await asyncio.gather(*(delete_refs(chunk) for chunk in chunks), return_exceptions=True)
+                # Count the batches that did commit before surfacing a failure
+                job["deleted"][phase] += sum(
+                    len(chunk) for chunk, outcome in zip(chunks, outcomes) if not isinstance(outcome, BaseException)
+                )
+                errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+                if errors:
+                    raise errors[0]
+                await self._save_progress(job_ref, job)
+            if len(refs) < page_size:
+                return
+
+    async def _save_progress(self, job_ref, job: Dict[str, Any], final: bool = False) -> None:
+        """Persist a job's phase and counts, renewing its lease unless it is finished"""
+        now = datetime.utcnow()
+        job["updated_at"] = now
+        if not final:
+            job["lease_expires_at"] = now + timedelta(seconds=settings.ACCOUNT_DELETION_LEASE_SECONDS)
+        await database.update_document(job_ref, {
+            key: job[key]
+            for key in ("status", "phase", "deleted", "lease_expires_at", "updated_at", "finished_at", "error")
+        })
+
+
+_runner: Optional[AccountDeletionRunner] = None
+
+
+def get_runner() -> AccountDeletionRunner:
+    """Get the process-wide account deletion runner"""
+    global _runner
+    if _runner is None:
+        _runner = AccountDeletionRunner()
+    return _runner
+
+
+def start_runner() -> None:
+    """Start resuming abandoned account deletion jobs in this process"""
+    get_runner().start()
+
+
+async def stop_runner() -> None:
+    """Stop the account deletion runner"""
+    global _runner
+    if _runner is not None:
+        await _runner.stop()
+        _runner = None
@@ -0,0 +1,584 @@
+"""
+Background execution of AI generations
+
+POST /ai/jobs enqueues a job and returns immediately; workers run the
+AIService call and store the result for GET /ai/jobs/{id}, optionally
+POSTing the finished job to a webhook.
+
+Two brokers are supported:
+
+- "memory": an asyncio queue served by workers inside the API process
+- "redis": a Redis list shared by API processes and any number of worker
+  processes (python -m scripts.ai_worker), with job state kept in Redis
+
+Any object with the redis.asyncio methods used here (get, set, delete,
+exists, lpush, rpush, blmove, lrem, lrange, llen) can stand in for Redis,
+e.g. fakeredis in tests.
+"""
+from ..config import settings
+from ..models.ai import (
+    AIJobCreate,
+    WeightLossPlanJobParams,
+    MealJobParams,
+    WorkoutJobParams,
+    DietAnalysisJobParams,
+    WeightForecastJobParams
+)
+from ..utils.cache import get_redis_client
+from ..utils.http_clients import get_webhook_client
+from .ai_service import AIService, load_recent_food_logs, load_recent_weight_logs
+from .user_service import UserService
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import socket
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+JOB_PARAMS = {
+    "weight-loss-plan": WeightLossPlanJobParams,
+    "meal": MealJobParams,
+    "workout": WorkoutJobParams,
+    "analyze-diet": DietAnalysisJobParams,
+    "forecast-weight": WeightForecastJobParams,
+}
+
+# Number of recent jobs whose wait and run times feed the percentiles
+_TIMING_WINDOW = 1000
+
+
+class JobMetrics:
+    """Per-process job counters and wait/run time percentiles"""
+
+    def __init__(self):
+        self.counters = {
+            "enqueued": 0,
+            "started": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "webhook_failures": 0,
+        }
+        self.wait_seconds = deque(maxlen=_TIMING_WINDOW)
+        self.run_seconds = deque(maxlen=_TIMING_WINDOW)
+
+    @staticmethod
+    def _summary(samples: deque) -> Dict[str, float]:
+        if not samples:
+            return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+        return {
+            "p50": ordered[len(ordered) // 2],
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "max": ordered[-1],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus wait and run time summaries in seconds"""
+        return {
+            **self.counters,
+            "wait_seconds": self._summary(self.wait_seconds),
+            "run_seconds": self._summary(self.run_seconds),
+        }
+
+
+metrics = JobMetrics()
+
+
+class InMemoryJobBroker:
+    """Job queue and store living in this process"""
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def _expire(self) -> None:
+        cutoff = time.time() - settings.AI_JOB_RESULT_TTL_SECONDS
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job["created_at"] > cutoff:
+                break
+            self._jobs.popitem(last=False)
+
+    async def enqueue(self, job: Dict[str, Any]) -> None:
+        self._expire()
+        self._jobs[job["id"]] = job
+        await self.queue.put(job["id"])
+
+    async def dequeue(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            job_id = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self._jobs.get(job_id)
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        self._jobs[job["id"]] = job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    async def ack(self, job: Dict[str, Any]) -> None:
+        pass
+
+    async def release(self, job: Dict[str, Any]) -> None:
+        # The queue does not outlive the process, so the job cannot be retried
+        job["status"] = "failed"
+        job["error"] = "Worker stopped before the job finished"
+        job["finished_at"] = time.time()
+        await self.save(job)
+
+    async def requeue_stale(self) -> int:
+        return 0
+
+    async def depth(self) -> int:
+        return self.queue.qsize()
+
+
+def _decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class RedisJobBroker:
+    """
+    Job queue and store in Redis, shared across processes
+
+    Taking a job moves its ID onto a processing list (BLMOVE, Redis 6.2+)
+    and sets a lease on it, so the job is not lost if its worker dies:
+    requeue_stale() puts jobs whose lease has expired back on the queue.
+    """
+
+    def __init__(self, redis_client: Any, prefix: Optional[str] = None):
+        self.redis = redis_client
+        self.prefix = prefix or settings.APP_NAME.lower().replace(" ", "_") + ":ai_jobs"
+        self.queue_key = f"{self.prefix}:queue"
+        self.processing_key = f"{self.prefix}:processing"
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    def _lease_key(self, job_id: str) -> str:
+        return f"{self.prefix}:lease:{job_id}"
+
+    async def enqueue(self, job: Dict[str, Any]) -> None:
+        await self.save(job)
+        await self.redis.lpush(self.queue_key, job["id"])
+
+    async def dequeue(self, timeout: float) -> Optional[Dict[str, Any]]:
+        job_id = await self.redis.blmove(self.queue_key, self.processing_key, max(1, int(timeout)), "RIGHT", "LEFT")
+        if job_id is None:
+            return None
+        job_id = _decode(job_id)
+        await self.redis.set(self._lease_key(job_id), 1, ex=settings.AI_JOB_LEASE_SECONDS)
+        job = await self.get(job_id)
+        if job is None:
+            # The record expired while the job was queued
+            await self.ack({"id": job_id})
+        return job
+
+    async def ack(self, job: Dict[str, Any]) -> None:
+        """Remove a finished job from the processing list"""
+        await self.redis.lrem(self.processing_key, 0, job["id"])
+        await self.redis.delete(self._lease_key(job["id"]))
+
+    async def release(self, job: Dict[str, Any]) -> None:
+        """Hand back a job this worker took but could not finish"""
+        await self._requeue(job, "Worker stopped before the job finished")
+
+    async def requeue_stale(self) -> int:
+        """
+        Requeue jobs taken by workers that stopped without finishing them
+
+        Returns:
+            Number of jobs put back on the queue
+        """
+        requeued = 0
+        for job_id in await self.redis.lrange(self.processing_key, 0, -1):
+            job_id = _decode(job_id)
+            if await self.redis.exists(self._lease_key(job_id)):
+                continue
+            job = await self.get(job_id)
+            if job is None:
+                await self.redis.lrem(self.processing_key, 0, job_id)
+            elif await self._requeue(job, "Worker died before the job finished"):
+                requeued += 1
+        return requeued
+
+    async def _requeue(self, job: Dict[str, Any], reason: str) -> bool:
+        """
+        Move a job from the processing list back to the queue
+
+        Jobs that have already been attempted AI_JOB_MAX_ATTEMPTS times are
+        marked failed instead.
+
+        Returns:
+            True if the job was requeued
+        """
+        # Removing it from the processing list claims it, so two workers
+        # recovering at once do not both requeue it
+        if not await self.redis.lrem(self.processing_key, 0, job["id"]):
+            return False
+        await self.redis.delete(self._lease_key(job["id"]))
+        if job.get("attempts", 0) >= settings.AI_JOB_MAX_ATTEMPTS:
+            job["status"] = "failed"
+            job["error"] = f"{reason} (gave up after {job['attempts']} attempts)"
+            job["finished_at"] = time.time()
+            await self.save(job)
+            return False
+        job["status"] = "queued"
+        job["started_at"] = None
+        await self.save(job)
+        # Pushed on the end jobs are taken from, so it runs next
+        await self.redis.rpush(self.queue_key, job["id"])
+        return True
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        await self.redis.set(
+            self._job_key(job["id"]),
+            json.dumps(job, default=str),
+            ex=settings.AI_JOB_RESULT_TTL_SECONDS,
+        )
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        payload = await self.redis.get(self._job_key(job_id))
+        return json.loads(payload) if payload is not None else None
+
+    async def depth(self) -> int:
+        return await self.redis.llen(self.queue_key)
+
+
+_broker = None
+
+
+def get_job_broker():
+    """
+    Get the process-wide job broker selected by AI_JOB_BROKER
+
+    Falls back to the in-memory broker if Redis is requested but not
+    configured.
+    """
+    global _broker
+    if _broker is None:
+        redis_client = get_redis_client() if settings.AI_JOB_BROKER == "redis" else None
+        if redis_client is not None:
+            _broker = RedisJobBroker(redis_client)
+        else:
+            if settings.AI_JOB_BROKER == "redis":
+                logging.warning("AI_JOB_BROKER is redis but Redis is not available - using in-process queue")
+            _broker = InMemoryJobBroker()
+    return _broker
+
+
+async def submit_job(user_id: str, request: AIJobCreate, broker=None) -> Dict[str, Any]:
+    """
+    Validate and enqueue an AI job
+
+    Args:
+        user_id: ID of the requesting user
+        request: Job kind, parameters and optional webhook
+        broker: Broker to use instead of the shared one
+
+    Returns:
+        The queued job record
+    """
+    params_model = JOB_PARAMS.get(request.kind)
+    if params_model is None:
+        raise ValueError(f"Unknown job kind '{request.kind}', expected one of: {', '.join(JOB_PARAMS)}")
+    params = params_model(**request.params).dict()
+
+    if request.webhook_url:
+        await check_webhook_url(request.webhook_url)
+
+    job = {
+        "id": uuid.uuid4().hex,
+        "kind": request.kind,
+        "user_id": user_id,
+        "params": params,
+        "webhook_url": request.webhook_url,
+        "status": "queued",
+        "attempts": 0,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "result": None,
+        "error": None,
+    }
+    await (broker or get_job_broker()).enqueue(job)
+    metrics.counters["enqueued"] += 1
+    return job
+
+
+async def check_webhook_url(url: str) -> None:
+    """
+    Check that job results may be POSTed to a webhook URL
+
+    The host must resolve to public addresses only, so webhooks cannot reach
+    loopback, private or link-local services such as cloud metadata
+    endpoints. Hosts listed in AI_JOB_WEBHOOK_ALLOWED_HOSTS are exempt. The
+    check runs when a job is submitted and again before each delivery, as
+    the host's DNS records may have changed in between.
+
+    Args:
+        url: Webhook URL
+
+    Raises:
+        ValueError: If the URL is not allowed
+    """
+    parts = urlsplit(url)
+    if parts.scheme != "https" and not (settings.DEBUG and parts.scheme == "http"):
+        raise ValueError("webhook_url must be an https:// URL")
+    host = (parts.hostname or "").lower()
+    if not host:
+        raise ValueError("webhook_url must include a host")
+    allowed_hosts = {name.strip().lower() for name in settings.AI_JOB_WEBHOOK_ALLOWED_HOSTS.split(",") if name.strip()}
+    if host in allowed_hosts:
+        return
+
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(
+            host, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM
+        )
+    except socket.gaierror:
+        raise ValueError(f"webhook_url host {host} cannot be resolved")
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if not address.is_global or address.is_multicast:
+            raise ValueError("webhook_url must resolve to a public address")
+
+
+async def get_job(user_id: str, job_id: str, broker=None) -> Dict[str, Any]:
+    """
+    Get a job owned by a user
+
+    Raises:
+        FileNotFoundError: If the job does not exist, has expired or belongs
+            to another user
+    """
+    job = await (broker or get_job_broker()).get(job_id)
+    if job is None or job["user_id"] != user_id:
+        raise FileNotFoundError("Job not found")
+    return job
+
+
+async def get_job_stats(broker=None) -> Dict[str, Any]:
+    """
+    Get queue depth plus this process's job counters and timings
+
+    Returns:
+        Dictionary of job metrics
+    """
+    return {
+        "queue_depth": await (broker or get_job_broker()).depth(),
+        **metrics.stats(),
+    }
+
+
+async def run_job(ai_service: AIService, job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the AIService call for a job
+
+    Args:
+        ai_service: Service to run the generation with
+        job: Job record
+
+    Returns:
+        The generated model as a JSON-compatible dict
+    """
+    user = await UserService().get_cached_user(job["user_id"])
+    if user is None:
+        raise ValueError("User not found")
+    params = job["params"]
+    kind = job["kind"]
+
+    if kind == "weight-loss-plan":
+        result = await ai_service.get_weight_loss_recommendation(
+            user=user,
+            target_weight=params["target_weight"],
+            dietary_preferences=params["dietary_preferences"] or user.dietary_preferences or []
+        )
+    elif kind == "meal":
+        result = await ai_service.get_meal_recommendation(
+            calories=params["calories"],
+            meal_type=params["meal_type"],
+            dietary_restrictions=params["dietary_restrictions"] or user.dietary_preferences or [],
+            available_ingredients=params["available_ingredients"]
+        )
+    elif kind == "workout":
+        result = await ai_service.get_workout_recommendation(
+            fitness_level=params["fitness_level"],
+            goal=params["goal"],
+            available_minutes=params["available_minutes"],
+            available_equipment=params["available_equipment"] or ["none"]
+        )
+    elif kind == "analyze-diet":
+        result = await ai_service.analyze_dietary_habits(
+            food_logs=await load_recent_food_logs(user.id, params["food_logs_days"]),
+            user=user
+        )
+    elif kind == "forecast-weight":
+        result = await ai_service.forecast_weight_progress(
+            user=user,
+            weight_logs=await load_recent_weight_logs(user.id),
+            target_weight=params["target_weight"] or user.target_weight
+        )
+    else:
+        raise ValueError(f"Unknown job kind '{kind}'")
+
+    return json.loads(result.json())
+
+
+async def deliver_webhook(job: Dict[str, Any]) -> None:
+    """
+    POST a finished job to its webhook
+
+    The body is signed with HMAC-SHA256 using SECRET_KEY, sent in the
+    X-SlimSense-Signature header, so receivers can verify its origin.
+    """
+    body = json.dumps(
+        {key: value for key, value in job.items() if key not in ("user_id", "webhook_url")},
+        default=str,
+    ).encode()
+    signature = hmac.new(settings.SECRET_KEY.encode(), body, hashlib.sha256).hexdigest()
+    try:
+        await check_webhook_url(job["webhook_url"])
+        response = await get_webhook_client().post(
+            job["webhook_url"],
+            content=body,
+            headers={"Content-Type": "application/json", "X-SlimSense-Signature": signature},
+        )
+        response.raise_for_status()
+    except Exception as e:
+        metrics.counters["webhook_failures"] += 1
+        logging.warning(f"Webhook delivery failed for job {job['id']}: {e}")
+
+
+class AIJobWorker:
+    """Pool of asyncio tasks that take jobs from a broker and run them"""
+
+    def __init__(self, broker=None, concurrency: Optional[int] = None, ai_service: Optional[AIService] = None):
+        """
+        Initialize the worker pool
+
+        Args:
+            broker: Broker to consume from (defaults to the shared one)
+            concurrency: Number of jobs run at once (defaults to AI_JOB_WORKERS)
+            ai_service: Service to run generations with
+        """
+        self.broker = broker or get_job_broker()
+        self.concurrency = concurrency or settings.AI_JOB_WORKERS
+        self.ai_service = ai_service or AIService()
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop, first requeueing stale jobs"""
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._requeue_stale())]
+        self._tasks += [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """
+        Stop taking jobs, giving running ones until the AI timeout to finish
+
+        Jobs still running then are cancelled and handed back to the broker,
+        which requeues them (Redis) or marks them failed (in-memory).
+        """
+        self._stopping = True
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(self._tasks, timeout=settings.OPENAI_TIMEOUT_SECONDS)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    async def _requeue_stale(self) -> None:
+        try:
+            requeued = await self.broker.requeue_stale()
+        except Exception as e:
+            logging.error(f"Failed to requeue stale AI jobs: {e}")
+            return
+        if requeued:
+            logging.warning(f"Requeued {requeued} AI jobs left unfinished by stopped workers")
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                job = await self.broker.dequeue(timeout=1.0)
+            except Exception as e:
+                logging.error(f"Failed to take an AI job from the queue: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if job is not None:
+                await self.process(job)
+
+    async def process(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run one job and record its outcome
+
+        Args:
+            job: Queued job record
+
+        Returns:
+            The finished job record
+        """
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        job["attempts"] = job.get("attempts", 0) + 1
+        metrics.counters["started"] += 1
+        metrics.wait_seconds.append(job["started_at"] - job["created_at"])
+        await self.broker.save(job)
+
+        try:
+            job["result"] = await run_job(self.ai_service, job)
+            job["status"] = "succeeded"
+            metrics.counters["succeeded"] += 1
+        except asyncio.CancelledError:
+            await self.broker.release(job)
+            raise
+        except Exception as e:
+            job["error"] = getattr(e, "detail", None) or str(e)
+            job["status"] = "failed"
+            metrics.counters["failed"] += 1
+            logging.error(f"AI job {job['id']} ({job['kind']}) failed: {job['error']}")
+
+        job["finished_at"] = time.time()
+        metrics.run_seconds.append(job["finished_at"] - job["started_at"])
+        await self.broker.save(job)
+        await self.broker.ack(job)
+
+        if job.get("webhook_url"):
+            await deliver_webhook(job)
+        return job
+
+
+_worker: Optional[AIJobWorker] = None
+
+
+def start_workers() -> None:
+    """Start the in-process worker pool unless AI_JOB_WORKERS is 0"""
+    global _worker
+    if settings.AI_JOB_WORKERS > 0 and _worker is None:
+        _worker = AIJobWorker()
+        _worker.start()
+
+
+async def stop_workers() -> None:
+    """Stop the in-process worker pool"""
+    global _worker
+    if _worker is not None:
+        await _worker.stop()
+        _worker = None
@@ -8,15 +8,26 @@ from ..models.ai import (
 )
 from ..models.nutrition import MealRecommendation
 from ..models.user import UserInDB
+from ..utils.cache import TieredCache
 from ..utils.exception_handler import handle_exceptions
+from ..utils.http_clients import get_openai_client, get_openai_slots
+from ..utils.json_stream import JSONSectionParser
+from ..utils import metrics
+from ..utils.singleflight import SingleFlight
+from . import energy, forecasting, meal_planner
 
+import asyncio
+import hashlib
 import json
 import logging
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel, TypeAdapter
 
 # Conditionally import libraries based on API key availability
 try:
-    from openai import OpenAI
     from langchain.prompts import PromptTemplate as LangchainPromptTemplate
     from langchain.chains import LLMChain
     from langchain_openai import ChatOpenAI
@@ -26,6 +37,182 @@ except (ImportError, Exception) as e:
     OPENAI_AVAILABLE = False
 
 
+# Bump when the meal or workout prompts change so old responses are not reused
+PROMPT_VERSION = 1
+
+# Terms that mean "no restriction" / "no equipment" and are dropped from keys
+_EMPTY_TERMS = {"", "none", "no equipment", "bodyweight", "bodyweight only"}
+
+# Process-wide caches of generated recommendations, keyed on normalized inputs.
+# Entries are not served stale: regenerating in the background would cost a
+# completion for every expired key.
+meal_cache = TieredCache(
+    "ai:meal",
+    ttl=settings.AI_CACHE_TTL_SECONDS,
+    stale_ttl=0,
+    max_entries=settings.AI_CACHE_MAX_ENTRIES,
+)
+workout_cache = TieredCache(
+    "ai:workout",
+    ttl=settings.AI_CACHE_TTL_SECONDS,
+    stale_ttl=0,
+    max_entries=settings.AI_CACHE_MAX_ENTRIES,
+)
+
+# Identical prompts in flight at the same time share one completion
+completion_flights = SingleFlight()
+
+
+def _quantize(value: int, step: int) -> int:
+    """Round a value to the nearest multiple of step (never below one step)"""
+    return max(step, int(round(value / step)) * step)
+
+
+def _normalize_terms(terms: Optional[List[str]]) -> List[str]:
+    """Lowercase, deduplicate and sort free-text terms, dropping empty ones"""
+    return sorted({term.strip().lower() for term in terms or []} - _EMPTY_TERMS)
+
+
+def _normalize_meal_request(
+    calories: int,
+    meal_type: str,
+    dietary_restrictions: Optional[List[str]],
+    available_ingredients: Optional[List[str]]
+) -> Dict[str, Any]:
+    """
+    Canonical form of a meal request, used both as the cache key and as the
+    generation input
+
+    The recipe is generated for the quantized calorie target, so one cached
+    response is valid for every request that maps to the same key.
+    """
+    return {
+        "calories": _quantize(calories, settings.AI_CACHE_CALORIE_STEP),
+        "meal_type": meal_type.strip().lower(),
+        "dietary_restrictions": _normalize_terms(dietary_restrictions),
+        "available_ingredients": _normalize_terms(available_ingredients),
+    }
+
+
+def _normalize_workout_request(
+    fitness_level: str,
+    goal: str,
+    available_minutes: int,
+    available_equipment: Optional[List[str]]
+) -> Dict[str, Any]:
+    """Canonical form of a workout request (see _normalize_meal_request)"""
+    return {
+        "fitness_level": fitness_level.strip().lower(),
+        "goal": goal.strip().lower(),
+        "available_minutes": _quantize(available_minutes, settings.AI_CACHE_MINUTES_STEP),
+        "available_equipment": _normalize_terms(available_equipment),
+    }
+
+
+def _cache_key(**inputs: Any) -> str:
+    """Content address for a set of normalized request inputs"""
+    payload = json.dumps({"v": PROMPT_VERSION, **inputs}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _section_adapter(model: Type[BaseModel], field: str, nested: bool) -> Optional[TypeAdapter]:
+    """Validator for a top-level field of a model, or for one item of it"""
+    info = model.model_fields.get(field)
+    if info is None:
+        return None
+    annotation = info.annotation
+    if nested:
+        if get_origin(annotation) is Union:
+            annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+        origin = get_origin(annotation)
+        if origin is list:
+            annotation = get_args(annotation)[0]
+        elif origin is dict:
+            annotation = get_args(annotation)[1]
+        else:
+            return None
+    return TypeAdapter(annotation)
+
+
+def _validate_section(model: Type[BaseModel], path: Tuple[Any, ...], value: Any) -> bool:
+    """Check a streamed section against the type it has in the final model"""
+    adapter = _section_adapter(model, path[0], len(path) > 1)
+    if adapter is None:
+        return False
+    try:
+        adapter.validate_python(value)
+        return True
+    except ValueError:
+        return False
+
+
+async def load_recent_food_logs(user_id: str, days: int) -> List[Dict[str, Any]]:
+    """
+    Load a user's food logs for today and the preceding days as dicts
+    
+    Args:
+        user_id: User ID
+        days: Number of days to cover, including today
+        
+    Returns:
+        Food logs, most recent day first
+        
+    Raises:
+        FileNotFoundError: If there are no logs in the period
+    """
+    from .nutrition_service import NutritionService
+    
+    nutrition_service = NutritionService()
+    
+    # Get recent food logs in one range query, covering today and the
+    # preceding days in full
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    logs_by_day = await nutrition_service.get_food_logs_in_range(
+        user_id=user_id,
+        start_date=today - timedelta(days=days - 1),
+        end_date=today + timedelta(days=1)
+    )
+    
+    # Most recent day first
+    food_logs = []
+    for day in sorted(logs_by_day, reverse=True):
+        food_logs.extend([log.dict() for log in logs_by_day[day]])
+    
+    if not food_logs:
+        raise FileNotFoundError(f"No food logs found in the last {days} days")
+    return food_logs
+
+
+async def load_recent_weight_logs(user_id: str) -> List[Dict[str, Any]]:
+    """
+    Load a user's weight logs from the last 90 days as dicts
+    
+    Args:
+        user_id: User ID
+        
+    Returns:
+        Weight logs in chronological order
+        
+    Raises:
+        FileNotFoundError: If there are no logs in the period
+    """
+    from .weight_service import WeightService
+    
+    weight_service = WeightService()
+    
+    # Get recent weight logs
+    weight_logs = await weight_service.get_weight_logs(
+        user_id=user_id,
+        start_date=datetime.utcnow() - timedelta(days=90),  # Last 90 days
+        end_date=datetime.utcnow()
+    )
+    
+    if not weight_logs:
+        raise FileNotFoundError("No weight logs found to generate forecast")
+    return [log.dict() for log in weight_logs]
+
+
 class AIService:
     """Service for AI-powered recommendations and analysis"""
     
@@ -33,7 +220,7 @@ class AIService:
         """Initialize the AI service with the required clients"""
         # Initialize OpenAI client if API key is available
         if OPENAI_AVAILABLE:
-            self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+            self.openai_client = get_openai_client()
             self.llm = ChatOpenAI(
                 model="gpt-3.5-turbo-1106",
                 temperature=0.7,
@@ -88,110 +275,238 @@ class AIService:
         Returns:
             WeightLossRecommendation object with personalized plan
         """
-        if not OPENAI_AVAILABLE:
-            raise ValueError("OpenAI integration not available - cannot generate weight loss recommendation")
+        # Targets, meals and exercises are planned locally; the model is only
+        # asked to personalise the tips and explanation when enabled
+        plan = meal_planner.build_weight_loss_plan(user, target_weight, dietary_preferences)
+        if not (settings.WEIGHT_LOSS_PLAN_LLM_TIPS and OPENAI_AVAILABLE):
+            return plan
             
-        # Calculate BMI
-        height_m = user.height_cm / 100
-        bmi = user.current_weight / (height_m * height_m)
-        
-        # Determine weight loss rate based on current weight and BMI
-        if bmi > 30:
-            # For obese individuals, 1-2 kg per week can be safe
-            weekly_rate = "1-2 kg"
-        elif bmi > 25:
-            # For overweight individuals
-            weekly_rate = "0.5-1 kg"
-        else:
-            # For those with BMI in normal range
-            weekly_rate = "0.25-0.5 kg"
+        prompt = self._build_weight_loss_prompt(user, target_weight, dietary_preferences, plan)
+        
+        try:
+            response = await self._create_completion(self.weight_loss_system_prompt, prompt)
+            result = json.loads(response.choices[0].message.content)
+            return plan.copy(update={
+                "tips": [str(tip) for tip in result["tips"]],
+                "explanation": str(result["explanation"])
+            })
+        except Exception as e:
+            logging.warning(f"Keeping computed weight loss plan wording: {e}")
+            return plan
+
+    @handle_exceptions
+    async def get_meal_recommendation(
+        self,
+        calories: int,
+        meal_type: str,
+        dietary_restrictions: List[str],
+        available_ingredients: Optional[List[str]] = None,
+    ) -> MealRecommendation:
+        """
+        Generate a meal recommendation based on calorie and nutrition requirements
+        
+        Args:
+            calories: Target calories for the meal
+            meal_type: Type of meal (breakfast, lunch, dinner, snack)
+            dietary_restrictions: List of dietary restrictions
+            available_ingredients: Optional list of ingredients to use
             
-        # Format dietary preferences
-        preferences_text = ", ".join(dietary_preferences) if dietary_preferences else "No specific preferences"
+        Returns:
+            MealRecommendation object with recipe details
+        """
+        if not OPENAI_AVAILABLE:
+            raise ValueError("OpenAI integration not available - cannot generate meal recommendation")
+            
+        request = _normalize_meal_request(calories, meal_type, dietary_restrictions, available_ingredients)
+        result = await meal_cache.get_or_load(
+            _cache_key(**request),
+            lambda: self._generate_meal_recommendation(**request)
+        )
+        return MealRecommendation(**result)
+
+    async def _generate_meal_recommendation(
+        self,
+        calories: int,
+        meal_type: str,
+        dietary_restrictions: List[str],
+        available_ingredients: List[str],
+    ) -> Dict[str, Any]:
+        """Ask the model for a meal recommendation and return it as a dict"""
+        prompt = self._build_meal_prompt(calories, meal_type, dietary_restrictions, available_ingredients)
         
-        # Create the prompt
-        prompt = f"""
-        Create a personalized weight loss plan for:
-        - Current weight: {user.current_weight} kg
-        - Target weight: {target_weight} kg
-        - Gender: {user.gender}
-        - Age: {user.age}
-        - Height: {user.height_cm} cm
-        - BMI: {bmi:.1f}
-        - Activity level: {user.activity_level}
-        - Dietary preferences: {preferences_text}
+        # Get response from OpenAI
+        response = await self._create_completion(self.meal_system_prompt, prompt)
         
-        The plan should help them lose weight at a healthy rate of {weekly_rate} per week.
+        # Parse the response
+        try:
+            result = json.loads(response.choices[0].message.content)
+            return MealRecommendation(**result).dict()
+        except Exception as e:
+            logging.error(f"Error parsing AI response: {e}")
+            raise ValueError(f"Failed to generate a valid meal recommendation: {e}")
+
+    @handle_exceptions
+    async def get_workout_recommendation(
+        self,
+        fitness_level: str,
+        goal: str,
+        available_minutes: int,
+        available_equipment: List[str],
+    ) -> WorkoutRecommendation:
+        """
+        Generate a personalized workout plan
         
-        Format your response as a JSON object with the following structure:
-        {{
-            "daily_calorie_target": number,
-            "macronutrient_breakdown": {{
-                "protein": number,  // percentage
-                "carbs": number,    // percentage
-                "fat": number       // percentage
-            }},
-            "sample_meal_plan": {{
-                "day1": [
-                    {{
-                        "meal_type": "breakfast",
-                        "meal_name": string,
-                        "foods": [string],
-                        "calories": number,
-                        "protein": number,
-                        "carbs": number,
-                        "fat": number
-                    }},
-                    // lunch, dinner, snacks
-                ],
-                // day2, day3
-            }},
-            "recommended_exercises": [
-                {{
-                    "name": string,
-                    "description": string,
-                    "duration": string,
-                    "intensity": string,
-                    "frequency": string
-                }}
-            ],
-            "weekly_progression_goals": [string],
-            "explanation": string,
-            "tips": [string],
-            "challenges": [string]
-        }}
+        Args:
+            fitness_level: User's fitness level (beginner, intermediate, advanced)
+            goal: Workout goal (e.g., weight loss, muscle gain, endurance)
+            available_minutes: Minutes available for workout
+            available_equipment: List of available equipment
+            
+        Returns:
+            WorkoutRecommendation object with workout details
+        """
+        if not OPENAI_AVAILABLE:
+            raise ValueError("OpenAI integration not available - cannot generate workout recommendation")
+            
+        request = _normalize_workout_request(fitness_level, goal, available_minutes, available_equipment)
+        result = await workout_cache.get_or_load(
+            _cache_key(**request),
+            lambda: self._generate_workout_recommendation(**request)
+        )
+        return WorkoutRecommendation(**result)
+
+    async def _generate_workout_recommendation(
+        self,
+        fitness_level: str,
+        goal: str,
+        available_minutes: int,
+        available_equipment: List[str],
+    ) -> Dict[str, Any]:
+        """Ask the model for a workout plan and return it as a dict"""
+        prompt = self._build_workout_prompt(fitness_level, goal, available_minutes, available_equipment)
         
-        Ensure that your recommendations are medically sound, follow established nutrition and exercise guidelines, and are tailored to the individual's characteristics.
+        # Get response from OpenAI
+        response = await self._create_completion(self.workout_system_prompt, prompt)
+        
+        # Parse the response
+        try:
+            result = json.loads(response.choices[0].message.content)
+            return WorkoutRecommendation(**result).dict()
+        except Exception as e:
+            logging.error(f"Error parsing AI response: {e}")
+            raise ValueError(f"Failed to generate a valid workout recommendation: {e}")
+
+    @handle_exceptions
+    async def analyze_dietary_habits(
+        self, 
+        food_logs: List[Dict[str, Any]], 
+        user: UserInDB
+    ) -> DietaryAnalysis:
         """
+        Analyze a user's dietary habits based on their food logs
+        
+        Args:
+            food_logs: List of user's food logs
+            user: User information including their goals
+            
+        Returns:
+            DietaryAnalysis with insights and recommendations
+        """
+        if not OPENAI_AVAILABLE:
+            raise ValueError("OpenAI integration not available - cannot analyze dietary habits")
+            
+        prompt = self._build_dietary_analysis_prompt(food_logs, user)
         
         # Get response from OpenAI
-        response = self.openai_client.chat.completions.create(
-            model="gpt-3.5-turbo-1106",
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": self.weight_loss_system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        response = await self._create_completion(self.weight_loss_system_prompt, prompt)
         
         # Parse the response
         try:
             result = json.loads(response.choices[0].message.content)
-            return WeightLossRecommendation(**result)
+            return DietaryAnalysis(**result)
         except Exception as e:
             logging.error(f"Error parsing AI response: {e}")
-            raise ValueError(f"Failed to generate a valid weight loss recommendation: {e}")
+            raise ValueError(f"Failed to generate a valid dietary analysis: {e}")
 
     @handle_exceptions
-    async def get_meal_recommendation(
+    async def forecast_weight_progress(
+        self,
+        user: UserInDB,
+        weight_logs: List[Dict[str, Any]],
+        target_weight: float,
+    ) -> WeightProgressForecast:
+        """
+        Generate a forecast of weight progress based on current trends
+        
+        Args:
+            user: User profile information
+            weight_logs: List of user's weight logs
+            target_weight: Target weight in kg
+            
+        Returns:
+            WeightProgressForecast with projections and recommendations
+        """
+        # Projections are computed locally; the model is only asked to reword
+        # the explanation when enabled
+        forecast = forecasting.forecast_weight(user, weight_logs, target_weight)
+        if not (settings.FORECAST_LLM_EXPLANATION and OPENAI_AVAILABLE):
+            return forecast
+            
+        prompt = f"""
+        Explain this weight forecast to a user in 2-3 encouraging, plain sentences.
+        - Current weight: {user.current_weight} kg
+        - Target weight: {target_weight} kg
+        - Sustainable rate: {forecast.sustainable_rate} kg per week
+        - Daily calorie deficit required: {forecast.calorie_deficit_required} kcal
+        - Expected completion date: {forecast.expected_completion_date or "not on the current trend"}
+        - Challenges: {json.dumps(forecast.challenges)}
+        - Model notes: {forecast.explanation}
+        
+        Format your response as a JSON object: {{"explanation": string}}
+        """
+        
+        try:
+            response = await self._create_completion(self.weight_loss_system_prompt, prompt)
+            explanation = json.loads(response.choices[0].message.content)["explanation"]
+            return forecast.copy(update={"explanation": explanation})
+        except Exception as e:
+            logging.warning(f"Keeping computed forecast explanation: {e}")
+            return forecast
+
+    async def stream_weight_loss_recommendation(
+        self,
+        user: UserInDB,
+        target_weight: float,
+        dietary_preferences: List[str]
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a personalized weight loss plan as it is generated
+        
+        Args:
+            user: User profile data
+            target_weight: Target weight in kg
+            dietary_preferences: List of dietary preferences or restrictions
+            
+        Yields:
+            A "start" event, a "section" event for each sample_meal_plan day,
+            then the "result"
+        """
+        yield "start", {"cached": False}
+        plan = await self.get_weight_loss_recommendation(user, target_weight, dietary_preferences)
+        for day, meals in plan.sample_meal_plan.items():
+            yield "section", {"path": ["sample_meal_plan", day], "value": meals}
+        yield "result", plan.dict()
+
+    async def stream_meal_recommendation(
         self,
         calories: int,
         meal_type: str,
         dietary_restrictions: List[str],
         available_ingredients: Optional[List[str]] = None,
-    ) -> MealRecommendation:
+    ) -> AsyncIterator[Tuple[str, Any]]:
         """
-        Generate a meal recommendation based on calorie and nutrition requirements
+        Stream a meal recommendation as it is generated, sharing the cache
+        with get_meal_recommendation
         
         Args:
             calories: Target calories for the meal
@@ -199,12 +514,151 @@ class AIService:
             dietary_restrictions: List of dietary restrictions
             available_ingredients: Optional list of ingredients to use
             
-        Returns:
-            MealRecommendation object with recipe details
+        Yields:
+            A "start" event, "section" events unless the response was cached,
+            then the "result"
         """
         if not OPENAI_AVAILABLE:
             raise ValueError("OpenAI integration not available - cannot generate meal recommendation")
             
+        request = _normalize_meal_request(calories, meal_type, dietary_restrictions, available_ingredients)
+        prompt = self._build_meal_prompt(**request)
+        async for event in self._stream_cached_generation(
+            meal_cache, _cache_key(**request), self.meal_system_prompt, prompt, MealRecommendation
+        ):
+            yield event
+
+    async def stream_workout_recommendation(
+        self,
+        fitness_level: str,
+        goal: str,
+        available_minutes: int,
+        available_equipment: List[str],
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a personalized workout plan as it is generated, sharing the
+        cache with get_workout_recommendation
+        
+        Args:
+            fitness_level: User's fitness level (beginner, intermediate, advanced)
+            goal: Workout goal (e.g., weight loss, muscle gain, endurance)
+            available_minutes: Minutes available for workout
+            available_equipment: List of available equipment
+            
+        Yields:
+            A "start" event, "section" events unless the plan was cached,
+            then the "result"
+        """
+        if not OPENAI_AVAILABLE:
+            raise ValueError("OpenAI integration not available - cannot generate workout recommendation")
+            
+        request = _normalize_workout_request(fitness_level, goal, available_minutes, available_equipment)
+        prompt = self._build_workout_prompt(**request)
+        async for event in self._stream_cached_generation(
+            workout_cache, _cache_key(**request), self.workout_system_prompt, prompt, WorkoutRecommendation
+        ):
+            yield event
+
+    async def stream_dietary_analysis(
+        self,
+        food_logs: List[Dict[str, Any]],
+        user: UserInDB
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream an analysis of a user's dietary habits as it is generated
+        
+        Args:
+            food_logs: List of user's food logs
+            user: User information including their goals
+            
+        Yields:
+            A "start" event, "section" events, then the "result"
+        """
+        if not OPENAI_AVAILABLE:
+            raise ValueError("OpenAI integration not available - cannot analyze dietary habits")
+            
+        prompt = self._build_dietary_analysis_prompt(food_logs, user)
+        yield "start", {"cached": False}
+        async for event in self._stream_generation(self.weight_loss_system_prompt, prompt, DietaryAnalysis):
+            yield event
+
+    async def stream_weight_forecast(
+        self,
+        user: UserInDB,
+        weight_logs: List[Dict[str, Any]],
+        target_weight: float,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Event-stream form of forecast_weight_progress
+        
+        The forecast is computed locally, so there are no partial sections.
+        
+        Args:
+            user: User profile information
+            weight_logs: List of user's weight logs
+            target_weight: Target weight in kg
+            
+        Yields:
+            A "start" event, then the "result"
+        """
+        yield "start", {"cached": False}
+        forecast = await self.forecast_weight_progress(user, weight_logs, target_weight)
+        yield "result", forecast.dict()
+
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get hit/miss counters for the recommendation caches, plus how many
+        completions were collapsed into identical in-flight ones
+        
+        Returns:
+            Cache statistics keyed by endpoint
+        """
+        return {
+            "meal": meal_cache.stats(),
+            "workout": workout_cache.stats(),
+            "completions": completion_flights.stats()
+        }
+
+    def _build_weight_loss_prompt(
+        self,
+        user: UserInDB,
+        target_weight: float,
+        dietary_preferences: List[str],
+        plan: WeightLossRecommendation
+    ) -> str:
+        """Build the prompt that rewords a locally computed weight loss plan"""
+        preferences_text = ", ".join(dietary_preferences) if dietary_preferences else "No specific preferences"
+        
+        prompt = f"""
+        Personalise the wording of this weight loss plan for:
+        - Current weight: {user.current_weight} kg
+        - Target weight: {target_weight} kg
+        - Gender: {user.gender}
+        - Age: {user.age}
+        - Activity level: {user.activity_level}
+        - Dietary preferences: {preferences_text}
+        - Daily calorie target: {plan.daily_calorie_target} kcal
+        - Macronutrient breakdown (%): {json.dumps(plan.macronutrient_breakdown)}
+        - Weekly goals: {json.dumps(plan.weekly_progression_goals)}
+        - Current tips: {json.dumps(plan.tips)}
+        - Current explanation: {plan.explanation}
+        
+        Do not change any numbers. Format your response as a JSON object:
+        {{
+            "tips": [string],
+            "explanation": string
+        }}
+        """
+        return prompt
+
+    def _build_meal_prompt(
+        self,
+        calories: int,
+        meal_type: str,
+        dietary_restrictions: List[str],
+        available_ingredients: List[str]
+    ) -> str:
+        """Build the meal recommendation prompt"""
         # Format dietary restrictions
         restrictions_text = ", ".join(dietary_restrictions) if dietary_restrictions else "None"
         
@@ -270,48 +724,16 @@ class AIService:
         
         The recipe should be practical, easy to prepare, and flavorful.
         """
-        
-        # Get response from OpenAI
-        response = self.openai_client.chat.completions.create(
-            model="gpt-3.5-turbo-1106",
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": self.meal_system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        # Parse the response
-        try:
-            result = json.loads(response.choices[0].message.content)
-            return MealRecommendation(**result)
-        except Exception as e:
-            logging.error(f"Error parsing AI response: {e}")
-            raise ValueError(f"Failed to generate a valid meal recommendation: {e}")
+        return prompt
 
-    @handle_exceptions
-    async def get_workout_recommendation(
+    def _build_workout_prompt(
         self,
         fitness_level: str,
         goal: str,
         available_minutes: int,
-        available_equipment: List[str],
-    ) -> WorkoutRecommendation:
-        """
-        Generate a personalized workout plan
-        
-        Args:
-            fitness_level: User's fitness level (beginner, intermediate, advanced)
-            goal: Workout goal (e.g., weight loss, muscle gain, endurance)
-            available_minutes: Minutes available for workout
-            available_equipment: List of available equipment
-            
-        Returns:
-            WorkoutRecommendation object with workout details
-        """
-        if not OPENAI_AVAILABLE:
-            raise ValueError("OpenAI integration not available - cannot generate workout recommendation")
-            
+        available_equipment: List[str]
+    ) -> str:
+        """Build the workout plan prompt"""
         # Format available equipment
         equipment_text = ", ".join(available_equipment) if available_equipment else "No equipment (bodyweight only)"
         
@@ -364,44 +786,14 @@ class AIService:
         The workout should be safe, effective, and matched to the person's fitness level and goals.
         Include detailed form descriptions for each exercise to help prevent injury.
         """
-        
-        # Get response from OpenAI
-        response = self.openai_client.chat.completions.create(
-            model="gpt-3.5-turbo-1106",
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": self.workout_system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        # Parse the response
-        try:
-            result = json.loads(response.choices[0].message.content)
-            return WorkoutRecommendation(**result)
-        except Exception as e:
-            logging.error(f"Error parsing AI response: {e}")
-            raise ValueError(f"Failed to generate a valid workout recommendation: {e}")
+        return prompt
 
-    @handle_exceptions
-    async def analyze_dietary_habits(
-        self, 
-        food_logs: List[Dict[str, Any]], 
+    def _build_dietary_analysis_prompt(
+        self,
+        food_logs: List[Dict[str, Any]],
         user: UserInDB
-    ) -> DietaryAnalysis:
-        """
-        Analyze a user's dietary habits based on their food logs
-        
-        Args:
-            food_logs: List of user's food logs
-            user: User information including their goals
-            
-        Returns:
-            DietaryAnalysis with insights and recommendations
-        """
-        if not OPENAI_AVAILABLE:
-            raise ValueError("OpenAI integration not available - cannot analyze dietary habits")
-            
+    ) -> str:
+        """Build the dietary analysis prompt"""
         # Convert food logs to a summarized format
         food_summary = []
         for log in food_logs:
@@ -433,27 +825,8 @@ class AIService:
             avg_daily_carbs = total_carbs
             avg_daily_fat = total_fat
             
-        # Calculate BMR (Basal Metabolic Rate) using Mifflin-St Jeor Equation
-        if user.gender.lower() == "male":
-            bmr = 10 * user.current_weight + 6.25 * user.height_cm - 5 * user.age + 5
-        else:
-            bmr = 10 * user.current_weight + 6.25 * user.height_cm - 5 * user.age - 161
-            
-        # Adjust for activity level
-        activity_multipliers = {
-            "sedentary": 1.2,
-            "lightly active": 1.375,
-            "moderately active": 1.55,
-            "very active": 1.725,
-            "extremely active": 1.9
-        }
-        
-        activity_level = user.activity_level.lower()
-        if activity_level in activity_multipliers:
-            tdee = bmr * activity_multipliers[activity_level]
-        else:
-            # Default to moderately active if unknown
-            tdee = bmr * 1.55
+        # Calculate BMR (Basal Metabolic Rate) and TDEE
+        bmr, tdee = energy.estimate_energy_expenditure(user)
             
         # Create the prompt
         prompt = f"""
@@ -495,131 +868,158 @@ class AIService:
         
         Base your analysis on established nutritional guidelines and best practices for sustainable weight management.
         """
+        return prompt
+
+    async def _stream_cached_generation(
+        self,
+        cache: TieredCache,
+        cache_key: str,
+        system_prompt: str,
+        prompt: str,
+        model: Type[BaseModel]
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Serve a cached response as a single result, or stream and cache it"""
+        cached = await cache.get_fresh(cache_key)
+        yield "start", {"cached": cached is not None}
+        if cached is not None:
+            yield "result", cached
+            return
+            
+        async for event, data in self._stream_generation(system_prompt, prompt, model):
+            if event == "result":
+                await cache.set(cache_key, data)
+            yield event, data
+
+    async def _stream_generation(
+        self,
+        system_prompt: str,
+        prompt: str,
+        model: Type[BaseModel]
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a JSON completion, reporting parts of it as they complete
         
-        # Get response from OpenAI
-        response = self.openai_client.chat.completions.create(
-            model="gpt-3.5-turbo-1106",
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": self.weight_loss_system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        # Parse the response
+        Args:
+            system_prompt: System prompt for the model
+            prompt: User prompt for the model
+            model: Model the complete response must validate as
+            
+        Yields:
+            ("section", {"path": [...], "value": ...}) for each top-level
+            field, or item of a list/dict field, that validates against the
+            model, then ("result", validated response as a dict)
+        """
+        parser = JSONSectionParser(max_depth=2)
+        async for delta in self._stream_completion(system_prompt, prompt):
+            for path, value in parser.feed(delta):
+                if _validate_section(model, path, value):
+                    yield "section", {"path": list(path), "value": value}
+                    
         try:
-            result = json.loads(response.choices[0].message.content)
-            return DietaryAnalysis(**result)
+            result = model(**json.loads(parser.text))
         except Exception as e:
             logging.error(f"Error parsing AI response: {e}")
-            raise ValueError(f"Failed to generate a valid dietary analysis: {e}")
+            raise ValueError(f"Failed to generate a valid {model.__name__}: {e}")
+        yield "result", result.dict()
 
-    @handle_exceptions
-    async def forecast_weight_progress(
-        self,
-        user: UserInDB,
-        weight_logs: List[Dict[str, Any]],
-        target_weight: float,
-    ) -> WeightProgressForecast:
+    async def _stream_completion(self, system_prompt: str, prompt: str) -> AsyncIterator[str]:
         """
-        Generate a forecast of weight progress based on current trends
+        Stream a JSON chat completion from OpenAI
+        
+        Holds a completion slot for the whole stream and applies the same
+        overall deadline as _create_completion.
         
         Args:
-            user: User profile information
-            weight_logs: List of user's weight logs
-            target_weight: Target weight in kg
-            
-        Returns:
-            WeightProgressForecast with projections and recommendations
-        """
-        if not OPENAI_AVAILABLE:
-            raise ValueError("OpenAI integration not available - cannot forecast weight progress")
+            system_prompt: System prompt for the model
+            prompt: User prompt for the model
             
-        # Format the weight logs
-        weight_data = []
-        for log in weight_logs:
-            weight_data.append({
-                "date": log["logged_at"].isoformat() if hasattr(log["logged_at"], "isoformat") else log["logged_at"],
-                "weight_kg": log["weight_kg"]
-            })
-            
-        # Sort by date
-        weight_data.sort(key=lambda x: x["date"])
-        
-        # Calculate current trend if enough data points
-        weight_change = 0
-        weekly_rate = 0
-        
-        if len(weight_data) >= 2:
-            first_weight = weight_data[0]["weight_kg"]
-            last_weight = weight_data[-1]["weight_kg"]
-            first_date = weight_data[0]["date"].split("T")[0]
-            last_date = weight_data[-1]["date"].split("T")[0]
+        Yields:
+            Content deltas as they arrive
             
-            # Calculate days between dates
-            from datetime import datetime
-            date_format = "%Y-%m-%d"
-            d1 = datetime.strptime(first_date, date_format)
-            d2 = datetime.strptime(last_date, date_format)
-            days_diff = (d2 - d1).days
-            
-            if days_diff > 0:
-                weight_change = last_weight - first_weight
-                weekly_rate = (weight_change / days_diff) * 7
-        
-        # Create the prompt
-        prompt = f"""
-        Forecast weight progress for a user with the following characteristics:
-        - Gender: {user.gender}
-        - Age: {user.age}
-        - Current weight: {user.current_weight} kg
-        - Target weight: {target_weight} kg
-        - Height: {user.height_cm} cm
-        - Activity level: {user.activity_level}
-        
-        Weight history:
-        {json.dumps(weight_data)}
-        
-        Current trends:
-        - Total weight change: {weight_change:.2f} kg
-        - Weekly rate: {weekly_rate:.2f} kg per week
-        
-        Format your response as a JSON object with the following structure:
-        {{
-            "weekly_projections": [
-                {{
-                    "week": number,
-                    "projected_weight": number,
-                    "required_calorie_deficit": number
-                }}
-            ],
-            "expected_completion_date": string,  // when target weight might be reached
-            "sustainable_rate": number,  // sustainable weekly weight loss in kg
-            "calorie_deficit_required": number,  // daily deficit needed
-            "challenges": [string],
-            "recommendations": [string],
-            "explanation": string
-        }}
+        Raises:
+            TimeoutError: If the completion does not finish in time
+        """
+        slots = get_openai_slots()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.OPENAI_TIMEOUT_SECONDS
         
-        Base your forecast on established weight loss principles and the user's current trends.
-        Consider that sustainable weight loss is typically 0.5-1kg per week.
-        If the current trend is not leading to the target weight, provide realistic adjustments.
+        async def before_deadline(awaitable):
+            try:
+                return await asyncio.wait_for(awaitable, timeout=max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                raise TimeoutError(
+                    f"AI completion timed out after {settings.OPENAI_TIMEOUT_SECONDS:.0f} seconds"
+                )
+                
+        await before_deadline(slots.acquire())
+        stream = None
+        streamed_tokens = 0
+        try:
+            with metrics.track_upstream("openai", "stream"):
+                stream = await before_deadline(self.openai_client.chat.completions.create(
+                    model="gpt-3.5-turbo-1106",
+                    response_format={"type": "json_object"},
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    stream=True
+                ))
+                chunks = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await before_deadline(chunks.__anext__())
+                    except StopAsyncIteration:
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        # OpenAI sends one token per content chunk
+                        streamed_tokens += 1
+                        yield chunk.choices[0].delta.content
+        finally:
+            metrics.openai_tokens.inc("completion", "stream", amount=streamed_tokens)
+            if stream is not None:
+                await stream.response.aclose()
+            slots.release()
+
+    async def _create_completion(self, system_prompt: str, prompt: str):
         """
+        Request a JSON chat completion from OpenAI
         
-        # Get response from OpenAI
-        response = self.openai_client.chat.completions.create(
-            model="gpt-3.5-turbo-1106",
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": self.weight_loss_system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        Waits for a free completion slot first, and applies a single deadline
+        covering both the wait and the call itself. Concurrent requests with
+        the same prompts share one completion.
         
-        # Parse the response
+        Args:
+            system_prompt: System prompt for the model
+            prompt: User prompt for the model
+            
+        Returns:
+            The chat completion response
+            
+        Raises:
+            TimeoutError: If the completion does not finish in time
+        """
+        async def complete():
+            async with get_openai_slots():
+                with metrics.track_upstream("openai", "completion"):
+                    response = await self.openai_client.chat.completions.create(
+                        model="gpt-3.5-turbo-1106",
+                        response_format={"type": "json_object"},
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": prompt}
+                        ]
+                    )
+                metrics.record_openai_usage(response.usage)
+                return response
+                
+        flight_key = hashlib.sha256(f"{system_prompt}\0{prompt}".encode()).hexdigest()
         try:
-            result = json.loads(response.choices[0].message.content)
-            return WeightProgressForecast(**result)
-        except Exception as e:
-            logging.error(f"Error parsing AI response: {e}")
-            raise ValueError(f"Failed to generate a valid weight progress forecast: {e}")
+            return await asyncio.wait_for(
+                completion_flights.do(flight_key, complete),
+                timeout=settings.OPENAI_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"AI completion timed out after {settings.OPENAI_TIMEOUT_SECONDS:.0f} seconds"
+            )
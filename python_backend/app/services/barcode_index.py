@@ -0,0 +1,138 @@
+"""
+Persistent barcode index
+
+Maps UPC/EAN barcodes to FoodNutritionDetails in a Firestore collection so a
+barcode only reaches Nutritionix once across all workers and restarts. It
+is fed by the bulk loader (scripts/import_barcodes.py) and by every upstream
+lookup. Barcodes Nutritionix does not know are recorded as misses that
+expire after BARCODE_NEGATIVE_TTL_SECONDS, so repeated scans of unknown
+products stay off the network without hiding products added upstream later.
+"""
+from ..config import settings
+from ..utils import database
+from .. import storage
+
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+_NON_DIGIT = re.compile(r"\D")
+
+
+def normalize_barcode(barcode: str) -> str:
+    """
+    Canonical form of a barcode
+
+    Non-digits are dropped and 12-digit UPC-A codes are widened to EAN-13,
+    so the same product scanned either way shares one entry.
+
+    Args:
+        barcode: Barcode as scanned or typed
+
+    Returns:
+        Normalized barcode, empty if it has no digits
+    """
+    digits = _NON_DIGIT.sub("", barcode)
+    return digits.zfill(13) if len(digits) == 12 else digits
+
+
+class BarcodeIndex:
+    """Firestore-backed barcode to nutrition details index"""
+
+    def __init__(self):
+        """Initialize the index with a Firestore connection if available"""
+        self.db = storage.get_client()
+
+    def _collection(self):
+        return self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_barcodes")
+
+    async def get_many(self, barcodes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch index entries for several normalized barcodes in one round trip
+
+        Args:
+            barcodes: Normalized barcodes
+
+        Returns:
+            Entries keyed by barcode: {"found": True, "details": {...}} or
+            {"found": False} for an unexpired miss. Barcodes with no entry
+            (or an expired miss) are omitted.
+        """
+        if not self.db or not barcodes:
+            return {}
+        snapshots = await database.get_documents(
+            self.db, [self._collection().document(barcode) for barcode in barcodes]
+        )
+        now = datetime.utcnow()
+        entries = {}
+        for snapshot in snapshots:
+            if not snapshot.exists:
+                continue
+            data = snapshot.to_dict()
+            if data.get("found"):
+                entries[snapshot.id] = {"found": True, "details": data["details"]}
+            elif data.get("expires_at") and data["expires_at"].replace(tzinfo=None) > now:
+                entries[snapshot.id] = {"found": False}
+        return entries
+
+    async def put(self, barcode: str, details: Optional[Dict[str, Any]], source: str = "nutritionix") -> None:
+        """
+        Record the result of an upstream lookup
+
+        Args:
+            barcode: Normalized barcode
+            details: Nutrition details, or None if the barcode is unknown
+            source: Where the entry came from
+        """
+        if not self.db:
+            return
+        try:
+            await database.set_document(self._collection().document(barcode), self._entry(details, source))
+        except Exception as e:
+            # The index is an optimisation; a failed write only costs a later lookup
+            logging.warning(f"Could not record barcode {barcode} in the index: {e}")
+
+    async def bulk_load(self, items: Iterable[Dict[str, Any]], source: str = "import") -> int:
+        """
+        Write FoodNutritionDetails that carry a barcode, in batched commits
+
+        Args:
+            items: FoodNutritionDetails dictionaries
+            source: Where the entries came from
+
+        Returns:
+            Number of barcodes written
+        """
+        if not self.db:
+            raise ValueError("Firestore not initialized - cannot load barcodes")
+
+        written = 0
+        batch = self.db.batch()
+        pending = 0
+        for item in items:
+            barcode = normalize_barcode(str(item.get("barcode") or ""))
+            if not barcode:
+                continue
+            batch.set(self._collection().document(barcode), self._entry(item, source))
+            pending += 1
+            if pending == database.MAX_BATCH_WRITES:
+                await database.commit_batch(batch)
+                written += pending
+                batch = self.db.batch()
+                pending = 0
+        if pending:
+            await database.commit_batch(batch)
+            written += pending
+        return written
+
+    def _entry(self, details: Optional[Dict[str, Any]], source: str) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        if details is None:
+            return {
+                "found": False,
+                "source": source,
+                "updated_at": now,
+                "expires_at": now + timedelta(seconds=settings.BARCODE_NEGATIVE_TTL_SECONDS),
+            }
+        return {"found": True, "details": details, "source": source, "updated_at": now}
@@ -0,0 +1,49 @@
+"""
+Energy expenditure estimates shared by goals, meal plans and forecasts
+
+BMR uses the Mifflin-St Jeor equation and TDEE scales it by the user's
+activity level. Nutrition goals, the meal planner (through those goals),
+dietary analysis and the weight forecast all take their numbers from here so
+they cannot drift apart.
+"""
+from ..models.user import UserBase
+
+from typing import Optional, Tuple
+
+ACTIVITY_MULTIPLIERS = {
+    "sedentary": 1.2,
+    "lightly active": 1.375,
+    "moderately active": 1.55,
+    "very active": 1.725,
+    "extremely active": 1.9
+}
+
+# Used for activity levels not in the table
+DEFAULT_ACTIVITY_MULTIPLIER = ACTIVITY_MULTIPLIERS["moderately active"]
+
+
+def bmr_constant(user: UserBase) -> float:
+    """Weight-independent part of the Mifflin-St Jeor equation for a user"""
+    offset = 5 if user.gender.lower() == "male" else -161
+    return 6.25 * user.height_cm - 5 * user.age + offset
+
+
+def activity_multiplier(user: UserBase) -> float:
+    """Activity multiplier for a user, defaulting to moderately active"""
+    return ACTIVITY_MULTIPLIERS.get(user.activity_level.lower(), DEFAULT_ACTIVITY_MULTIPLIER)
+
+
+def estimate_energy_expenditure(user: UserBase, weight_kg: Optional[float] = None) -> Tuple[float, float]:
+    """
+    Estimate BMR and TDEE using the Mifflin-St Jeor equation
+
+    Args:
+        user: User profile with gender, age, height and activity level
+        weight_kg: Weight to evaluate at (defaults to the profile's current weight)
+
+    Returns:
+        Tuple of (bmr, tdee) in kcal/day
+    """
+    weight = user.current_weight if weight_kg is None else weight_kg
+    bmr = 10 * weight + bmr_constant(user)
+    return bmr, bmr * activity_multiplier(user)
@@ -0,0 +1,365 @@
+"""
+Local food catalog for typeahead search
+
+Answers food name searches in-process so most keystrokes never reach
+Nutritionix. Two indexes sit over the same items:
+
+- a sorted list of word-start suffixes ("greek yogurt plain",
+  "yogurt plain", "plain") that is bisected for prefix matches, and
+- a trigram index over the distinct words, used when nothing matches by
+  prefix to correct typos word by word before searching again.
+
+The catalog is seeded from a JSON-lines import file and grows with every
+Nutritionix search result the service sees.
+"""
+from ..config import settings
+
+import heapq
+import json
+import logging
+import os
+import re
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Fields of FoodSearchResult kept per item, in storage order
+FIELDS = ("food_name", "serving_size", "serving_unit", "calories", "photo_url", "brand", "barcode")
+
+PREFIX_SCAN_LIMIT = 128  # prefix entries ranked per query
+MAX_KEY_LENGTH = 64  # suffix keys are truncated; longer queries are trimmed to match
+FUZZY_CANDIDATES = 32  # vocabulary words scored per misspelled query word
+SHORT_WORD_LENGTH = 5
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase text and collapse anything but letters and digits to single spaces"""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def trigrams(word: str, partial: bool = False) -> set:
+    """
+    Trigrams of a word, padded so word boundaries count
+
+    Args:
+        word: Normalized word
+        partial: The word may still be being typed, so its end is not padded
+
+    Returns:
+        Set of trigrams
+    """
+    padded = f" {word}" if partial else f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance (edits plus adjacent transpositions)
+
+    Args:
+        a: First word
+        b: Second word
+        max_distance: Distances above this are not needed exactly
+
+    Returns:
+        The distance, or max_distance + 1 once it is known to exceed the bound
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def prefix_edit_distance(word: str, candidate: str, max_distance: int) -> int:
+    """
+    Distance from a word still being typed to the closest prefix of a candidate
+
+    Prefixes up to max_distance letters shorter or longer than the word are
+    tried, so a dropped or extra letter costs one edit ("aple" is one edit
+    from "appl").
+
+    Args:
+        word: Partial query word
+        candidate: Vocabulary word
+        max_distance: Distances above this are not needed exactly
+
+    Returns:
+        The smallest distance, or max_distance + 1 if every prefix exceeds the bound
+    """
+    lengths = range(max(0, len(word) - max_distance), min(len(candidate), len(word) + max_distance) + 1)
+    return min(
+        (edit_distance(word, candidate[:length], max_distance) for length in lengths),
+        default=max_distance + 1
+    )
+
+
+class FoodCatalog:
+    """In-memory food catalog with prefix and trigram indexes"""
+
+    def __init__(self):
+        self._items: List[Tuple[Any, ...]] = []
+        self._texts: List[str] = []
+        self._ids: Dict[str, int] = {}
+        # Parallel sorted lists: suffix key and (item id << 4 | word index)
+        self._keys: List[str] = []
+        self._refs: List[int] = []
+        self._vocabulary: List[str] = []
+        self._word_ids: Dict[str, int] = {}
+        self._trigrams: Dict[str, array] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item: Dict[str, Any]) -> bool:
+        """
+        Add one food to the catalog, keeping the indexes sorted
+
+        Args:
+            item: FoodSearchResult fields
+
+        Returns:
+            True if the food was new, False if it was already cataloged
+        """
+        item_id = self._store(item)
+        if item_id is None:
+            return False
+        for key, ref in self._suffix_keys(item_id):
+            position = bisect_left(self._keys, key)
+            self._keys.insert(position, key)
+            self._refs.insert(position, ref)
+        return True
+
+    def add_many(self, items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Add foods to the catalog
+
+        Args:
+            items: FoodSearchResult fields for each food
+
+        Returns:
+            The items that were not already cataloged
+        """
+        return [item for item in items if self.add(item)]
+
+    def load(self, items: Iterable[Dict[str, Any]]) -> int:
+        """
+        Bulk-load foods, sorting the prefix index once at the end
+
+        Args:
+            items: FoodSearchResult fields for each food
+
+        Returns:
+            Number of new foods loaded
+        """
+        entries = list(zip(self._keys, self._refs))
+        loaded = 0
+        for item in items:
+            item_id = self._store(item)
+            if item_id is not None:
+                entries.extend(self._suffix_keys(item_id))
+                loaded += 1
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._refs = [ref for _, ref in entries]
+        return loaded
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Find foods whose name or brand starts with the query, retrying with
+        typo-corrected words when nothing matches
+
+        Args:
+            query: Food name or description typed so far
+            limit: Maximum number of results to return
+
+        Returns:
+            Matching FoodSearchResult fields, best match first
+        """
+        text = normalize(query)[:MAX_KEY_LENGTH]
+        if not text:
+            return []
+        item_ids = self._prefix_search(text, limit) or self._fuzzy_search(text, limit)
+        if item_ids:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return [self._to_dict(item_id) for item_id in item_ids]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get catalog size and hit/miss counters
+
+        Returns:
+            Dictionary of counters
+        """
+        lookups = self.hits + self.misses
+        return {
+            "items": len(self._items),
+            "words": len(self._vocabulary),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def _store(self, item: Dict[str, Any]) -> Optional[int]:
+        """Append an item and index any new words; None if already present"""
+        text = normalize(f"{item['food_name']} {item.get('brand') or ''}")
+        if not text or text in self._ids:
+            return None
+        item_id = len(self._items)
+        self._ids[text] = item_id
+        self._items.append(tuple(item.get(field) for field in FIELDS))
+        self._texts.append(text)
+        for word in text.split(" "):
+            if word not in self._word_ids:
+                word_id = self._word_ids[word] = len(self._vocabulary)
+                self._vocabulary.append(word)
+                for gram in trigrams(word):
+                    postings = self._trigrams.get(gram)
+                    if postings is None:
+                        postings = self._trigrams[gram] = array("i")
+                    postings.append(word_id)
+        return item_id
+
+    def _suffix_keys(self, item_id: int) -> List[Tuple[str, int]]:
+        """Prefix index entries for every word start of an item's text"""
+        words = self._texts[item_id].split(" ")
+        keys = [
+            (" ".join(words[index:])[:MAX_KEY_LENGTH], item_id << 4 | min(index, 15))
+            for index in range(len(words))
+        ]
+        brand = normalize(self._items[item_id][FIELDS.index("brand")] or "")
+        if brand:
+            # Also match "brand name" as typed, e.g. "chobani greek"
+            brand_first = f"{brand} {' '.join(words[:len(words) - len(brand.split(' '))])}".strip()
+            keys.append((brand_first[:MAX_KEY_LENGTH], item_id << 4 | 1))
+        return keys
+
+    def _prefix_search(self, text: str, limit: int) -> List[int]:
+        """Rank prefix matches: whole-name matches first, then shorter names"""
+        keys, refs = self._keys, self._refs
+        position = bisect_left(keys, text)
+        best: Dict[int, int] = {}
+        for index in range(position, min(position + PREFIX_SCAN_LIMIT, len(keys))):
+            if not keys[index].startswith(text):
+                break
+            item_id, word_index = refs[index] >> 4, refs[index] & 15
+            best[item_id] = min(word_index, best.get(item_id, word_index))
+        return heapq.nsmallest(limit, best, key=lambda item_id: (best[item_id] > 0, len(self._texts[item_id]), item_id))
+
+    def _fuzzy_search(self, text: str, limit: int) -> List[int]:
+        """Correct each query word against the vocabulary, then search by prefix again"""
+        words = text.split(" ")
+        corrected = []
+        for position, word in enumerate(words):
+            partial = position == len(words) - 1
+            replacement = word if not partial and word in self._word_ids else self._correct_word(word, partial)
+            if replacement is None:
+                return []
+            corrected.append(replacement)
+        corrected_text = " ".join(corrected)
+        return self._prefix_search(corrected_text, limit) if corrected_text != text else []
+
+    def _correct_word(self, word: str, partial: bool) -> Optional[str]:
+        """Closest vocabulary word sharing a trigram with the query word, within a small edit distance"""
+        query_grams = trigrams(word, partial)
+        if len(word) <= SHORT_WORD_LENGTH:
+            # A swap in a short word can change every trigram, so also look
+            # up the grams of each adjacent-letter swap
+            for i in range(len(word) - 1):
+                query_grams |= trigrams(word[:i] + word[i + 1] + word[i] + word[i + 2:], partial)
+        counts: Dict[int, int] = {}
+        for gram in query_grams:
+            for word_id in self._trigrams.get(gram, ()):
+                counts[word_id] = counts.get(word_id, 0) + 1
+        candidates = heapq.nlargest(FUZZY_CANDIDATES, counts, key=counts.__getitem__)
+
+        max_distance = 1 if len(word) < 8 else 2
+        best_word, best_rank = None, None
+        for word_id in candidates:
+            candidate = self._vocabulary[word_id]
+            # A word still being typed is compared with the candidate's prefixes
+            if partial:
+                distance = prefix_edit_distance(word, candidate, max_distance)
+            else:
+                distance = edit_distance(word, candidate, max_distance)
+            rank = (distance, -counts[word_id], len(candidate))
+            if distance <= max_distance and (best_rank is None or rank < best_rank):
+                best_word, best_rank = candidate, rank
+        return best_word
+
+    def _to_dict(self, item_id: int) -> Dict[str, Any]:
+        result = dict(zip(FIELDS, self._items[item_id]))
+        result["is_custom"] = False
+        return result
+
+
+# Process-wide catalog shared by all NutritionService instances
+catalog = FoodCatalog()
+
+
+def load_catalog_file(path: Optional[str] = None) -> int:
+    """
+    Seed the catalog from a JSON-lines file of FoodSearchResult objects
+
+    Blocking; call it from a worker thread on startup.
+
+    Args:
+        path: Import file, defaults to settings.FOOD_CATALOG_PATH
+
+    Returns:
+        Number of foods loaded
+    """
+    path = path or settings.FOOD_CATALOG_PATH
+    if not path or not os.path.exists(path):
+        return 0
+
+    def read_items():
+        with open(path, encoding="utf-8") as handle:
+            for line_number, line in enumerate(handle, 1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError as e:
+                    logging.warning(f"Skipping food catalog line {line_number}: {e}")
+                    continue
+                if item.get("food_name"):
+                    yield item
+
+    loaded = catalog.load(read_items())
+    logging.info(f"Loaded {loaded} foods into the local catalog from {path}")
+    return loaded
+
+
+def append_catalog_file(items: List[Dict[str, Any]], path: Optional[str] = None) -> None:
+    """
+    Append newly seen foods to the import file so they survive restarts
+
+    Blocking; call it from a worker thread.
+
+    Args:
+        items: FoodSearchResult fields for each new food
+        path: Import file, defaults to settings.FOOD_CATALOG_PATH
+    """
+    path = path or settings.FOOD_CATALOG_PATH
+    if not path or not items:
+        return
+    with open(path, "a", encoding="utf-8") as handle:
+        for item in items:
+            handle.write(json.dumps(item) + "\n")
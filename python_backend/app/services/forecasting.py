@@ -0,0 +1,271 @@
+"""
+Local weight forecasting engine
+
+Projects weight progress numerically instead of asking an LLM. Three
+estimates are combined:
+
+- a robust (Theil-Sen) linear trend over the logged weights
+- an exponentially weighted linear trend that favours recent logs
+- an energy-balance model from the user's BMR/TDEE and calorie goal,
+  solved in closed form so TDEE falls as weight drops
+
+The empirical trends are trusted more as the logged history gets longer.
+"""
+from ..models.ai import WeightProgressForecast
+from ..models.user import UserInDB
+from .energy import activity_multiplier, bmr_constant, estimate_energy_expenditure
+
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Energy content of one kilogram of body weight
+KCAL_PER_KG = 7700
+
+# Half-life, in days, of a log's weight in the exponentially weighted trend
+SMOOTHING_HALF_LIFE_DAYS = 14.0
+
+# History length at which the empirical trend fully replaces the energy model
+FULL_TRUST_DAYS = 28.0
+
+FORECAST_WEEKS = 12
+
+# Users this close to their target are maintaining (projections show 0.1 kg)
+MAINTENANCE_TOLERANCE_KG = 0.05
+
+
+@lru_cache(maxsize=16)
+def _pair_indices(count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Index pairs (i < j) over count logs; cached as histories have similar lengths"""
+    return np.triu_indices(count, k=1)
+
+
+def theil_sen_slope(days: np.ndarray, weights: np.ndarray) -> Optional[float]:
+    """
+    Median of pairwise slopes, robust to outlier weigh-ins
+
+    Args:
+        days: Log times in days
+        weights: Logged weights
+
+    Returns:
+        Slope in kg/day, or None if all logs share the same time
+    """
+    i, j = _pair_indices(len(days))
+    dt = days[j] - days[i]
+    valid = dt > 0
+    if not np.any(valid):
+        return None
+    return float(np.median((weights[j] - weights[i])[valid] / dt[valid]))
+
+
+def smoothed_trend(days: np.ndarray, weights: np.ndarray) -> Optional[Tuple[float, float]]:
+    """
+    Exponentially weighted least-squares line through the logs
+
+    Args:
+        days: Log times in days
+        weights: Logged weights
+
+    Returns:
+        Tuple of (level at the latest log, slope in kg/day), or None if the
+        logs do not span any time
+    """
+    age = days[-1] - days
+    w = np.power(0.5, age / SMOOTHING_HALF_LIFE_DAYS)
+    mean_t = np.average(days, weights=w)
+    mean_w = np.average(weights, weights=w)
+    var_t = np.average((days - mean_t) ** 2, weights=w)
+    if var_t <= 1e-9:
+        return None
+    slope = np.average((days - mean_t) * (weights - mean_w), weights=w) / var_t
+    level = mean_w + slope * (days[-1] - mean_t)
+    return float(level), float(slope)
+
+
+def energy_balance_projection(
+    user: UserInDB,
+    start_weight: float,
+    daily_intake: float,
+    days: np.ndarray
+) -> np.ndarray:
+    """
+    Project weight from energy balance, letting TDEE fall with weight
+
+    With TDEE = m * (10 * w + c), dw/dt = -(TDEE(w) - intake) / KCAL_PER_KG
+    is linear in w, so w(t) decays exponentially towards the weight at which
+    intake equals expenditure.
+
+    Args:
+        user: User profile
+        start_weight: Weight at t=0
+        daily_intake: Planned daily calorie intake
+        days: Times in days to project at
+
+    Returns:
+        Projected weights
+    """
+    m = activity_multiplier(user)
+    equilibrium = (daily_intake / m - bmr_constant(user)) / 10
+    rate = 10 * m / KCAL_PER_KG
+    return equilibrium + (start_weight - equilibrium) * np.exp(-rate * days)
+
+
+def sustainable_weekly_rate(current_weight: float, losing: bool) -> float:
+    """Recommended weekly rate of change in kg"""
+    if losing:
+        return float(np.clip(0.0075 * current_weight, 0.25, 1.0))
+    return float(np.clip(0.0035 * current_weight, 0.1, 0.5))
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_days(value: Any) -> float:
+    """Log time in days since the epoch; naive times are UTC"""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        return value.timestamp() / 86400
+    return (value - _EPOCH).total_seconds() / 86400
+
+
+def forecast_weight(
+    user: UserInDB,
+    weight_logs: List[Dict[str, Any]],
+    target_weight: float,
+    weeks: int = FORECAST_WEEKS
+) -> WeightProgressForecast:
+    """
+    Forecast weight progress towards a target
+
+    Args:
+        user: User profile
+        weight_logs: Weight logs with "logged_at" and "weight_kg"
+        target_weight: Target weight in kg
+        weeks: Number of weekly projections to produce
+
+    Returns:
+        WeightProgressForecast with a template explanation
+    """
+    times = np.array([_to_days(log["logged_at"]) for log in weight_logs])
+    order = np.argsort(times, kind="stable")
+    days = times[order] - times[order[0]]
+    weights = np.array([float(log["weight_kg"]) for log in weight_logs])[order]
+    span_days = float(days[-1] - days[0])
+
+    current_weight = float(weights[-1])
+    maintaining = abs(current_weight - target_weight) < MAINTENANCE_TOLERANCE_KG
+    losing = not maintaining and current_weight > target_weight
+    sustainable_rate = 0.0 if maintaining else sustainable_weekly_rate(current_weight, losing)
+
+    # Empirical trend (kg/day): average of the robust and smoothed estimates
+    robust_slope = theil_sen_slope(days, weights) if len(days) >= 2 else None
+    smoothed = smoothed_trend(days, weights) if len(days) >= 2 else None
+    slopes = [s for s in (robust_slope, smoothed[1] if smoothed else None) if s is not None]
+    empirical_slope = float(np.mean(slopes)) if slopes else None
+    start_weight = smoothed[0] if smoothed else current_weight
+
+    # Energy-balance model from the planned intake
+    _, tdee = estimate_energy_expenditure(user, start_weight)
+    if user.calorie_goal:
+        daily_intake = float(user.calorie_goal)
+    elif maintaining:
+        daily_intake = tdee
+    elif losing:
+        daily_intake = tdee - sustainable_rate * KCAL_PER_KG / 7
+    else:
+        daily_intake = tdee + sustainable_rate * KCAL_PER_KG / 7
+
+    week_days = np.arange(1, weeks + 1) * 7.0
+    energy = energy_balance_projection(user, start_weight, daily_intake, week_days)
+    if empirical_slope is not None:
+        trust = min(1.0, span_days / FULL_TRUST_DAYS)
+        projected = trust * (start_weight + empirical_slope * week_days) + (1 - trust) * energy
+    else:
+        trust = 0.0
+        projected = energy
+
+    # Daily deficit still needed each week to keep moving at a sustainable pace
+    remaining = np.abs(projected - target_weight)
+    required_deficit = np.minimum(remaining, sustainable_rate) * KCAL_PER_KG / 7
+    if not losing:
+        required_deficit = -required_deficit
+    weekly_projections = [
+        {
+            "week": int(week),
+            "projected_weight": round(float(weight), 1),
+            "required_calorie_deficit": int(round(float(deficit)))
+        }
+        for week, weight, deficit in zip(range(1, weeks + 1), projected, required_deficit)
+    ]
+
+    # Expected completion from the blended weekly rate
+    weekly_rate = projected[0] - start_weight
+    expected_completion_date = None
+    if maintaining:
+        expected_completion_date = datetime.utcnow().strftime("%Y-%m-%d")
+    elif (losing and weekly_rate < 0) or (not losing and weekly_rate > 0):
+        weeks_to_target = abs(target_weight - current_weight) / abs(weekly_rate)
+        if weeks_to_target <= 104:
+            expected_completion_date = (datetime.utcnow() + timedelta(weeks=float(weeks_to_target))).strftime("%Y-%m-%d")
+
+    calorie_deficit_required = int(round(sustainable_rate * KCAL_PER_KG / 7))
+    if not losing:
+        calorie_deficit_required = -calorie_deficit_required
+    observed_weekly = empirical_slope * 7 if empirical_slope is not None else None
+
+    # Rule-based challenges and recommendations
+    challenges = []
+    recommendations = []
+    if len(days) < 4 or span_days < 7:
+        challenges.append("Limited weight history makes the trend uncertain")
+        recommendations.append("Log your weight at least three times a week at the same time of day")
+    if maintaining:
+        if observed_weekly is not None and abs(observed_weekly) >= 0.1 and span_days >= 14:
+            challenges.append("Your weight is drifting away from your target weight")
+    elif observed_weekly is not None:
+        if (losing and observed_weekly > 0) or (not losing and observed_weekly < 0):
+            challenges.append("Your recent trend is moving away from your target weight")
+        elif abs(observed_weekly) < 0.1 and span_days >= 14:
+            challenges.append("Your weight has plateaued over the last few weeks")
+            recommendations.append("Re-check portion sizes and logged calories to restore a consistent deficit")
+        elif abs(observed_weekly) > sustainable_rate * 1.25:
+            challenges.append("You are changing weight faster than is usually sustainable")
+            recommendations.append("Ease the calorie deficit slightly to protect muscle mass and energy levels")
+    if maintaining:
+        recommendations.append(f"Keep your intake close to your {tdee:.0f} kcal TDEE to hold your weight")
+        recommendations.append(f"Eat at least {1.6 * current_weight:.0f} g of protein a day to preserve lean mass")
+    elif losing:
+        recommendations.append(f"Aim for a daily deficit of about {calorie_deficit_required} kcal below your {tdee:.0f} kcal TDEE")
+        recommendations.append(f"Eat at least {1.6 * current_weight:.0f} g of protein a day to preserve lean mass")
+    else:
+        recommendations.append(f"Aim for a daily surplus of about {-calorie_deficit_required} kcal above your {tdee:.0f} kcal TDEE")
+    recommendations.append("Combine strength training with regular walking or cardio")
+
+    trend_text = (
+        f"Your logged trend is {observed_weekly:+.2f} kg per week"
+        if observed_weekly is not None
+        else "There is not yet enough history to measure a trend"
+    )
+    pace_text = (
+        "You are at your target weight, so the goal is to hold it there."
+        if maintaining
+        else f"A sustainable pace for you is about {sustainable_rate:.2f} kg per week."
+    )
+    explanation = (
+        f"{trend_text}. With an estimated TDEE of {tdee:.0f} kcal and a planned intake of "
+        f"{daily_intake:.0f} kcal, the projection blends your measured trend ({trust:.0%}) with an "
+        f"energy-balance model ({1 - trust:.0%}). {pace_text}"
+    )
+
+    return WeightProgressForecast(
+        weekly_projections=weekly_projections,
+        expected_completion_date=expected_completion_date,
+        sustainable_rate=round(sustainable_rate, 2),
+        calorie_deficit_required=calorie_deficit_required,
+        challenges=challenges,
+        recommendations=recommendations,
+        explanation=explanation
+    )
@@ -0,0 +1,370 @@
+"""
+Deterministic local weight loss planner
+
+Builds a WeightLossRecommendation from the same nutrition goals math as
+UserService.calculate_nutrition_goals instead of asking an LLM to invent
+targets. Each meal combines one food per slot (protein, carb, produce,
+fat) from a curated table, rotated by day for variety. Serving sizes are
+solved with a small non-negative least-squares fit to the meal's
+macronutrient targets, then nudged in quarter servings so each day's
+totals land close to the daily goals.
+"""
+from ..models.ai import WeightLossRecommendation
+from ..models.user import UserInDB
+from . import energy, forecasting
+from .user_service import compute_nutrition_goals
+
+from typing import Any, Dict, List, NamedTuple, Set
+import numpy as np
+
+
+class Food(NamedTuple):
+    """A curated food with nutrition per serving"""
+    name: str
+    serving: str
+    calories: float
+    protein: float
+    carbs: float
+    fat: float
+    slot: str  # protein, carb, produce or fat
+    meals: Set[str]
+    contains: Set[str]  # meat, fish, dairy, egg, gluten, nuts
+
+
+B, L, D, S = "breakfast", "lunch", "dinner", "snack"
+
+# Per-serving nutrition for common whole foods (USDA reference values)
+FOODS = [
+    # Protein
+    Food("Greek yogurt, nonfat", "170 g", 100, 17, 6, 0.7, "protein", {B, S}, {"dairy"}),
+    Food("Scrambled eggs", "2 large eggs", 180, 12.5, 1.5, 13.5, "protein", {B}, {"egg"}),
+    Food("Egg whites", "150 g", 78, 16, 1, 0.3, "protein", {B}, {"egg"}),
+    Food("Cottage cheese, low-fat", "113 g", 81, 14, 3, 1.2, "protein", {B, S}, {"dairy"}),
+    Food("Whey protein shake", "30 g scoop", 120, 24, 3, 1.5, "protein", {B, S}, {"dairy"}),
+    Food("Pea protein shake", "30 g scoop", 110, 22, 2, 2, "protein", {B, S}, set()),
+    Food("Grilled chicken breast", "100 g", 165, 31, 0, 3.6, "protein", {L, D}, {"meat"}),
+    Food("Roast turkey breast", "100 g", 135, 30, 0, 1, "protein", {L, D}, {"meat"}),
+    Food("Lean beef (95%)", "100 g", 170, 26, 0, 7, "protein", {L, D}, {"meat"}),
+    Food("Baked salmon", "100 g", 206, 22, 0, 12, "protein", {L, D}, {"fish"}),
+    Food("Tuna in water", "100 g", 116, 26, 0, 1, "protein", {L}, {"fish"}),
+    Food("Baked cod", "100 g", 105, 23, 0, 0.9, "protein", {D}, {"fish"}),
+    Food("Shrimp", "100 g", 99, 24, 0.2, 0.3, "protein", {L, D}, {"fish"}),
+    Food("Firm tofu", "150 g", 216, 26, 4, 13, "protein", {L, D}, set()),
+    Food("Tempeh", "100 g", 192, 20, 8, 11, "protein", {L, D}, set()),
+    Food("Lentils, cooked", "1 cup", 230, 18, 40, 0.8, "protein", {L, D}, set()),
+    Food("Edamame", "1 cup", 188, 18.5, 14, 8, "protein", {S}, set()),
+    # Carbohydrate
+    Food("Rolled oats, cooked", "1 cup", 166, 6, 28, 3.6, "carb", {B}, {"gluten"}),
+    Food("Whole-wheat toast", "1 slice", 80, 4, 14, 1, "carb", {B, L}, {"gluten"}),
+    Food("Banana", "1 medium", 105, 1.3, 27, 0.4, "carb", {B, S}, set()),
+    Food("Brown rice, cooked", "1 cup", 218, 4.5, 46, 1.6, "carb", {L, D}, set()),
+    Food("Quinoa, cooked", "1 cup", 222, 8, 39, 3.6, "carb", {L, D}, set()),
+    Food("Baked sweet potato", "150 g", 135, 3, 31, 0.2, "carb", {L, D}, set()),
+    Food("Whole-wheat pasta, cooked", "1 cup", 174, 7.5, 37, 0.8, "carb", {D}, {"gluten"}),
+    Food("Boiled potatoes", "200 g", 174, 3.7, 40, 0.2, "carb", {D}, set()),
+    Food("Whole-wheat tortilla", "1 medium", 130, 4, 22, 3, "carb", {L}, {"gluten"}),
+    Food("Rice cakes", "2 cakes", 70, 1.5, 15, 0.5, "carb", {S}, set()),
+    # Produce
+    Food("Mixed berries", "1 cup", 70, 1, 17, 0.5, "produce", {B, S}, set()),
+    Food("Apple", "1 medium", 95, 0.5, 25, 0.3, "produce", {S}, set()),
+    Food("Sauteed spinach", "1 cup", 41, 5.3, 6.8, 0.5, "produce", {B, L, D}, set()),
+    Food("Steamed broccoli", "1 cup", 55, 3.7, 11, 0.6, "produce", {L, D}, set()),
+    Food("Mixed salad greens", "2 cups", 15, 1.2, 3, 0.2, "produce", {L}, set()),
+    Food("Roasted vegetables", "1 cup", 70, 2, 14, 0.5, "produce", {D}, set()),
+    Food("Green beans", "1 cup", 44, 2.4, 10, 0.4, "produce", {D}, set()),
+    Food("Carrot sticks", "1 cup", 52, 1.2, 12, 0.3, "produce", {S}, set()),
+    # Fat
+    Food("Avocado", "1/2 fruit", 114, 1.3, 6, 10.5, "fat", {B, L}, set()),
+    Food("Olive oil", "1 tbsp", 119, 0, 0, 13.5, "fat", {L, D}, set()),
+    Food("Almonds", "28 g", 164, 6, 6, 14, "fat", {B, S}, {"nuts"}),
+    Food("Peanut butter", "2 tbsp", 188, 8, 6, 16, "fat", {B, S}, {"nuts"}),
+    Food("Walnuts", "28 g", 185, 4.3, 3.9, 18.5, "fat", {S}, {"nuts"}),
+    Food("Chia seeds", "1 tbsp", 58, 2, 5, 3.7, "fat", {B}, set()),
+    Food("Cheddar cheese", "28 g", 113, 7, 0.4, 9.3, "fat", {L}, {"dairy"}),
+    Food("Pumpkin seeds", "28 g", 158, 8.5, 3, 13.9, "fat", {S, L}, set()),
+]
+
+# Ingredients excluded by each recognised dietary preference
+PREFERENCE_EXCLUSIONS = {
+    "vegetarian": {"meat", "fish"},
+    "vegan": {"meat", "fish", "dairy", "egg"},
+    "pescatarian": {"meat"},
+    "gluten-free": {"gluten"},
+    "celiac": {"gluten"},
+    "dairy-free": {"dairy"},
+    "lactose-free": {"dairy"},
+    "lactose intolerant": {"dairy"},
+    "nut-free": {"nuts"},
+    "nut allergy": {"nuts"},
+    "egg-free": {"egg"},
+}
+
+# Share of daily calories per meal, and the food slots each meal is built from
+MEAL_SHARES = {B: 0.25, L: 0.35, D: 0.30, S: 0.10}
+MEAL_SLOTS = {
+    B: ("protein", "carb", "produce", "fat"),
+    L: ("protein", "carb", "produce", "fat"),
+    D: ("protein", "carb", "produce", "fat"),
+    S: ("protein", "produce"),
+}
+
+PLAN_DAYS = 3
+
+# Serving multiples are rounded to this step and kept within these bounds
+SERVING_STEP = 0.25
+MIN_SERVINGS = 0.25
+MAX_SERVINGS = 3.0
+MAX_REFINE_STEPS = 60
+
+# Calories per gram of protein, carbohydrate and fat
+_KCAL_PER_GRAM = np.array([4.0, 4.0, 9.0])
+
+EXERCISES = {
+    "sedentary": [
+        {"name": "Brisk walking", "description": "Walk at a pace that raises your breathing", "duration": "30 minutes", "intensity": "moderate", "frequency": "5 days per week"},
+        {"name": "Bodyweight strength circuit", "description": "Squats, wall push-ups, glute bridges and rows with a band", "duration": "20 minutes", "intensity": "light to moderate", "frequency": "2 days per week"},
+        {"name": "Mobility and stretching", "description": "Gentle full-body stretching routine", "duration": "10 minutes", "intensity": "light", "frequency": "daily"},
+    ],
+    "active": [
+        {"name": "Full-body strength training", "description": "Compound lifts such as squats, deadlifts, presses and rows", "duration": "45 minutes", "intensity": "moderate to high", "frequency": "3 days per week"},
+        {"name": "Interval cardio", "description": "Alternate 1 minute hard and 2 minutes easy on a bike, rower or run", "duration": "25 minutes", "intensity": "high", "frequency": "2 days per week"},
+        {"name": "Steady-state cardio", "description": "Walking, cycling or swimming at a conversational pace", "duration": "40 minutes", "intensity": "moderate", "frequency": "2 days per week"},
+    ],
+}
+
+
+def excluded_ingredients(dietary_preferences: List[str]) -> Set[str]:
+    """
+    Map free-text dietary preferences to excluded ingredient classes
+
+    Args:
+        dietary_preferences: Preferences such as "vegetarian" or "gluten free"
+
+    Returns:
+        Set of ingredient classes to avoid
+    """
+    excluded: Set[str] = set()
+    for preference in dietary_preferences:
+        key = preference.strip().lower().replace("_", "-").replace(" free", "-free")
+        excluded |= PREFERENCE_EXCLUSIONS.get(key, set())
+    return excluded
+
+
+def macro_targets(goals: Dict[str, Any]) -> np.ndarray:
+    """
+    Daily protein, carb and fat targets in grams that add up to the calorie goal
+
+    Protein and fat goals are kept; carbohydrates fill the calories that
+    remain, since the protein floor can push the raw goals past the calorie
+    target.
+    """
+    protein = goals["protein_goal"]
+    fat = goals["fat_goal"]
+    carbs = max(0.0, (goals["calorie_goal"] - 4 * protein - 9 * fat) / 4)
+    return np.array([protein, carbs, fat], dtype=float)
+
+
+def solve_servings(macros: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """
+    Fit serving multiples so a meal's macros match a target
+
+    Solves a least-squares problem in calorie units, dropping foods that
+    would need negative servings, then scales to the target calories and
+    rounds to SERVING_STEP.
+
+    Args:
+        macros: (foods, 3) protein/carb/fat grams per serving
+        target: Target protein/carb/fat grams for the meal
+
+    Returns:
+        Serving multiple for each food
+    """
+    A = (macros * _KCAL_PER_GRAM).T
+    b = target * _KCAL_PER_GRAM
+    active = np.ones(len(macros), dtype=bool)
+    servings = np.zeros(len(macros))
+    while active.any():
+        solution, *_ = np.linalg.lstsq(A[:, active], b, rcond=None)
+        if (solution >= 0).all():
+            servings[active] = solution
+            break
+        active[np.flatnonzero(active)[np.argmin(solution)]] = False
+
+    servings = np.clip(servings, MIN_SERVINGS, MAX_SERVINGS)
+    servings *= b.sum() / max(1e-9, (A @ servings).sum())
+    servings = np.round(np.clip(servings, MIN_SERVINGS, MAX_SERVINGS) / SERVING_STEP) * SERVING_STEP
+    return np.maximum(servings, MIN_SERVINGS)
+
+
+def refine_servings(macros: np.ndarray, servings: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """
+    Greedily nudge servings by SERVING_STEP to bring a day closer to target
+
+    Rounding each meal separately lets the day's totals drift; each step
+    applies the single +/- SERVING_STEP change that most reduces the squared
+    calorie-weighted macro error, until no change helps.
+
+    Args:
+        macros: (foods, 3) protein/carb/fat grams per serving for the day
+        servings: Current serving multiples
+        target: Daily protein/carb/fat targets in grams
+
+    Returns:
+        Refined serving multiples
+    """
+    servings = servings.copy()
+    step = macros * _KCAL_PER_GRAM * SERVING_STEP
+    for _ in range(MAX_REFINE_STEPS):
+        residual = (target - servings @ macros) * _KCAL_PER_GRAM
+        error_up = ((residual - step) ** 2).sum(axis=1)
+        error_down = ((residual + step) ** 2).sum(axis=1)
+        error_up[servings + SERVING_STEP > MAX_SERVINGS] = np.inf
+        error_down[servings - SERVING_STEP < MIN_SERVINGS] = np.inf
+        up, down = int(np.argmin(error_up)), int(np.argmin(error_down))
+        best = min(error_up[up], error_down[down])
+        if best >= (residual ** 2).sum():
+            break
+        if error_up[up] <= error_down[down]:
+            servings[up] += SERVING_STEP
+        else:
+            servings[down] -= SERVING_STEP
+    return servings
+
+
+def _format_food(food: Food, servings: float) -> str:
+    return f"{food.name}: {servings:g} x {food.serving}"
+
+
+def plan_meals(daily_targets: np.ndarray, excluded: Set[str], days: int = PLAN_DAYS) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Build a multi-day meal plan hitting daily macro targets
+
+    Args:
+        daily_targets: Daily protein/carb/fat targets in grams
+        excluded: Ingredient classes to avoid
+        days: Number of days to plan
+
+    Returns:
+        Meals by day ("day1", ...), in the sample_meal_plan format
+    """
+    allowed = [food for food in FOODS if not food.contains & excluded]
+    plan: Dict[str, List[Dict[str, Any]]] = {}
+    for day in range(days):
+        day_meals = []
+        for meal_index, (meal_type, share) in enumerate(MEAL_SHARES.items()):
+            chosen = []
+            for slot_index, slot in enumerate(MEAL_SLOTS[meal_type]):
+                candidates = [food for food in allowed if food.slot == slot and meal_type in food.meals]
+                if candidates:
+                    # Rotate through candidates so days differ but stay reproducible
+                    chosen.append(candidates[(day * (slot_index + 1) + meal_index) % len(candidates)])
+            if chosen:
+                macros = np.array([[food.protein, food.carbs, food.fat] for food in chosen])
+                day_meals.append((meal_type, chosen, macros, solve_servings(macros, daily_targets * share)))
+        if not day_meals:
+            plan[f"day{day + 1}"] = []
+            continue
+
+        # Correct the drift from per-meal rounding across the whole day
+        day_servings = refine_servings(
+            np.vstack([macros for _, _, macros, _ in day_meals]),
+            np.concatenate([servings for _, _, _, servings in day_meals]),
+            daily_targets
+        )
+
+        meals = []
+        offset = 0
+        for meal_type, chosen, macros, _ in day_meals:
+            servings = day_servings[offset:offset + len(chosen)]
+            offset += len(chosen)
+            totals = servings @ macros
+            meals.append({
+                "meal_type": meal_type,
+                "meal_name": " with ".join([chosen[0].name] + [food.name.lower() for food in chosen[1:2]]),
+                "foods": [_format_food(food, amount) for food, amount in zip(chosen, servings)],
+                "calories": int(round(float(servings @ np.array([food.calories for food in chosen])))),
+                "protein": round(float(totals[0]), 1),
+                "carbs": round(float(totals[1]), 1),
+                "fat": round(float(totals[2]), 1),
+            })
+        plan[f"day{day + 1}"] = meals
+    return plan
+
+
+def build_weight_loss_plan(
+    user: UserInDB,
+    target_weight: float,
+    dietary_preferences: List[str]
+) -> WeightLossRecommendation:
+    """
+    Build a complete weight loss plan locally
+
+    Args:
+        user: User profile
+        target_weight: Target weight in kg
+        dietary_preferences: Dietary preferences or restrictions
+
+    Returns:
+        WeightLossRecommendation with rule-based tips and explanation
+    """
+    goals = compute_nutrition_goals(user, target_weight)
+    targets = macro_targets(goals)
+    calorie_goal = goals["calorie_goal"]
+    excluded = excluded_ingredients(dietary_preferences)
+
+    _, tdee = energy.estimate_energy_expenditure(user)
+    losing = user.current_weight > target_weight
+    rate = forecasting.sustainable_weekly_rate(user.current_weight, losing)
+    direction = -1 if losing else 1
+    if user.current_weight == target_weight:
+        direction = 0
+
+    percentages = targets * _KCAL_PER_GRAM / max(1, calorie_goal) * 100
+    weekly_progression_goals = []
+    for week in range(1, 5):
+        expected = user.current_weight + direction * rate * week
+        expected = max(expected, target_weight) if losing else min(expected, target_weight)
+        weekly_progression_goals.append(
+            f"Week {week}: reach about {expected:.1f} kg while averaging {calorie_goal} kcal per day"
+        )
+
+    activity = user.activity_level.lower()
+    exercises = EXERCISES["active" if activity in ("very active", "extremely active", "moderately active") else "sedentary"]
+
+    preference_text = ", ".join(dietary_preferences) if dietary_preferences else "no dietary restrictions"
+    explanation = (
+        f"Your estimated daily energy expenditure is {tdee:.0f} kcal. A target of {calorie_goal} kcal "
+        f"supports a sustainable change of about {rate:.2f} kg per week towards {target_weight:g} kg. "
+        f"Protein is set to {targets[0]:.0f} g to protect lean mass, and the sample meals are built "
+        f"from whole foods to match these targets with {preference_text}."
+    )
+    tips = [
+        "Prepare protein and grains in batches so the planned portions are quick to assemble",
+        "Weigh portions for the first couple of weeks to calibrate your eye",
+        f"Drink water regularly through the day, aiming for about {user.current_weight * 0.033:.1f} litres",
+        "Keep the snack slot flexible: swap it for fruit or vegetables on lower-hunger days",
+    ]
+    challenges = [
+        "Hunger can rise in the first weeks of a deficit; prioritise high-volume vegetables",
+        "Weight fluctuates daily with water and salt, so judge progress on weekly averages",
+    ]
+    unrecognised = [p for p in dietary_preferences if not excluded_ingredients([p])]
+    if unrecognised:
+        challenges.append(
+            f"The sample meals do not account for: {', '.join(unrecognised)}; swap foods as needed"
+        )
+
+    return WeightLossRecommendation(
+        daily_calorie_target=calorie_goal,
+        macronutrient_breakdown={
+            "protein": int(round(percentages[0])),
+            "carbs": int(round(percentages[1])),
+            "fat": int(round(percentages[2])),
+        },
+        sample_meal_plan=plan_meals(targets, excluded),
+        recommended_exercises=exercises,
+        weekly_progression_goals=weekly_progression_goals,
+        explanation=explanation,
+        tips=tips,
+        challenges=challenges,
+    )
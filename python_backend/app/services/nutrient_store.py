@@ -0,0 +1,317 @@
+"""
+Memory-mapped columnar store of food nutrient data
+
+Nutrients live in one file built offline by scripts/build_nutrient_store.py.
+Each nutrient is a fixed-width float32 column (NaN where unknown), and
+names, units and barcodes are packed into one UTF-8 blob with an offsets
+array. Lookups go through sorted arrays of 64-bit key hashes. Every array is
+a numpy view over a read-only mmap of the file, so uvicorn workers share the
+OS page cache instead of each holding their own copy, and a lookup reads
+one row without parsing anything else.
+
+File layout: an 8-byte magic, a little-endian uint64 header length, a JSON
+header describing each section (offset, dtype, shape), then the sections,
+each aligned to 64 bytes.
+"""
+from ..config import settings
+from .barcode_index import normalize_barcode
+from .food_catalog import normalize
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+MAGIC = b"SSNUTR1\0"
+ALIGNMENT = 64
+
+# Nutrient columns, in storage order. Micronutrients follow the core
+# FoodNutritionDetails fields and are returned in its micronutrients dict.
+CORE_COLUMNS = ("serving_size", "calories", "protein", "carbs", "fat", "fiber", "sugar", "sodium", "cholesterol")
+MICRONUTRIENT_COLUMNS = ("saturated_fat", "potassium", "trans_fat", "vitamin_a", "vitamin_c", "calcium", "iron")
+COLUMNS = CORE_COLUMNS + MICRONUTRIENT_COLUMNS
+
+# Text fields packed per row, separated by TEXT_SEPARATOR
+TEXT_FIELDS = ("food_name", "serving_unit", "brand", "photo_url", "barcode")
+TEXT_SEPARATOR = "\x1f"
+
+SERVING_UNITS = {"serving", "servings"}
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def food_key(food_name: str, brand: Optional[str] = None) -> str:
+    """Lookup key for a food name and optional brand"""
+    return f"{normalize(food_name)}|{normalize(brand or '')}"
+
+
+def barcode_key(barcode: str) -> str:
+    """Lookup key for a UPC/EAN barcode"""
+    return normalize_barcode(barcode)
+
+
+class NutrientStore:
+    """Read-only view over a nutrient store file"""
+
+    def __init__(self, path: str):
+        """
+        Map a nutrient store file
+
+        Args:
+            path: Store file written by write_store
+
+        Raises:
+            ValueError: If the file is not a nutrient store
+        """
+        self.path = path
+        with open(path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a nutrient store")
+        (header_length,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(self._mmap[start:start + header_length])
+
+        self.rows = header["rows"]
+        self.columns = header["columns"]
+        self._column_index = {name: index for index, name in enumerate(self.columns)}
+        sections = {
+            name: np.frombuffer(
+                self._mmap,
+                dtype=np.dtype(spec["dtype"]),
+                count=int(np.prod(spec["shape"])),
+                offset=spec["offset"]
+            ).reshape(spec["shape"])
+            for name, spec in header["sections"].items()
+        }
+        self.nutrients = sections["nutrients"]  # (columns, rows) float32
+        self._text = sections["text"]
+        self._text_offsets = sections["text_offsets"]
+        self._food_hashes = sections["food_hashes"]
+        self._food_rows = sections["food_rows"]
+        self._barcode_hashes = sections["barcode_hashes"]
+        self._barcode_rows = sections["barcode_rows"]
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def close(self) -> None:
+        """Drop the array views and unmap the file"""
+        self.nutrients = self._text = self._text_offsets = None
+        self._food_hashes = self._food_rows = self._barcode_hashes = self._barcode_rows = None
+        self._mmap.close()
+
+    def text(self, row: int) -> Dict[str, Optional[str]]:
+        """
+        Decode the text fields of a row
+
+        Args:
+            row: Row number
+
+        Returns:
+            Dictionary of TEXT_FIELDS, with empty fields as None
+        """
+        start, end = self._text_offsets[row], self._text_offsets[row + 1]
+        values = self._text[start:end].tobytes().decode("utf-8").split(TEXT_SEPARATOR)
+        return {field: value or None for field, value in zip(TEXT_FIELDS, values)}
+
+    def find_food(self, food_name: str, brand: Optional[str] = None) -> Optional[int]:
+        """
+        Find the row for a food name and brand
+
+        Args:
+            food_name: Name of the food
+            brand: Optional brand name
+
+        Returns:
+            Row number, or None if the food is not stored
+        """
+        key = food_key(food_name, brand)
+        return self._find(self._food_hashes, self._food_rows, key, lambda text: food_key(text["food_name"], text["brand"]))
+
+    def find_barcode(self, barcode: str) -> Optional[int]:
+        """
+        Find the row for a barcode
+
+        Args:
+            barcode: UPC/EAN barcode
+
+        Returns:
+            Row number, or None if the barcode is not stored
+        """
+        key = barcode_key(barcode)
+        return self._find(self._barcode_hashes, self._barcode_rows, key, lambda text: barcode_key(text["barcode"] or ""))
+
+    def details(self, row: int, serving_size: Optional[float] = None, serving_unit: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Build FoodNutritionDetails fields for a row, scaled to a serving
+
+        Args:
+            row: Row number
+            serving_size: Requested serving size, defaults to the stored serving
+            serving_unit: Requested unit; must be the stored unit or "serving"
+                (a multiple of the stored serving)
+
+        Returns:
+            Nutrition details as a dictionary, or None if the requested unit
+            cannot be converted from the stored one
+        """
+        text = self.text(row)
+        values = self.nutrients[:, row].tolist()
+        stored_size = values[0] if values[0] == values[0] and values[0] > 0 else 1.0
+        unit = normalize(serving_unit or "")
+
+        if serving_size is None:
+            factor = 1.0
+        elif not unit or unit == normalize(text["serving_unit"] or ""):
+            factor = serving_size / stored_size
+        elif unit in SERVING_UNITS:
+            factor = serving_size
+        else:
+            return None
+
+        def value(column: str) -> Optional[float]:
+            number = values[self._column_index[column]]
+            return None if number != number else round(number * factor, 2)
+
+        return {
+            "food_name": text["food_name"],
+            "serving_size": round(stored_size * factor, 2),
+            "serving_unit": text["serving_unit"] or "serving",
+            "calories": int(round(value("calories") or 0)),
+            "protein": value("protein") or 0.0,
+            "carbs": value("carbs") or 0.0,
+            "fat": value("fat") or 0.0,
+            "fiber": value("fiber"),
+            "sugar": value("sugar"),
+            "sodium": value("sodium"),
+            "cholesterol": value("cholesterol"),
+            "photo_url": text["photo_url"],
+            "brand": text["brand"],
+            "barcode": text["barcode"],
+            "micronutrients": {column: value(column) for column in MICRONUTRIENT_COLUMNS},
+        }
+
+    def _find(self, hashes: np.ndarray, rows: np.ndarray, key: str, key_of) -> Optional[int]:
+        """Binary-search a hash index, confirming the key to rule out collisions"""
+        if not key:
+            return None
+        target = np.uint64(_hash(key))
+        index = int(np.searchsorted(hashes, target))
+        while index < len(hashes) and hashes[index] == target:
+            row = int(rows[index])
+            if key_of(self.text(row)) == key:
+                return row
+            index += 1
+        return None
+
+
+def write_store(path: str, foods: Iterable[Dict[str, Any]]) -> int:
+    """
+    Build a nutrient store file from FoodNutritionDetails dictionaries
+
+    The file is written next to path and moved into place atomically, so
+    workers that already mapped the old file keep a consistent view until
+    they reopen it.
+
+    Args:
+        path: Destination file
+        foods: FoodNutritionDetails fields for each food; later duplicates of
+            a name/brand are skipped, and barcodes map to their first food
+
+    Returns:
+        Number of rows written
+    """
+    columns: List[List[float]] = [[] for _ in COLUMNS]
+    text = bytearray()
+    text_offsets = [0]
+    food_index: Dict[int, int] = {}
+    barcode_index: Dict[int, int] = {}
+    seen = set()
+
+    for food in foods:
+        key = food_key(food["food_name"], food.get("brand"))
+        if key in seen:
+            continue
+        seen.add(key)
+        row = len(text_offsets) - 1
+        micronutrients = food.get("micronutrients") or {}
+        for index, column in enumerate(COLUMNS):
+            number = micronutrients.get(column) if column in MICRONUTRIENT_COLUMNS else food.get(column)
+            columns[index].append(float("nan") if number is None else float(number))
+        text += TEXT_SEPARATOR.join(
+            str(food.get(field) or "").replace(TEXT_SEPARATOR, " ") for field in TEXT_FIELDS
+        ).encode("utf-8")
+        text_offsets.append(len(text))
+        food_index.setdefault(_hash(key), row)
+        if food.get("barcode"):
+            barcode_index.setdefault(_hash(barcode_key(str(food["barcode"]))), row)
+
+    def hash_index(index: Dict[int, int]):
+        hashes = np.array(sorted(index), dtype=np.uint64)
+        rows = np.array([index[key] for key in hashes.tolist()], dtype=np.int32)
+        return hashes, rows
+
+    food_hashes, food_rows = hash_index(food_index)
+    barcode_hashes, barcode_rows = hash_index(barcode_index)
+    arrays = {
+        "nutrients": np.array(columns, dtype=np.float32).reshape(len(COLUMNS), len(text_offsets) - 1),
+        "text": np.frombuffer(bytes(text), dtype=np.uint8),
+        "text_offsets": np.array(text_offsets, dtype=np.int64),
+        "food_hashes": food_hashes,
+        "food_rows": food_rows,
+        "barcode_hashes": barcode_hashes,
+        "barcode_rows": barcode_rows,
+    }
+
+    # Lay the sections out after a header sized generously enough for the offsets
+    sections = {name: {"dtype": array.dtype.str, "shape": list(array.shape)} for name, array in arrays.items()}
+    header_room = len(json.dumps({"rows": 0, "columns": COLUMNS, "sections": sections})) + 64 * len(sections)
+    offset = -(-(len(MAGIC) + 8 + header_room) // ALIGNMENT) * ALIGNMENT
+    for name, array in arrays.items():
+        sections[name]["offset"] = offset
+        offset = -(-(offset + array.nbytes) // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({"rows": len(text_offsets) - 1, "columns": list(COLUMNS), "sections": sections}).encode("utf-8")
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as handle:
+        handle.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, array in arrays.items():
+            handle.write(b"\0" * (sections[name]["offset"] - handle.tell()))
+            handle.write(array.tobytes())
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary_path, path)
+    return len(text_offsets) - 1
+
+
+_store: Optional[NutrientStore] = None
+_store_checked = False
+
+
+def get_store() -> Optional[NutrientStore]:
+    """
+    Get the process-wide nutrient store, mapping it on first use
+
+    Returns:
+        The store at settings.NUTRIENT_STORE_PATH, or None if none is configured
+    """
+    global _store, _store_checked
+    if not _store_checked:
+        _store_checked = True
+        path = settings.NUTRIENT_STORE_PATH
+        if path and os.path.exists(path):
+            try:
+                _store = NutrientStore(path)
+                logging.info(f"Mapped nutrient store with {len(_store)} foods from {path}")
+            except (OSError, ValueError) as e:
+                logging.error(f"Could not open nutrient store {path}: {e}")
+    return _store
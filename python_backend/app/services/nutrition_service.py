@@ -4,17 +4,48 @@ from ..models.nutrition import (
     FoodLogCreate, 
     NutritionSummary, 
     FoodSearchResult,
-    FoodNutritionDetails
+    FoodNutritionDetails,
+    FoodNutritionQuery
 )
+from ..models.bulk import BulkItemResult, BulkWriteResult
+from ..models.user import UserInDB
 from ..utils.exception_handler import handle_exceptions
+from ..utils import database, metrics, pagination
+from ..utils.cache import TieredCache
+from ..utils.http_clients import get_nutritionix_session
+from .. import storage
+from . import food_catalog, nutrient_store
+from .barcode_index import BarcodeIndex, normalize_barcode
 
-import aiohttp
+import asyncio
 import json
 import logging
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
-import firebase_admin
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from firebase_admin import firestore
+from pydantic import ValidationError
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack")
+
+# Process-wide caches for Nutritionix lookups, shared by all service instances.
+# Barcode and nutrient data rarely change, so they are kept much longer than
+# search results.
+search_cache = TieredCache(
+    "nutritionix:search",
+    ttl=settings.SEARCH_CACHE_TTL_SECONDS,
+    max_entries=settings.NUTRITION_CACHE_MAX_ENTRIES,
+)
+nutrients_cache = TieredCache(
+    "nutritionix:nutrients",
+    ttl=settings.NUTRIENTS_CACHE_TTL_SECONDS,
+    max_entries=settings.NUTRITION_CACHE_MAX_ENTRIES,
+)
+# Barcode entries wrap the details so unknown barcodes can be cached too
+barcode_cache = TieredCache(
+    "nutritionix:upc",
+    ttl=settings.BARCODE_CACHE_TTL_SECONDS,
+    max_entries=settings.NUTRITION_CACHE_MAX_ENTRIES,
+)
 
 
 class NutritionService:
@@ -23,7 +54,7 @@ class NutritionService:
     def __init__(self):
         """Initialize the nutrition service with necessary connections"""
         # Initialize Firestore DB
-        self.db = firestore.client() if firebase_admin._apps else None
+        self.db = storage.get_client()
         if not self.db:
             logging.warning("Firestore not initialized - nutrition storage features will be limited")
             
@@ -33,11 +64,18 @@ class NutritionService:
         
         if not self.nutritionix_app_id or not self.nutritionix_api_key:
             logging.warning("Nutritionix credentials not found - food search and lookup features will be limited")
+            
+        # Persistent barcode to product index shared by all workers
+        self.barcode_index = BarcodeIndex()
 
     @handle_exceptions
     async def search_food(self, query: str, limit: int = 10) -> List[FoodSearchResult]:
         """
-        Search for food items by name using Nutritionix API
+        Search for food items by name
+        
+        The local food catalog answers first; Nutritionix is only queried when
+        it has too few matches, and every result it returns is added to the
+        catalog.
         
         Args:
             query: Food name or description to search for
@@ -46,55 +84,32 @@ class NutritionService:
         Returns:
             List of food search results
         """
+        local = food_catalog.catalog.search(query, limit) if settings.FOOD_CATALOG_ENABLED else []
+        if len(local) >= min(limit, settings.FOOD_CATALOG_MIN_RESULTS):
+            return [FoodSearchResult(**item) for item in local]
+            
         if not self.nutritionix_app_id or not self.nutritionix_api_key:
+            if local:
+                return [FoodSearchResult(**item) for item in local]
             raise ValueError("Nutritionix credentials not configured")
             
-        async with aiohttp.ClientSession() as session:
-            url = "https://trackapi.nutritionix.com/v2/search/instant"
-            headers = {
-                "x-app-id": self.nutritionix_app_id,
-                "x-app-key": self.nutritionix_api_key
-            }
-            params = {
-                "query": query,
-                "detailed": "true"
-            }
-            
-            async with session.get(url, headers=headers, params=params) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise ValueError(f"Nutritionix API error: {error_text}")
-                    
-                data = await response.json()
-                results = []
-                
-                # Process common foods
-                if "common" in data and data["common"]:
-                    for item in data["common"][:limit]:
-                        results.append(FoodSearchResult(
-                            food_name=item["food_name"],
-                            serving_size=item.get("serving_qty", 1.0),
-                            serving_unit=item.get("serving_unit", "serving"),
-                            calories=item.get("nf_calories"),
-                            photo_url=item.get("photo", {}).get("thumb"),
-                            is_custom=False
-                        ))
-                
-                # Process branded foods
-                if "branded" in data and data["branded"]:
-                    for item in data["branded"][:limit]:
-                        results.append(FoodSearchResult(
-                            food_name=item["food_name"],
-                            serving_size=item.get("serving_qty", 1.0),
-                            serving_unit=item.get("serving_unit", "serving"),
-                            calories=item.get("nf_calories"),
-                            photo_url=item.get("photo", {}).get("thumb"),
-                            brand=item.get("brand_name"),
-                            barcode=item.get("nix_item_id"),
-                            is_custom=False
-                        ))
-                        
-                return results[:limit]
+        cache_key = f"{query.strip().lower()}|{limit}"
+        results = await search_cache.get_or_load(
+            cache_key,
+            lambda: self._fetch_search_results(query, limit)
+        )
+        if settings.FOOD_CATALOG_ENABLED:
+            await self._remember_foods(results)
+        return [FoodSearchResult(**item) for item in results]
+
+    async def _remember_foods(self, results: List[Dict[str, Any]]) -> None:
+        """Seed the local catalog with Nutritionix results and record new ones"""
+        new_items = food_catalog.catalog.add_many(results)
+        if new_items and settings.FOOD_CATALOG_PATH:
+            try:
+                await asyncio.to_thread(food_catalog.append_catalog_file, new_items)
+            except OSError as e:
+                logging.warning(f"Could not record new foods in the catalog file: {e}")
 
     @handle_exceptions
     async def get_food_nutrition(
@@ -107,6 +122,9 @@ class NutritionService:
         """
         Get detailed nutrition information for a food item
         
+        Foods in the local nutrient store are answered from it when the
+        requested unit matches the stored serving; the rest go to Nutritionix.
+        
         Args:
             food_name: Name of the food
             serving_size: Size of the serving
@@ -116,126 +134,460 @@ class NutritionService:
         Returns:
             Detailed nutrition information
         """
+        details = self._stored_nutrition(food_name, serving_size, serving_unit, brand)
+        if details is not None:
+            return FoodNutritionDetails(**details)
+            
         if not self.nutritionix_app_id or not self.nutritionix_api_key:
             raise ValueError("Nutritionix credentials not configured")
             
-        async with aiohttp.ClientSession() as session:
-            url = "https://trackapi.nutritionix.com/v2/natural/nutrients"
-            headers = {
-                "x-app-id": self.nutritionix_app_id,
-                "x-app-key": self.nutritionix_api_key,
-                "Content-Type": "application/json"
-            }
+        details = await nutrients_cache.get_or_load(
+            self._nutrients_cache_key(food_name, serving_size, serving_unit, brand),
+            lambda: self._fetch_food_nutrition(food_name, serving_size, serving_unit, brand)
+        )
+        return FoodNutritionDetails(**details)
+
+    @handle_exceptions
+    async def get_food_nutrition_batch(self, items: List[FoodNutritionQuery]) -> List[Optional[FoodNutritionDetails]]:
+        """
+        Get detailed nutrition information for several foods, e.g. a whole meal
+        
+        Foods found in the nutrient store or the cache are answered locally.
+        The remaining distinct foods are sent to Nutritionix as multi-line
+        natural language queries of up to NUTRITIONIX_BATCH_ITEMS foods each.
+        
+        Args:
+            items: Foods with their serving size, unit and optional brand
             
-            # Construct query
-            query = f"{serving_size} {serving_unit} {food_name}"
-            if brand:
-                query += f" by {brand}"
-                
-            payload = {
-                "query": query,
-                "timezone": "US/Eastern"
-            }
+        Returns:
+            Nutrition details for each item, in the same order; None for
+            foods that are unknown or could not be looked up
+        """
+        if len(items) > settings.NUTRITION_BATCH_MAX:
+            raise ValueError(f"At most {settings.NUTRITION_BATCH_MAX} foods can be looked up at once")
             
-            async with session.post(url, headers=headers, json=payload) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise ValueError(f"Nutritionix API error: {error_text}")
-                    
-                data = await response.json()
+        results: Dict[str, Dict[str, Any]] = {}
+        missing: Dict[str, FoodNutritionQuery] = {}
+        for item in items:
+            key = self._nutrients_cache_key(item.food_name, item.serving_size, item.serving_unit, item.brand)
+            if key in results or key in missing:
+                continue
+            details = self._stored_nutrition(item.food_name, item.serving_size, item.serving_unit, item.brand)
+            if details is None:
+                details = await nutrients_cache.get_fresh(key)
+            if details is not None:
+                results[key] = details
+            else:
+                missing[key] = item
                 
-                if not data.get("foods") or len(data["foods"]) == 0:
-                    raise ValueError(f"No nutrition information found for {food_name}")
-                    
-                food = data["foods"][0]
+        if missing:
+            if not self.nutritionix_app_id or not self.nutritionix_api_key:
+                raise ValueError("Nutritionix credentials not configured")
                 
-                return FoodNutritionDetails(
-                    food_name=food["food_name"],
-                    serving_size=food.get("serving_qty", serving_size),
-                    serving_unit=food.get("serving_unit", serving_unit),
-                    calories=int(food.get("nf_calories", 0)),
-                    protein=float(food.get("nf_protein", 0)),
-                    carbs=float(food.get("nf_total_carbohydrate", 0)),
-                    fat=float(food.get("nf_total_fat", 0)),
-                    fiber=float(food.get("nf_dietary_fiber", 0)) if "nf_dietary_fiber" in food else None,
-                    sugar=float(food.get("nf_sugars", 0)) if "nf_sugars" in food else None,
-                    sodium=float(food.get("nf_sodium", 0)) if "nf_sodium" in food else None,
-                    cholesterol=float(food.get("nf_cholesterol", 0)) if "nf_cholesterol" in food else None,
-                    photo_url=food.get("photo", {}).get("thumb"),
-                    brand=food.get("brand_name"),
-                    micronutrients={
-                        "saturated_fat": food.get("nf_saturated_fat"),
-                        "potassium": food.get("nf_potassium"),
-                        "trans_fat": food.get("nf_trans_fatty_acid"),
-                        "vitamin_a": food.get("nf_vitamin_a_dv"),
-                        "vitamin_c": food.get("nf_vitamin_c_dv"),
-                        "calcium": food.get("nf_calcium_dv"),
-                        "iron": food.get("nf_iron_dv")
-                    }
-                )
+            keys = list(missing)
+            chunk_size = settings.NUTRITIONIX_BATCH_ITEMS
+            chunks = [keys[i:i + chunk_size] for i in range(0, len(keys), chunk_size)]
+            fetched = await asyncio.gather(
+                *(self._fetch_food_nutrition_batch([missing[key] for key in chunk]) for chunk in chunks)
+            )
+            for chunk, chunk_details in zip(chunks, fetched):
+                for key, details in zip(chunk, chunk_details):
+                    results[key] = details
+                    if details is not None:
+                        await nutrients_cache.set(key, details)
+                    
+        keys = [self._nutrients_cache_key(item.food_name, item.serving_size, item.serving_unit, item.brand) for item in items]
+        return [FoodNutritionDetails(**results[key]) if results[key] else None for key in keys]
+
+    def _nutrients_cache_key(self, food_name: str, serving_size: float, serving_unit: str, brand: Optional[str]) -> str:
+        """Cache key shared by single and batch nutrition lookups"""
+        return f"{food_name.strip().lower()}|{serving_size}|{serving_unit.strip().lower()}|{(brand or '').strip().lower()}"
+
+    def _stored_nutrition(
+        self,
+        food_name: str,
+        serving_size: float,
+        serving_unit: str,
+        brand: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Nutrition details from the local nutrient store, if it has the food in a compatible unit"""
+        store = nutrient_store.get_store()
+        if store is None:
+            return None
+        row = store.find_food(food_name, brand)
+        return store.details(row, serving_size, serving_unit) if row is not None else None
 
     @handle_exceptions
     async def lookup_barcode(self, barcode: str) -> FoodNutritionDetails:
         """
         Look up food information by barcode
         
+        Checked in order: the local nutrient store, the barcode cache, the
+        persistent barcode index, then Nutritionix.
+        
         Args:
             barcode: UPC/EAN barcode
             
         Returns:
             Detailed nutrition information for the product
         """
-        if not self.nutritionix_app_id or not self.nutritionix_api_key:
-            raise ValueError("Nutritionix credentials not configured")
+        code = normalize_barcode(barcode)
+        if not code:
+            raise ValueError(f"Invalid barcode: {barcode}")
             
-        async with aiohttp.ClientSession() as session:
-            url = "https://trackapi.nutritionix.com/v2/search/item"
-            headers = {
-                "x-app-id": self.nutritionix_app_id,
-                "x-app-key": self.nutritionix_api_key
-            }
-            params = {
-                "upc": barcode,
-                "claims": "true"
-            }
+        details = (await self._resolve_barcodes([code], strict=True))[code]
+        if details is None:
+            raise ValueError(f"No product found for barcode {barcode}")
+        return FoodNutritionDetails(**details)
+
+    @handle_exceptions
+    async def lookup_barcodes(self, barcodes: List[str]) -> Dict[str, Optional[FoodNutritionDetails]]:
+        """
+        Look up several barcodes at once
+        
+        Index entries for all barcodes are read in one round trip, and only
+        barcodes unknown to every local tier go to Nutritionix.
+        
+        Args:
+            barcodes: UPC/EAN barcodes
+            
+        Returns:
+            Nutrition details keyed by the barcodes as given, None for
+            barcodes that are unknown or could not be looked up
+        """
+        if len(barcodes) > settings.BARCODE_BATCH_MAX:
+            raise ValueError(f"At most {settings.BARCODE_BATCH_MAX} barcodes can be looked up at once")
+            
+        codes = {barcode: normalize_barcode(barcode) for barcode in barcodes}
+        results = await self._resolve_barcodes(sorted({code for code in codes.values() if code}), strict=False)
+        return {
+            barcode: FoodNutritionDetails(**results[code]) if results.get(code) else None
+            for barcode, code in codes.items()
+        }
+
+    async def _resolve_barcodes(self, codes: List[str], strict: bool) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Resolve normalized barcodes through each tier in turn
+        
+        Args:
+            codes: Normalized barcodes
+            strict: Raise upstream errors instead of reporting the barcode as None
+            
+        Returns:
+            Nutrition details (or None when unknown) keyed by barcode
+        """
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        pending = []
+        store = nutrient_store.get_store()
+        for code in codes:
+            row = store.find_barcode(code) if store is not None else None
+            if row is not None:
+                results[code] = store.details(row)
+                continue
+            entry = await barcode_cache.get_fresh(code)
+            if entry is not None:
+                results[code] = entry["details"]
+            else:
+                pending.append(code)
+                
+        if pending:
+            for code, entry in (await self.barcode_index.get_many(pending)).items():
+                results[code] = entry.get("details")
+                await self._cache_barcode(code, results[code])
+            pending = [code for code in pending if code not in results]
+            
+        if pending and (not self.nutritionix_app_id or not self.nutritionix_api_key):
+            if strict:
+                raise ValueError("Nutritionix credentials not configured")
+            results.update({code: None for code in pending})
+        elif pending:
+            # Concurrent scans of the same barcode share one upstream request
+            fetched = await asyncio.gather(
+                *(barcode_cache.flights.do(code, lambda code=code: self._load_barcode(code)) for code in pending),
+                return_exceptions=not strict
+            )
+            for code, details in zip(pending, fetched):
+                if isinstance(details, Exception):
+                    logging.warning(f"Barcode lookup failed for {code}: {details}")
+                    details = None
+                results[code] = details
+        return results
+
+    async def _load_barcode(self, code: str) -> Optional[Dict[str, Any]]:
+        """Fetch a barcode from Nutritionix and record the outcome, found or not"""
+        details = await self._fetch_barcode(code)
+        await self._cache_barcode(code, details)
+        await self.barcode_index.put(code, details)
+        return details
+
+    async def _cache_barcode(self, code: str, details: Optional[Dict[str, Any]]) -> None:
+        """Cache a barcode result; unknown barcodes expire sooner"""
+        ttl = None if details is not None else settings.BARCODE_NEGATIVE_TTL_SECONDS
+        await barcode_cache.set(code, {"details": details}, ttl=ttl)
+
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get hit/miss counters for the Nutritionix caches
+        
+        Returns:
+            Cache statistics keyed by lookup type
+        """
+        return {
+            "search": search_cache.stats(),
+            "nutrients": nutrients_cache.stats(),
+            "barcode": barcode_cache.stats(),
+            "catalog": food_catalog.catalog.stats()
+        }
+
+    def _nutritionix_headers(self) -> Dict[str, str]:
+        """Authentication headers for Nutritionix requests"""
+        return {
+            "x-app-id": self.nutritionix_app_id,
+            "x-app-key": self.nutritionix_api_key
+        }
+
+    async def _fetch_search_results(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Search Nutritionix for foods matching a query
+        
+        Args:
+            query: Food name or description to search for
+            limit: Maximum number of results to return
             
-            async with session.get(url, headers=headers, params=params) as response:
+        Returns:
+            List of food search results as dictionaries
+        """
+        session = get_nutritionix_session()
+        params = {
+            "query": query,
+            "detailed": "true"
+        }
+        
+        with metrics.track_upstream("nutritionix", "search"):
+            async with session.get("/v2/search/instant", headers=self._nutritionix_headers(), params=params) as response:
                 if response.status != 200:
                     error_text = await response.text()
                     raise ValueError(f"Nutritionix API error: {error_text}")
-                    
+                
                 data = await response.json()
+            
+        results = []
+        
+        # Process common foods
+        if "common" in data and data["common"]:
+            for item in data["common"][:limit]:
+                results.append(FoodSearchResult(
+                    food_name=item["food_name"],
+                    serving_size=item.get("serving_qty", 1.0),
+                    serving_unit=item.get("serving_unit", "serving"),
+                    calories=item.get("nf_calories"),
+                    photo_url=item.get("photo", {}).get("thumb"),
+                    is_custom=False
+                ))
+        
+        # Process branded foods
+        if "branded" in data and data["branded"]:
+            for item in data["branded"][:limit]:
+                results.append(FoodSearchResult(
+                    food_name=item["food_name"],
+                    serving_size=item.get("serving_qty", 1.0),
+                    serving_unit=item.get("serving_unit", "serving"),
+                    calories=item.get("nf_calories"),
+                    photo_url=item.get("photo", {}).get("thumb"),
+                    brand=item.get("brand_name"),
+                    barcode=item.get("nix_item_id"),
+                    is_custom=False
+                ))
                 
-                if not data.get("foods") or len(data["foods"]) == 0:
-                    raise ValueError(f"No product found for barcode {barcode}")
-                    
-                food = data["foods"][0]
+        return [result.dict() for result in results[:limit]]
+
+    async def _fetch_food_nutrition(
+        self,
+        food_name: str,
+        serving_size: float,
+        serving_unit: str,
+        brand: Optional[str]
+    ) -> Dict[str, Any]:
+        """
+        Query Nutritionix natural-language nutrients for a single food
+        
+        Args:
+            food_name: Name of the food
+            serving_size: Size of the serving
+            serving_unit: Unit of the serving
+            brand: Optional brand name
+            
+        Returns:
+            Nutrition details as a dictionary
+        """
+        foods = await self._fetch_natural_nutrients(self._natural_query(food_name, serving_size, serving_unit, brand))
+        if not foods:
+            raise ValueError(f"No nutrition information found for {food_name}")
+            
+        return self._parse_food(foods[0], serving_size, serving_unit).dict()
+
+    async def _fetch_food_nutrition_batch(self, items: List[FoodNutritionQuery]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Query Nutritionix for several foods in one natural-language request
+        
+        Nutritionix parses each line into one food and returns them in order.
+        If it returns a different number of foods than were asked for (for
+        example when it splits or cannot match a line), the foods cannot be
+        matched to items reliably, so each item is looked up on its own instead.
+        
+        Args:
+            items: Foods to look up
+            
+        Returns:
+            Nutrition details as dictionaries, in the same order as items;
+            None for items whose own lookup failed
+        """
+        if len(items) > 1:
+            query = "\n".join(
+                self._natural_query(item.food_name, item.serving_size, item.serving_unit, item.brand) for item in items
+            )
+            try:
+                foods = await self._fetch_natural_nutrients(query)
+            except ValueError as e:
+                logging.warning(f"Batched Nutritionix query failed, looking foods up one by one: {e}")
+                foods = []
+            if len(foods) == len(items):
+                return [
+                    self._parse_food(food, item.serving_size, item.serving_unit).dict()
+                    for food, item in zip(foods, items)
+                ]
+                
+        # Through the cache, so foods that resolve are kept even if another fails
+        fetched = await asyncio.gather(*(
+            nutrients_cache.get_or_load(
+                self._nutrients_cache_key(item.food_name, item.serving_size, item.serving_unit, item.brand),
+                lambda item=item: self._fetch_food_nutrition(item.food_name, item.serving_size, item.serving_unit, item.brand)
+            )
+            for item in items
+        ), return_exceptions=True)
+        
+        details: List[Optional[Dict[str, Any]]] = []
+        for item, result in zip(items, fetched):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                logging.warning(f"Nutrition lookup failed for {item.food_name}: {result}")
+                result = None
+            details.append(result)
+        return details
+
+    def _natural_query(self, food_name: str, serving_size: float, serving_unit: str, brand: Optional[str]) -> str:
+        """Natural-language query line for one food"""
+        query = f"{serving_size} {serving_unit} {food_name}"
+        if brand:
+            query += f" by {brand}"
+        return query
+
+    async def _fetch_natural_nutrients(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Post a query to the Nutritionix natural-language nutrients endpoint
+        
+        Args:
+            query: One food per line
+            
+        Returns:
+            The foods Nutritionix recognized, in query order
+        """
+        session = get_nutritionix_session()
+        payload = {
+            "query": query,
+            "timezone": "US/Eastern"
+        }
+        
+        with metrics.track_upstream("nutritionix", "nutrients"):
+            async with session.post("/v2/natural/nutrients", headers=self._nutritionix_headers(), json=payload) as response:
+                if response.status == 404:
+                    # Nutritionix answers 404 when it cannot match any food in the query
+                    return []
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise ValueError(f"Nutritionix API error: {error_text}")
                 
-                return FoodNutritionDetails(
-                    food_name=food["food_name"],
-                    serving_size=food.get("serving_qty", 1.0),
-                    serving_unit=food.get("serving_unit", "serving"),
-                    calories=int(food.get("nf_calories", 0)),
-                    protein=float(food.get("nf_protein", 0)),
-                    carbs=float(food.get("nf_total_carbohydrate", 0)),
-                    fat=float(food.get("nf_total_fat", 0)),
-                    fiber=float(food.get("nf_dietary_fiber", 0)) if "nf_dietary_fiber" in food else None,
-                    sugar=float(food.get("nf_sugars", 0)) if "nf_sugars" in food else None,
-                    sodium=float(food.get("nf_sodium", 0)) if "nf_sodium" in food else None,
-                    cholesterol=float(food.get("nf_cholesterol", 0)) if "nf_cholesterol" in food else None,
-                    photo_url=food.get("photo", {}).get("thumb"),
-                    brand=food.get("brand_name"),
-                    barcode=barcode,
-                    micronutrients={
-                        "saturated_fat": food.get("nf_saturated_fat"),
-                        "potassium": food.get("nf_potassium"),
-                        "trans_fat": food.get("nf_trans_fatty_acid"),
-                        "vitamin_a": food.get("nf_vitamin_a_dv"),
-                        "vitamin_c": food.get("nf_vitamin_c_dv"),
-                        "calcium": food.get("nf_calcium_dv"),
-                        "iron": food.get("nf_iron_dv")
-                    }
-                )
+                data = await response.json()
+            
+        return data.get("foods") or []
+
+    async def _fetch_barcode(self, barcode: str) -> Optional[Dict[str, Any]]:
+        """
+        Look a barcode up on Nutritionix
+        
+        Args:
+            barcode: UPC/EAN barcode
+            
+        Returns:
+            Nutrition details as a dictionary, or None if Nutritionix does not
+            know the barcode
+        """
+        session = get_nutritionix_session()
+        params = {
+            "upc": barcode,
+            "claims": "true"
+        }
+        
+        with metrics.track_upstream("nutritionix", "barcode"):
+            async with session.get("/v2/search/item", headers=self._nutritionix_headers(), params=params) as response:
+                if response.status == 404:
+                    return None
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise ValueError(f"Nutritionix API error: {error_text}")
+                
+                data = await response.json()
+            
+        if not data.get("foods"):
+            return None
+            
+        return self._parse_food(data["foods"][0], barcode=barcode).dict()
+
+    def _parse_food(
+        self,
+        food: Dict[str, Any],
+        serving_size: float = 1.0,
+        serving_unit: str = "serving",
+        barcode: Optional[str] = None
+    ) -> FoodNutritionDetails:
+        """
+        Build nutrition details from a Nutritionix food item
+        
+        Args:
+            food: Food item from a Nutritionix response
+            serving_size: Fallback serving size
+            serving_unit: Fallback serving unit
+            barcode: Barcode to attach to the result
+            
+        Returns:
+            Detailed nutrition information
+        """
+        return FoodNutritionDetails(
+            food_name=food["food_name"],
+            serving_size=food.get("serving_qty", serving_size),
+            serving_unit=food.get("serving_unit", serving_unit),
+            calories=int(food.get("nf_calories", 0)),
+            protein=float(food.get("nf_protein", 0)),
+            carbs=float(food.get("nf_total_carbohydrate", 0)),
+            fat=float(food.get("nf_total_fat", 0)),
+            fiber=float(food.get("nf_dietary_fiber", 0)) if "nf_dietary_fiber" in food else None,
+            sugar=float(food.get("nf_sugars", 0)) if "nf_sugars" in food else None,
+            sodium=float(food.get("nf_sodium", 0)) if "nf_sodium" in food else None,
+            cholesterol=float(food.get("nf_cholesterol", 0)) if "nf_cholesterol" in food else None,
+            photo_url=food.get("photo", {}).get("thumb"),
+            brand=food.get("brand_name"),
+            barcode=barcode,
+            micronutrients={
+                "saturated_fat": food.get("nf_saturated_fat"),
+                "potassium": food.get("nf_potassium"),
+                "trans_fat": food.get("nf_trans_fatty_acid"),
+                "vitamin_a": food.get("nf_vitamin_a_dv"),
+                "vitamin_c": food.get("nf_vitamin_c_dv"),
+                "calcium": food.get("nf_calcium_dv"),
+                "iron": food.get("nf_iron_dv")
+            }
+        )
 
     @handle_exceptions
     async def add_food_log(self, food_log: FoodLogCreate) -> str:
@@ -261,12 +613,86 @@ class NutritionService:
         # Add created_at timestamp
         food_log_dict["created_at"] = datetime.utcnow()
         
-        # Add to database
+        # Add the log and its contribution to the day's rollup atomically
         doc_ref = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_food_logs").document()
-        doc_ref.set(food_log_dict)
+        batch = self.db.batch()
+        batch.set(doc_ref, food_log_dict)
+        await self._commit_with_rollups(batch, food_log.user_id, [(doc_ref.id, food_log_dict, 1)])
         
         return doc_ref.id
 
+    @handle_exceptions
+    async def add_food_logs(self, user_id: str, entries: List[Dict[str, Any]]) -> BulkWriteResult:
+        """
+        Add many food log entries, e.g. when an offline client syncs
+        
+        Entries are validated one by one. Valid entries are written in
+        Firestore batches of at most database.MAX_BATCH_WRITES operations, and
+        each batch updates every affected daily rollup once with the combined
+        totals of its logs for that day.
+        
+        Args:
+            user_id: User the entries belong to
+            entries: Raw FoodLogCreate fields for each entry
+            
+        Returns:
+            Per-entry IDs or validation errors, in submission order
+        """
+        if not self.db:
+            raise ValueError("Firestore not initialized - cannot add food logs")
+        if len(entries) > settings.BULK_WRITE_MAX_ENTRIES:
+            raise ValueError(f"At most {settings.BULK_WRITE_MAX_ENTRIES} entries can be written at once")
+            
+        results = [BulkItemResult(index=index) for index in range(len(entries))]
+        valid = []
+        now = datetime.utcnow()
+        for index, entry in enumerate(entries):
+            try:
+                food_log = FoodLogCreate(**{"user_id": user_id, **entry})
+            except (TypeError, ValidationError) as e:
+                results[index].error = str(e)
+                continue
+            if food_log.user_id != user_id:
+                results[index].error = "Cannot add food log for another user"
+                continue
+            food_log_dict = food_log.dict()
+            food_log_dict["logged_at"] = food_log_dict["logged_at"] or now
+            food_log_dict["created_at"] = now
+            valid.append((index, food_log_dict))
+            
+        # Each batch holds its logs plus one rollup write per day they touch
+        collection = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_food_logs")
+        chunks: List[List[Tuple[int, Dict[str, Any]]]] = []
+        days: set = set()
+        for index, food_log_dict in valid:
+            day = self._log_day(food_log_dict["logged_at"])
+            new_days = len(days) + (day not in days)
+            if chunks and len(chunks[-1]) + 1 + new_days <= database.MAX_BATCH_WRITES:
+                chunks[-1].append((index, food_log_dict))
+                days.add(day)
+            else:
+                chunks.append([(index, food_log_dict)])
+                days = {day}
+                
+        for chunk in chunks:
+            batch = self.db.batch()
+            changes = []
+            for index, food_log_dict in chunk:
+                doc_ref = collection.document()
+                batch.set(doc_ref, food_log_dict)
+                changes.append((doc_ref.id, food_log_dict, 1))
+                results[index].id = doc_ref.id
+            try:
+                await self._commit_with_rollups(batch, user_id, changes)
+            except Exception as e:
+                logging.error(f"Bulk food log batch failed for user {user_id}: {e}")
+                for index, _ in chunk:
+                    results[index].id = None
+                    results[index].error = f"Write failed: {e}"
+                    
+        written = sum(1 for result in results if result.id)
+        return BulkWriteResult(written=written, failed=len(results) - written, results=results)
+
     @handle_exceptions
     async def get_food_logs_by_date(self, user_id: str, date: datetime) -> List[FoodLog]:
         """
@@ -286,6 +712,34 @@ class NutritionService:
         start_date = datetime(date.year, date.month, date.day, 0, 0, 0)
         end_date = start_date + timedelta(days=1)
         
+        logs_by_day = await self.get_food_logs_in_range(user_id, start_date, end_date)
+        return logs_by_day.get(start_date.strftime("%Y-%m-%d"), [])
+
+    @handle_exceptions
+    async def get_food_logs_in_range(
+        self,
+        user_id: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Dict[str, List[FoodLog]]:
+        """
+        Get all food logs for a user in [start_date, end_date), grouped by day
+        
+        Fetches the whole range with a single query, so a multi-day view costs
+        one round trip regardless of how many days it spans.
+        
+        Args:
+            user_id: User ID
+            start_date: Start of the range (inclusive)
+            end_date: End of the range (exclusive)
+            
+        Returns:
+            Food logs keyed by UTC date (YYYY-MM-DD), in chronological order.
+            Days without logs are omitted.
+        """
+        if not self.db:
+            raise ValueError("Firestore not initialized - cannot retrieve food logs")
+            
         # Query database
         query = (
             self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_food_logs")
@@ -295,16 +749,98 @@ class NutritionService:
             .order_by("logged_at")
         )
         
-        docs = query.stream()
+        docs = await database.stream_query(query)
         
-        # Convert to model objects
-        food_logs = []
+        # Convert to model objects and group by day; results are already
+        # ordered by logged_at so each day's list stays chronological
+        logs_by_day: Dict[str, List[FoodLog]] = {}
         for doc in docs:
             data = doc.to_dict()
             data["id"] = doc.id
-            food_logs.append(FoodLog(**data))
+            food_log = FoodLog(**data)
+            logs_by_day.setdefault(self._log_day(food_log.logged_at), []).append(food_log)
+            
+        return logs_by_day
+
+    @handle_exceptions
+    async def get_food_logs_page(
+        self,
+        user_id: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[FoodLog], Optional[str]]:
+        """
+        Get one page of a user's food logs, newest first
+        
+        Args:
+            user_id: User ID
+            start_date: Start of the range (inclusive)
+            end_date: End of the range (exclusive)
+            limit: Maximum number of logs to return
+            cursor: Cursor returned with the previous page
+            
+        Returns:
+            The page of food logs and the cursor for the next (older) page,
+            or None if there are no more logs
+        """
+        if not self.db:
+            raise ValueError("Firestore not initialized - cannot retrieve food logs")
+            
+        collection, query = self._food_logs_query(user_id, start_date, end_date)
+        docs, next_cursor = await pagination.fetch_page(
+            collection, query, ("logged_at",), limit, cursor, descending=True
+        )
+        return [self._food_log(doc) for doc in docs], next_cursor
+
+    async def iter_food_logs(
+        self,
+        user_id: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> AsyncIterator[FoodLog]:
+        """
+        Yield all of a user's food logs in a range, oldest first
+        
+        Logs are fetched EXPORT_PAGE_SIZE at a time, so memory use does not
+        depend on how many logs the user has.
+        
+        Args:
+            user_id: User ID
+            start_date: Start of the range (inclusive)
+            end_date: End of the range (exclusive)
             
-        return food_logs
+        Yields:
+            Food logs
+        """
+        if not self.db:
+            raise ValueError("Firestore not initialized - cannot retrieve food logs")
+            
+        collection, query = self._food_logs_query(user_id, start_date, end_date)
+        async for doc in pagination.iterate_pages(collection, query, ("logged_at",), settings.EXPORT_PAGE_SIZE):
+            yield self._food_log(doc)
+
+    def _food_logs_query(
+        self,
+        user_id: str,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime]
+    ):
+        """Collection and filtered query for a user's food logs in [start_date, end_date)"""
+        collection = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_food_logs")
+        query = collection.where("user_id", "==", user_id)
+        if start_date:
+            query = query.where("logged_at", ">=", start_date)
+        if end_date:
+            query = query.where("logged_at", "<", end_date)
+        return collection, query
+
+    def _food_log(self, doc) -> FoodLog:
+        """Build a FoodLog from its document snapshot"""
+        data = doc.to_dict()
+        data["id"] = doc.id
+        return FoodLog(**data)
 
     @handle_exceptions
     async def update_food_log(self, food_log_id: str, user_id: str, update_data: Dict[str, Any]) -> bool:
@@ -322,19 +858,12 @@ class NutritionService:
         if not self.db:
             raise ValueError("Firestore not initialized - cannot update food log")
             
-        # Get the document
+        # Update the document and move its contribution between rollups
         doc_ref = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_food_logs").document(food_log_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
-            raise ValueError(f"Food log with ID {food_log_id} not found")
-            
-        # Verify owner
-        if doc.to_dict().get("user_id") != user_id:
-            raise ValueError("Cannot update food log: user ID mismatch")
-            
-        # Update the document
-        doc_ref.update(update_data)
+        unrolled_days = await database.run_transaction(
+            self.db, self._change_log_in_transaction, doc_ref, user_id, update_data
+        )
+        await self._rebuild_rollups(user_id, unrolled_days)
         
         return True
 
@@ -353,113 +882,96 @@ class NutritionService:
         if not self.db:
             raise ValueError("Firestore not initialized - cannot delete food log")
             
-        # Get the document
+        # Delete the document and remove it from the day's rollup
         doc_ref = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_food_logs").document(food_log_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
-            raise ValueError(f"Food log with ID {food_log_id} not found")
-            
-        # Verify owner
-        if doc.to_dict().get("user_id") != user_id:
-            raise ValueError("Cannot delete food log: user ID mismatch")
-            
-        # Delete the document
-        doc_ref.delete()
+        unrolled_days = await database.run_transaction(
+            self.db, self._change_log_in_transaction, doc_ref, user_id, None
+        )
+        await self._rebuild_rollups(user_id, unrolled_days)
         
         return True
 
     @handle_exceptions
-    async def get_favorite_foods(self, user_id: str) -> List[FoodLog]:
+    async def get_favorite_foods(
+        self,
+        user_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[FoodLog], Optional[str]]:
         """
-        Get all favorite food logs for a user
+        Get one page of a user's favorite food logs, ordered by food name
         
         Args:
             user_id: User ID
+            limit: Maximum number of favorites to return
+            cursor: Cursor returned with the previous page
             
         Returns:
-            List of favorite food logs
+            The page of favorite food logs and the cursor for the next page,
+            or None if this is the last page
         """
         if not self.db:
             raise ValueError("Firestore not initialized - cannot retrieve favorite foods")
             
-        # Query database
+        collection = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_food_logs")
         query = (
-            self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_food_logs")
+            collection
             .where("user_id", "==", user_id)
             .where("is_favorite", "==", True)
-            .order_by("food_name")
         )
-        
-        docs = query.stream()
-        
-        # Convert to model objects
-        favorite_foods = []
-        for doc in docs:
-            data = doc.to_dict()
-            data["id"] = doc.id
-            favorite_foods.append(FoodLog(**data))
-            
-        return favorite_foods
+        docs, next_cursor = await pagination.fetch_page(collection, query, ("food_name",), limit, cursor)
+        return [self._food_log(doc) for doc in docs], next_cursor
 
     @handle_exceptions
-    async def get_daily_nutrition_summary(self, user_id: str, date: datetime) -> NutritionSummary:
+    async def get_daily_nutrition_summary(
+        self,
+        user_id: str,
+        date: datetime,
+        user: Optional[UserInDB] = None
+    ) -> NutritionSummary:
         """
         Get a summary of nutritional intake for a specific date
         
+        Served from the day's rollup document, so this is a single read.
+        
         Args:
             user_id: User ID
             date: Date to get summary for
+            user: Profile to take nutrition goals from; read from the
+                database when not given
             
         Returns:
             Nutrition summary for the specified date
         """
-        # Get food logs for the date
-        food_logs = await self.get_food_logs_by_date(user_id, date)
+        rollup = await self._get_daily_rollup(user_id, date)
         
-        # Calculate totals
-        total_calories = 0
-        total_protein = 0.0
-        total_carbs = 0.0
-        total_fat = 0.0
-        total_fiber = 0.0
+        total_calories = rollup["total_calories"]
+        total_protein = rollup["total_protein"]
+        total_carbs = rollup["total_carbs"]
+        total_fat = rollup["total_fat"]
+        total_fiber = rollup["total_fiber"]
         
         # Organize logs by meal type
-        meal_breakdown = {
-            "breakfast": [],
-            "lunch": [],
-            "dinner": [],
-            "snack": []
-        }
-        
-        for log in food_logs:
-            total_calories += log.calories
-            total_protein += log.protein
-            total_carbs += log.carbs
-            total_fat += log.fat
-            total_fiber += log.fiber if log.fiber else 0.0
+        meal_breakdown = {meal_type: [] for meal_type in MEAL_TYPES}
+        for log_id, log_data in rollup.get("logs", {}).items():
+            log = FoodLog(**log_data, id=log_id)
+            meal_breakdown[self._meal_key(log.meal_type)].append(log)
+        for logs in meal_breakdown.values():
+            logs.sort(key=lambda log: log.logged_at)
             
-            meal_type = log.meal_type.lower()
-            if meal_type in meal_breakdown:
-                meal_breakdown[meal_type].append(log)
-            else:
-                # Default to snack if unknown meal type
-                meal_breakdown["snack"].append(log)
-                
         # Get user's nutrition goals (if available)
-        calorie_goal = None
-        protein_goal = None
-        carbs_goal = None
-        fat_goal = None
-        
-        if self.db:
-            user_doc = self.db.collection("users").document(user_id).get()
-            if user_doc.exists:
-                user_data = user_doc.to_dict()
-                calorie_goal = user_data.get("calorie_goal")
-                protein_goal = user_data.get("protein_goal")
-                carbs_goal = user_data.get("carbs_goal")
-                fat_goal = user_data.get("fat_goal")
+        if user is not None:
+            user_data = user.dict()
+        elif self.db:
+            user_doc = await database.get_document(self.db.collection("users").document(user_id))
+            user_data = user_doc.to_dict() if user_doc.exists else {}
+        else:
+            user_data = {}
+            
+        calorie_goal = user_data.get("calorie_goal")
+        protein_goal = user_data.get("protein_goal")
+        carbs_goal = user_data.get("carbs_goal")
+        fat_goal = user_data.get("fat_goal")
                 
         # Calculate remaining calories
         remaining_calories = calorie_goal - total_calories if calorie_goal else None
@@ -484,6 +996,322 @@ class NutritionService:
             carbs_goal=carbs_goal,
             fat_goal=fat_goal,
             meal_breakdown=meal_breakdown,
+            meal_totals=rollup.get("meals"),
             remaining_calories=remaining_calories,
             nutrient_percentages=nutrient_percentages
         )
+
+    @handle_exceptions
+    async def rebuild_daily_rollups(self, user_id: Optional[str] = None) -> int:
+        """
+        Recompute daily nutrition rollups from the raw food logs
+        
+        Args:
+            user_id: Only rebuild this user's rollups; all users when omitted
+            
+        Returns:
+            Number of rollup documents written
+        """
+        if not self.db:
+            raise ValueError("Firestore not initialized - cannot rebuild nutrition rollups")
+            
+        logs_query = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_food_logs")
+        rollups_query = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_daily_nutrition")
+        if user_id:
+            logs_query = logs_query.where("user_id", "==", user_id)
+            rollups_query = rollups_query.where("user_id", "==", user_id)
+            
+        # Group the raw logs by user and day
+        logs_by_day: Dict[tuple, List[FoodLog]] = {}
+        for doc in await database.stream_query(logs_query):
+            data = doc.to_dict()
+            data["id"] = doc.id
+            food_log = FoodLog(**data)
+            key = (food_log.user_id, self._log_day(food_log.logged_at))
+            logs_by_day.setdefault(key, []).append(food_log)
+            
+        rollups = {
+            self._rollup_id(log_user_id, day): self._build_rollup(log_user_id, day, logs)
+            for (log_user_id, day), logs in logs_by_day.items()
+        }
+        stale_refs = [
+            doc.reference
+            for doc in await database.stream_query(rollups_query)
+            if doc.id not in rollups
+        ]
+        
+        # Firestore batches are limited to 500 writes
+        writes = [("set", self._rollup_ref(rollup_id), data) for rollup_id, data in rollups.items()]
+        writes += [("delete", ref, None) for ref in stale_refs]
+        for offset in range(0, len(writes), 500):
+            batch = self.db.batch()
+            for operation, ref, data in writes[offset:offset + 500]:
+                if operation == "set":
+                    batch.set(ref, data)
+                else:
+                    batch.delete(ref)
+            await database.commit_batch(batch)
+            
+        return len(rollups)
+
+    def _meal_key(self, meal_type: str) -> str:
+        """Normalize a meal type, defaulting unknown types to snack"""
+        meal_type = (meal_type or "").lower()
+        return meal_type if meal_type in MEAL_TYPES else "snack"
+
+    def _rollup_id(self, user_id: str, day: str) -> str:
+        """Document ID of a user's rollup for a day (YYYY-MM-DD)"""
+        return f"{user_id}_{day}"
+
+    def _rollup_ref(self, rollup_id: str):
+        """Document reference for a daily rollup"""
+        return self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_daily_nutrition").document(rollup_id)
+
+    def _log_day(self, logged_at: datetime) -> str:
+        """
+        UTC date (YYYY-MM-DD) a food log belongs to
+        
+        Firestore stores timestamps in UTC and the log queries use UTC day
+        bounds, so clients' offset timestamps are converted before taking
+        the date. Naive timestamps are already UTC.
+        """
+        if logged_at.tzinfo is not None:
+            logged_at = logged_at.astimezone(timezone.utc)
+        return logged_at.strftime("%Y-%m-%d")
+
+    async def _commit_with_rollups(
+        self,
+        batch,
+        user_id: str,
+        changes: List[Tuple[str, Dict[str, Any], int]]
+    ) -> None:
+        """
+        Commit a batch of food log writes along with their daily rollup changes
+        
+        Days that already have a rollup get their changes as increments in the
+        same batch. Days without one (e.g. logged before rollups existed) are
+        rebuilt from the raw logs once the batch has committed: increments
+        would create a rollup holding only this change, which would then hide
+        the day's other logs from the raw-log fallback.
+        
+        Args:
+            batch: Write batch holding the food log writes
+            user_id: User the logs belong to
+            changes: (log ID, stored food log fields, sign) for each log
+                added (1) or removed (-1)
+        """
+        by_day = self._group_by_day(changes)
+        days = sorted({day for day, _ in by_day})
+        
+        snapshots = await database.get_documents(
+            self.db, [self._rollup_ref(self._rollup_id(user_id, day)) for day in days]
+        )
+        rolled_up = {snapshot.id for snapshot in snapshots if snapshot.exists}
+        for (day, sign), logs in by_day.items():
+            if self._rollup_id(user_id, day) in rolled_up:
+                self._apply_rollup_changes(batch, logs, sign)
+        await database.commit_batch(batch)
+        
+        await self._rebuild_rollups(user_id, [day for day in days if self._rollup_id(user_id, day) not in rolled_up])
+
+    def _change_log_in_transaction(
+        self,
+        transaction,
+        doc_ref,
+        user_id: str,
+        update_data: Optional[Dict[str, Any]]
+    ) -> List[str]:
+        """
+        Update or delete a food log and move its rollup contribution inside a Firestore transaction
+        
+        Reading the log in the transaction means two requests changing the
+        same log cannot both apply their rollup increments: the second is
+        retried, and then sees the log as already changed or gone.
+        
+        Args:
+            transaction: Firestore transaction
+            doc_ref: Reference to the food log
+            user_id: User ID for verification
+            update_data: Fields to update, or None to delete the log
+            
+        Returns:
+            Affected days without a rollup, to rebuild once the transaction
+            has committed
+        """
+        action = "delete" if update_data is None else "update"
+        snapshot = doc_ref.get(transaction=transaction)
+        if not snapshot.exists:
+            raise ValueError(f"Food log with ID {doc_ref.id} not found")
+            
+        # Verify owner
+        current_data = snapshot.to_dict()
+        if current_data.get("user_id") != user_id:
+            raise ValueError(f"Cannot {action} food log: user ID mismatch")
+            
+        changes = [(doc_ref.id, current_data, -1)]
+        if update_data is not None:
+            # Validate the updated log so the document and the rollup get
+            # well-typed values (e.g. logged_at as a timestamp, not a string)
+            updated_data = FoodLog(**{**current_data, **update_data, "id": doc_ref.id}).dict(exclude={"id"})
+            changes.append((doc_ref.id, updated_data, 1))
+            
+        # Firestore transactions must do all their reads before any write
+        by_day = self._group_by_day(changes)
+        days = sorted({day for day, _ in by_day})
+        rolled_up = {
+            day for day in days
+            if self._rollup_ref(self._rollup_id(user_id, day)).get(transaction=transaction).exists
+        }
+        
+        if update_data is None:
+            transaction.delete(doc_ref)
+        else:
+            transaction.update(doc_ref, {field: updated_data.get(field, value) for field, value in update_data.items()})
+        for (day, sign), logs in by_day.items():
+            if day in rolled_up:
+                self._apply_rollup_changes(transaction, logs, sign)
+        return [day for day in days if day not in rolled_up]
+
+    def _group_by_day(
+        self,
+        changes: List[Tuple[str, Dict[str, Any], int]]
+    ) -> Dict[Tuple[str, int], List[Tuple[str, Dict[str, Any]]]]:
+        """Group (log ID, food log fields, sign) changes by UTC day and sign"""
+        by_day: Dict[Tuple[str, int], List[Tuple[str, Dict[str, Any]]]] = {}
+        for log_id, log_data, sign in changes:
+            by_day.setdefault((self._log_day(log_data["logged_at"]), sign), []).append((log_id, log_data))
+        return by_day
+
+    async def _rebuild_rollups(self, user_id: str, days: List[str]) -> None:
+        """Rebuild the given days' rollups from the raw logs"""
+        for day in days:
+            await database.run_transaction(self.db, self._rebuild_rollup_in_transaction, user_id, day)
+
+    def _rebuild_rollup_in_transaction(self, transaction, user_id: str, day: str) -> None:
+        """
+        Recompute one day's rollup from the raw logs inside a Firestore transaction
+        
+        The rollup is read in the transaction too, so a log written to the day
+        meanwhile makes Firestore retry instead of the rebuild overwriting it.
+        
+        Args:
+            transaction: Firestore transaction
+            user_id: User ID
+            day: Date (YYYY-MM-DD)
+        """
+        rollup_ref = self._rollup_ref(self._rollup_id(user_id, day))
+        rollup_ref.get(transaction=transaction)
+        
+        start_date = datetime.strptime(day, "%Y-%m-%d")
+        _, query = self._food_logs_query(user_id, start_date, start_date + timedelta(days=1))
+        logs = [self._food_log(doc) for doc in query.stream(transaction=transaction)]
+        transaction.set(rollup_ref, self._build_rollup(user_id, day, logs))
+
+    def _apply_rollup_changes(self, batch, logs: List[Tuple[str, Dict[str, Any]]], sign: int) -> None:
+        """
+        Add or remove several food logs from one user's daily rollup with a single write
+        
+        Args:
+            batch: Write batch or transaction to add the rollup write to
+            logs: (log ID, stored food log fields) pairs, all for the same user and day
+            sign: 1 to add the logs, -1 to remove them
+        """
+        first = logs[0][1]
+        day = self._log_day(first["logged_at"])
+        totals = {field: 0.0 for field in ("calories", "protein", "carbs", "fat", "fiber")}
+        meals: Dict[str, Dict[str, float]] = {}
+        for _, log_data in logs:
+            meal = meals.setdefault(self._meal_key(log_data.get("meal_type")), {"count": 0, **dict.fromkeys(totals, 0.0)})
+            meal["count"] += 1
+            for field in totals:
+                amount = log_data.get(field) or 0
+                totals[field] += amount
+                meal[field] += amount
+        
+        batch.set(self._rollup_ref(self._rollup_id(first["user_id"], day)), {
+            "user_id": first["user_id"],
+            "date": day,
+            "total_calories": firestore.Increment(sign * int(totals["calories"])),
+            "total_protein": firestore.Increment(sign * totals["protein"]),
+            "total_carbs": firestore.Increment(sign * totals["carbs"]),
+            "total_fat": firestore.Increment(sign * totals["fat"]),
+            "total_fiber": firestore.Increment(sign * totals["fiber"]),
+            "log_count": firestore.Increment(sign * len(logs)),
+            "meals": {
+                meal_key: {
+                    "count": firestore.Increment(sign * meal["count"]),
+                    "calories": firestore.Increment(sign * int(meal["calories"])),
+                    "protein": firestore.Increment(sign * meal["protein"]),
+                    "carbs": firestore.Increment(sign * meal["carbs"]),
+                    "fat": firestore.Increment(sign * meal["fat"]),
+                    "fiber": firestore.Increment(sign * meal["fiber"])
+                }
+                for meal_key, meal in meals.items()
+            },
+            "logs": {
+                log_id: {k: v for k, v in log_data.items() if k != "id"} if sign > 0 else firestore.DELETE_FIELD
+                for log_id, log_data in logs
+            },
+            "updated_at": datetime.utcnow()
+        }, merge=True)
+
+    def _build_rollup(self, user_id: str, day: str, logs: List[FoodLog]) -> Dict[str, Any]:
+        """
+        Compute a complete rollup document from a day's food logs
+        
+        Args:
+            user_id: User ID
+            day: Date (YYYY-MM-DD)
+            logs: All food logs for the user on that day
+            
+        Returns:
+            Rollup document data
+        """
+        meals = {}
+        for log in logs:
+            meal = meals.setdefault(self._meal_key(log.meal_type), {
+                "count": 0, "calories": 0, "protein": 0.0, "carbs": 0.0, "fat": 0.0, "fiber": 0.0
+            })
+            meal["count"] += 1
+            meal["calories"] += log.calories
+            meal["protein"] += log.protein
+            meal["carbs"] += log.carbs
+            meal["fat"] += log.fat
+            meal["fiber"] += log.fiber or 0.0
+            
+        return {
+            "user_id": user_id,
+            "date": day,
+            "total_calories": sum(log.calories for log in logs),
+            "total_protein": sum(log.protein for log in logs),
+            "total_carbs": sum(log.carbs for log in logs),
+            "total_fat": sum(log.fat for log in logs),
+            "total_fiber": sum(log.fiber or 0.0 for log in logs),
+            "log_count": len(logs),
+            "meals": meals,
+            "logs": {log.id: log.dict(exclude={"id"}) for log in logs},
+            "updated_at": datetime.utcnow()
+        }
+
+    async def _get_daily_rollup(self, user_id: str, date: datetime) -> Dict[str, Any]:
+        """
+        Get a user's rollup for a day
+        
+        Falls back to computing it from the raw logs for days that have not
+        been rolled up yet (e.g. before rebuild_daily_rollups has been run).
+        
+        Args:
+            user_id: User ID
+            date: Date to get the rollup for
+            
+        Returns:
+            Rollup document data
+        """
+        day = date.strftime("%Y-%m-%d")
+        if self.db:
+            doc = await database.get_document(self._rollup_ref(self._rollup_id(user_id, day)))
+            if doc.exists:
+                return doc.to_dict()
+                
+        food_logs = await self.get_food_logs_by_date(user_id, date)
+        return self._build_rollup(user_id, day, food_logs)
@@ -1,13 +1,131 @@
 from ..config import settings
 from ..models.user import UserBase, UserCreate, UserUpdate, UserInDB
 from ..utils.exception_handler import handle_exceptions
+from ..utils import database
+from ..utils import passwords
+from ..utils.cache import LRUCache
+from .. import storage
+from . import account_deletion, energy
 
 import logging
+import time
 from typing import Dict, Any, Optional
 from datetime import datetime
-import firebase_admin
-from firebase_admin import firestore, auth
-from passlib.context import CryptContext
+from firebase_admin import auth
+
+# Authenticated users keyed by ID, shared by all service instances. Writes in
+# this process invalidate entries; the TTL bounds staleness across workers.
+user_cache = LRUCache(settings.USER_CACHE_MAX_ENTRIES)
+
+
+# Accounts deleted by this process, kept until every token issued before the
+# deletion has expired. Trusted token claims are checked against it.
+deleted_users = LRUCache(settings.USER_CACHE_MAX_ENTRIES)
+
+
+def invalidate_cached_user(user_id: str) -> None:
+    """
+    Drop a user from the authenticated-user cache
+    
+    Args:
+        user_id: ID of the user whose profile changed
+    """
+    user_cache.delete(user_id)
+
+
+def mark_user_deleted(user_id: str) -> None:
+    """
+    Revoke a deleted account's tokens in this process
+    
+    Args:
+        user_id: ID of the deleted user
+    """
+    expires_at = time.time() + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    deleted_users.set(user_id, True, expires_at, expires_at)
+    user_cache.delete(user_id)
+
+
+def is_deleted_user(user_id: str) -> bool:
+    """
+    Check whether an account was deleted by this process
+    
+    Args:
+        user_id: User ID from a token
+        
+    Returns:
+        True if the account's tokens are revoked
+    """
+    return deleted_users.get(user_id) is not None
+
+
+def compute_nutrition_goals(user: UserInDB, target_weight: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Calculate recommended nutrition goals for a user profile
+    
+    Args:
+        user: User profile
+        target_weight: Target weight in kg (defaults to the profile's target)
+        
+    Returns:
+        Dictionary with recommended calorie and macronutrient goals
+    """
+    if target_weight is None:
+        target_weight = user.target_weight
+        
+    # Calculate TDEE from the Mifflin-St Jeor BMR and activity level
+    _, tdee = energy.estimate_energy_expenditure(user)
+    activity_level = user.activity_level.lower()
+        
+    # Adjust based on weight goal
+    if user.current_weight > target_weight:
+        # For weight loss, create a deficit
+        weight_diff = user.current_weight - target_weight
+        
+        # Larger deficit for more weight to lose
+        if weight_diff > 20:
+            deficit = 750  # More aggressive for significant weight loss
+        elif weight_diff > 10:
+            deficit = 600  # Medium deficit
+        else:
+            deficit = 500  # Standard deficit
+            
+        # Ensure minimum calorie intake
+        min_calories = 1200 if user.gender.lower() == "female" else 1500
+        calorie_goal = max(min_calories, int(tdee - deficit))
+    elif user.current_weight < target_weight:
+        # For weight gain, create a surplus
+        surplus = 500
+        calorie_goal = int(tdee + surplus)
+    else:
+        # For maintenance
+        calorie_goal = int(tdee)
+        
+    # Calculate macronutrient goals
+    protein_pct = 30  # 30% of calories from protein
+    carb_pct = 45     # 45% of calories from carbs
+    fat_pct = 25      # 25% of calories from fat
+    
+    protein_goal = int(calorie_goal * protein_pct / 100 / 4)  # 4 cal/g of protein
+    carb_goal = int(calorie_goal * carb_pct / 100 / 4)        # 4 cal/g of carbs
+    fat_goal = int(calorie_goal * fat_pct / 100 / 9)          # 9 cal/g of fat
+    
+    # Adjust protein based on activity level and goals
+    if "very active" in activity_level or "extremely active" in activity_level:
+        # Higher protein for very active individuals
+        protein_goal = max(protein_goal, int(user.current_weight * 1.8))  # 1.8g per kg bodyweight
+    else:
+        # Standard recommendation
+        protein_goal = max(protein_goal, int(user.current_weight * 1.6))  # 1.6g per kg bodyweight
+        
+    nutrition_goals = {
+        "calorie_goal": calorie_goal,
+        "protein_goal": protein_goal,
+        "carbs_goal": carb_goal,
+        "fat_goal": fat_goal,
+        "fiber_goal": int(calorie_goal / 1000 * 14),  # 14g per 1000 calories
+        "water_goal": int(user.current_weight * 0.033)  # 33ml per kg bodyweight
+    }
+    return nutrition_goals
 
 
 class UserService:
@@ -16,12 +134,9 @@ class UserService:
     def __init__(self):
         """Initialize the user service with necessary connections"""
         # Initialize Firestore DB
-        self.db = firestore.client() if firebase_admin._apps else None
+        self.db = storage.get_client()
         if not self.db:
             logging.warning("Firestore not initialized - user management features will be limited")
-            
-        # Initialize password context for hashing
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
     @handle_exceptions
     async def get_user(self, user_id: str) -> UserInDB:
@@ -34,14 +149,45 @@ class UserService:
         Returns:
             User information
         """
+        user = await self._find_user(user_id)
+        if user is None:
+            raise ValueError(f"User with ID {user_id} not found")
+        return user
+
+    async def get_cached_user(self, user_id: str) -> Optional[UserInDB]:
+        """
+        Get a user by ID, serving recently read profiles from memory
+        
+        Args:
+            user_id: User ID
+            
+        Returns:
+            User information, or None if the account does not exist or was
+            deleted
+        """
+        if is_deleted_user(user_id):
+            return None
+        entry = user_cache.get(user_id)
+        if entry is not None:
+            return entry[0]
+            
+        user = await self._find_user(user_id)
+        if user is None:
+            return None
+        expires_at = time.time() + settings.USER_CACHE_TTL_SECONDS
+        user_cache.set(user_id, user, expires_at, expires_at)
+        return user
+
+    async def _find_user(self, user_id: str) -> Optional[UserInDB]:
+        """Read a user profile, or None if there is none"""
         if not self.db:
             raise ValueError("Firestore not initialized - cannot retrieve user")
             
         doc_ref = self.db.collection("users").document(user_id)
-        doc = doc_ref.get()
+        doc = await database.get_document(doc_ref)
         
         if not doc.exists:
-            raise ValueError(f"User with ID {user_id} not found")
+            return None
             
         user_data = doc.to_dict()
         user_data["id"] = user_id
@@ -64,13 +210,13 @@ class UserService:
             
         # Check if email already exists
         email_query = self.db.collection("users").where("email", "==", user.email).limit(1)
-        email_docs = list(email_query.stream())
+        email_docs = await database.stream_query(email_query)
         
         if email_docs:
             raise ValueError(f"User with email {user.email} already exists")
             
         # Hash password
-        hashed_password = self.pwd_context.hash(user.password)
+        hashed_password = await passwords.hash_password(user.password)
         
         # Prepare user data
         user_data = user.dict(exclude={"password"})
@@ -99,26 +245,7 @@ class UserService:
         # Set default goals
         if "calorie_goal" not in user_data or not user_data["calorie_goal"]:
             # Calculate recommended calorie intake
-            if user.gender.lower() == "male":
-                bmr = 10 * user.current_weight + 6.25 * user.height_cm - 5 * user.age + 5
-            else:
-                bmr = 10 * user.current_weight + 6.25 * user.height_cm - 5 * user.age - 161
-                
-            # Adjust for activity level
-            activity_multipliers = {
-                "sedentary": 1.2,
-                "lightly active": 1.375,
-                "moderately active": 1.55,
-                "very active": 1.725,
-                "extremely active": 1.9
-            }
-            
-            activity_level = user.activity_level.lower()
-            if activity_level in activity_multipliers:
-                tdee = bmr * activity_multipliers[activity_level]
-            else:
-                # Default to moderately active if unknown
-                tdee = bmr * 1.55
+            _, tdee = energy.estimate_energy_expenditure(user)
                 
             # For weight loss, subtract 500 calories (roughly 0.5kg/week)
             if user.current_weight > user.target_weight:
@@ -153,7 +280,7 @@ class UserService:
         
         # Create user in Firestore
         doc_ref = self.db.collection("users").document(user_id)
-        doc_ref.set(user_data)
+        await database.set_document(doc_ref, user_data)
         
         # Add ID to user data and return
         user_data["id"] = user_id
@@ -176,7 +303,7 @@ class UserService:
             
         # Get current user data
         doc_ref = self.db.collection("users").document(user_id)
-        doc = doc_ref.get()
+        doc = await database.get_document(doc_ref)
         
         if not doc.exists:
             raise ValueError(f"User with ID {user_id} not found")
@@ -211,55 +338,43 @@ class UserService:
                 update_data["bmi_category"] = bmi_category
         
         # Update user in Firestore
-        doc_ref.update(update_data)
+        await database.update_document(doc_ref, update_data)
+        invalidate_cached_user(user_id)
         
         # Get updated user data
-        updated_doc = doc_ref.get()
+        updated_doc = await database.get_document(doc_ref)
         updated_data = updated_doc.to_dict()
         updated_data["id"] = user_id
         
         return UserInDB(**updated_data)
 
     @handle_exceptions
-    async def delete_user(self, user_id: str) -> bool:
+    async def delete_user(self, user_id: str) -> Dict[str, Any]:
         """
         Delete a user
         
+        The account is removed before this returns; the user's logs and
+        other data are deleted by a background job (see account_deletion).
+        
         Args:
             user_id: ID of the user to delete
             
         Returns:
-            True if deletion was successful
+            The account deletion job
         """
         if not self.db:
             raise ValueError("Firestore not initialized - cannot delete user")
             
         # Check if user exists
         doc_ref = self.db.collection("users").document(user_id)
-        doc = doc_ref.get()
+        doc = await database.get_document(doc_ref)
         
         if not doc.exists:
             raise ValueError(f"User with ID {user_id} not found")
             
-        # Delete from Firebase Auth if available
-        try:
-            auth.delete_user(user_id)
-        except Exception as e:
-            logging.warning(f"Could not delete Firebase Auth user: {e}")
-            
-        # Delete from Firestore
-        doc_ref.delete()
-        
-        # Delete related data like weight logs and food logs
-        weight_logs = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_weight_logs").where("user_id", "==", user_id).stream()
-        for log in weight_logs:
-            log.reference.delete()
-            
-        food_logs = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_food_logs").where("user_id", "==", user_id).stream()
-        for log in food_logs:
-            log.reference.delete()
-            
-        return True
+        # Revoke tokens first so no new data is written while the job runs
+        mark_user_deleted(user_id)
+        return await account_deletion.get_runner().submit(user_id)
 
     @handle_exceptions
     async def verify_password(self, email: str, password: str) -> Optional[UserInDB]:
@@ -278,7 +393,7 @@ class UserService:
             
         # Find user by email
         query = self.db.collection("users").where("email", "==", email).limit(1)
-        docs = list(query.stream())
+        docs = await database.stream_query(query)
         
         if not docs:
             return None
@@ -291,14 +406,17 @@ class UserService:
             return None
             
         # Verify password
-        if not self.pwd_context.verify(password, user_data["hashed_password"]):
+        is_valid, new_hash = await passwords.verify_password(password, user_data["hashed_password"])
+        if not is_valid:
             return None
             
-        # Update last login time
+        # Update last login time, upgrading the stored hash if the work factor changed
         user_id = user_doc.id
-        self.db.collection("users").document(user_id).update({
-            "last_login": datetime.utcnow()
-        })
+        login_update = {"last_login": datetime.utcnow()}
+        if new_hash:
+            login_update["hashed_password"] = new_hash
+        await database.update_document(self.db.collection("users").document(user_id), login_update)
+        invalidate_cached_user(user_id)
         
         # Return user data
         user_data["id"] = user_id
@@ -321,86 +439,17 @@ class UserService:
         # Get user data
         user = await self.get_user(user_id)
         
-        # Calculate BMR using Mifflin-St Jeor Equation
-        if user.gender.lower() == "male":
-            bmr = 10 * user.current_weight + 6.25 * user.height_cm - 5 * user.age + 5
-        else:
-            bmr = 10 * user.current_weight + 6.25 * user.height_cm - 5 * user.age - 161
-            
-        # Adjust for activity level
-        activity_multipliers = {
-            "sedentary": 1.2,
-            "lightly active": 1.375,
-            "moderately active": 1.55,
-            "very active": 1.725,
-            "extremely active": 1.9
-        }
-        
-        activity_level = user.activity_level.lower()
-        if activity_level in activity_multipliers:
-            tdee = bmr * activity_multipliers[activity_level]
-        else:
-            # Default to moderately active if unknown
-            tdee = bmr * 1.55
-            
-        # Adjust based on weight goal
-        if user.current_weight > user.target_weight:
-            # For weight loss, create a deficit
-            weight_diff = user.current_weight - user.target_weight
-            
-            # Larger deficit for more weight to lose
-            if weight_diff > 20:
-                deficit = 750  # More aggressive for significant weight loss
-            elif weight_diff > 10:
-                deficit = 600  # Medium deficit
-            else:
-                deficit = 500  # Standard deficit
-                
-            # Ensure minimum calorie intake
-            min_calories = 1200 if user.gender.lower() == "female" else 1500
-            calorie_goal = max(min_calories, int(tdee - deficit))
-        elif user.current_weight < user.target_weight:
-            # For weight gain, create a surplus
-            surplus = 500
-            calorie_goal = int(tdee + surplus)
-        else:
-            # For maintenance
-            calorie_goal = int(tdee)
-            
-        # Calculate macronutrient goals
-        protein_pct = 30  # 30% of calories from protein
-        carb_pct = 45     # 45% of calories from carbs
-        fat_pct = 25      # 25% of calories from fat
-        
-        protein_goal = int(calorie_goal * protein_pct / 100 / 4)  # 4 cal/g of protein
-        carb_goal = int(calorie_goal * carb_pct / 100 / 4)        # 4 cal/g of carbs
-        fat_goal = int(calorie_goal * fat_pct / 100 / 9)          # 9 cal/g of fat
-        
-        # Adjust protein based on activity level and goals
-        if "very active" in activity_level or "extremely active" in activity_level:
-            # Higher protein for very active individuals
-            protein_goal = max(protein_goal, int(user.current_weight * 1.8))  # 1.8g per kg bodyweight
-        else:
-            # Standard recommendation
-            protein_goal = max(protein_goal, int(user.current_weight * 1.6))  # 1.6g per kg bodyweight
-            
-        nutrition_goals = {
-            "calorie_goal": calorie_goal,
-            "protein_goal": protein_goal,
-            "carbs_goal": carb_goal,
-            "fat_goal": fat_goal,
-            "fiber_goal": int(calorie_goal / 1000 * 14),  # 14g per 1000 calories
-            "water_goal": int(user.current_weight * 0.033)  # 33ml per kg bodyweight
-        }
+        nutrition_goals = compute_nutrition_goals(user)
         
         # Update user's nutrition goals in database
-        self.db.collection("users").document(user_id).update({
-            "calorie_goal": calorie_goal,
-            "protein_goal": protein_goal,
-            "carbs_goal": carb_goal,
-            "fat_goal": fat_goal,
+        await database.update_document(self.db.collection("users").document(user_id), {
+            "calorie_goal": nutrition_goals["calorie_goal"],
+            "protein_goal": nutrition_goals["protein_goal"],
+            "carbs_goal": nutrition_goals["carbs_goal"],
+            "fat_goal": nutrition_goals["fat_goal"],
             "updated_at": datetime.utcnow()
         })
+        invalidate_cached_user(user_id)
         
         return nutrition_goals
 
@@ -420,7 +469,7 @@ class UserService:
             
         # Find user by email
         query = self.db.collection("users").where("email", "==", email).limit(1)
-        docs = list(query.stream())
+        docs = await database.stream_query(query)
         
         if not docs:
             return None
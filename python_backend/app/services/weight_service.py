@@ -1,13 +1,20 @@
 from ..config import settings
 from ..models.weight import WeightLog, WeightLogCreate, WeightStats
+from ..models.bulk import BulkItemResult, BulkWriteResult
+from ..models.user import UserInDB
 from ..utils.exception_handler import handle_exceptions
+from ..utils import database, pagination
+from .. import storage
+from .user_service import invalidate_cached_user
+from . import weight_stats
 
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
-import firebase_admin
 from firebase_admin import firestore
 import numpy as np
+from pydantic import ValidationError
 
 
 class WeightService:
@@ -16,7 +23,7 @@ class WeightService:
     def __init__(self):
         """Initialize the weight service with necessary connections"""
         # Initialize Firestore DB
-        self.db = firestore.client() if firebase_admin._apps else None
+        self.db = storage.get_client()
         if not self.db:
             logging.warning("Firestore not initialized - weight tracking features will be limited")
 
@@ -46,13 +53,94 @@ class WeightService:
         
         # Add to database
         doc_ref = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_weight_logs").document()
-        doc_ref.set(weight_log_dict)
+        await database.set_document(doc_ref, weight_log_dict)
         
-        # Update user's current weight
+        # Update user's current weight and weight statistics
         await self._update_user_weight(weight_log.user_id, weight_log.weight_kg)
+        await self._apply_stats_change(
+            weight_log.user_id,
+            added=weight_stats.log_entry(doc_ref.id, weight_log_dict)
+        )
         
         return doc_ref.id
 
+    @handle_exceptions
+    async def add_weight_logs(self, user_id: str, entries: List[Dict[str, Any]]) -> BulkWriteResult:
+        """
+        Add many weight log entries, e.g. when an offline client syncs
+        
+        Entries are validated one by one and valid ones are written in
+        Firestore batches of at most database.MAX_BATCH_WRITES. The statistics
+        record and the user's current weight are then updated once for the
+        whole request rather than once per entry.
+        
+        Args:
+            user_id: User the entries belong to
+            entries: Raw WeightLogCreate fields for each entry
+            
+        Returns:
+            Per-entry IDs or validation errors, in submission order
+        """
+        if not self.db:
+            raise ValueError("Firestore not initialized - cannot add weight logs")
+        if len(entries) > settings.BULK_WRITE_MAX_ENTRIES:
+            raise ValueError(f"At most {settings.BULK_WRITE_MAX_ENTRIES} entries can be written at once")
+            
+        results = [BulkItemResult(index=index) for index in range(len(entries))]
+        valid = []
+        now = datetime.utcnow()
+        for index, entry in enumerate(entries):
+            try:
+                weight_log = WeightLogCreate(**{"user_id": user_id, **entry})
+            except (TypeError, ValidationError) as e:
+                results[index].error = str(e)
+                continue
+            if weight_log.user_id != user_id:
+                results[index].error = "Cannot add weight log for another user"
+                continue
+            weight_log_dict = weight_log.dict()
+            weight_log_dict["logged_at"] = weight_log_dict["logged_at"] or now
+            weight_log_dict["created_at"] = now
+            valid.append((index, weight_log_dict))
+            
+        collection = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_weight_logs")
+        added = []
+        for start in range(0, len(valid), database.MAX_BATCH_WRITES):
+            chunk = valid[start:start + database.MAX_BATCH_WRITES]
+            batch = self.db.batch()
+            chunk_entries = []
+            for index, weight_log_dict in chunk:
+                doc_ref = collection.document()
+                batch.set(doc_ref, weight_log_dict)
+                chunk_entries.append((index, doc_ref.id, weight_log_dict))
+            try:
+                await database.commit_batch(batch)
+            except Exception as e:
+                logging.error(f"Bulk weight log batch failed for user {user_id}: {e}")
+                for index, _, _ in chunk_entries:
+                    results[index].error = f"Write failed: {e}"
+                continue
+            for index, log_id, weight_log_dict in chunk_entries:
+                results[index].id = log_id
+                added.append(weight_stats.log_entry(log_id, weight_log_dict))
+                
+        if added:
+            needs_rebuild = await database.run_transaction(
+                self.db,
+                weight_stats.add_logs_in_transaction,
+                self._stats_ref(user_id),
+                added
+            )
+            if needs_rebuild:
+                await self.rebuild_weight_stats(user_id)
+            # Historical entries must not overwrite a newer current weight
+            latest_log = await self._get_latest_weight_log(user_id)
+            if latest_log:
+                await self._update_user_weight(user_id, latest_log.weight_kg)
+                
+        written = len(added)
+        return BulkWriteResult(written=written, failed=len(results) - written, results=results)
+
     @handle_exceptions
     async def get_weight_logs(
         self, 
@@ -71,40 +159,96 @@ class WeightService:
             limit: Maximum number of logs to return
             
         Returns:
-            List of weight logs
+            The most recent logs in the range, oldest first
+        """
+        weight_logs, _ = await self.get_weight_logs_page(user_id, start_date, end_date, limit)
+        return weight_logs
+
+    @handle_exceptions
+    async def get_weight_logs_page(
+        self,
+        user_id: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[WeightLog], Optional[str]]:
+        """
+        Get one page of a user's weight logs within a date range
+        
+        Pages walk back in time: the first page holds the most recent logs
+        and each cursor leads to the next older page. Logs within a page are
+        returned oldest first.
+        
+        Args:
+            user_id: User ID
+            start_date: Start date (inclusive)
+            end_date: End date (inclusive)
+            limit: Maximum number of logs to return
+            cursor: Cursor returned with the previous page
+            
+        Returns:
+            The page of weight logs and the cursor for the next page, or None
+            if there are no older logs
         """
         if not self.db:
             raise ValueError("Firestore not initialized - cannot retrieve weight logs")
             
-        # Build query
-        query = (
-            self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_weight_logs")
-            .where("user_id", "==", user_id)
-            .order_by("logged_at", direction=firestore.Query.DESCENDING)
-            .limit(limit)
+        collection, query = self._weight_logs_query(user_id, start_date, end_date)
+        docs, next_cursor = await pagination.fetch_page(
+            collection, query, ("logged_at",), limit, cursor, descending=True
         )
         
-        # Add date filters if provided
-        if start_date:
-            query = query.where("logged_at", ">=", start_date)
-        if end_date:
-            end_date_plus_one = end_date + timedelta(days=1)
-            query = query.where("logged_at", "<", end_date_plus_one)
-            
-        # Execute query
-        docs = query.stream()
+        # Newest first from the query, so reversing gives ascending order without a sort
+        return [self._weight_log(doc) for doc in reversed(docs)], next_cursor
+
+    async def iter_weight_logs(
+        self,
+        user_id: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> AsyncIterator[WeightLog]:
+        """
+        Yield all of a user's weight logs in a date range, oldest first
         
-        # Convert to model objects
-        weight_logs = []
-        for doc in docs:
-            data = doc.to_dict()
-            data["id"] = doc.id
-            weight_logs.append(WeightLog(**data))
+        Logs are fetched EXPORT_PAGE_SIZE at a time, so memory use does not
+        depend on how many logs the user has.
+        
+        Args:
+            user_id: User ID
+            start_date: Start date (inclusive)
+            end_date: End date (inclusive)
             
-        # Sort by date (ascending)
-        weight_logs.sort(key=lambda x: x.logged_at)
+        Yields:
+            Weight logs
+        """
+        if not self.db:
+            raise ValueError("Firestore not initialized - cannot retrieve weight logs")
             
-        return weight_logs
+        collection, query = self._weight_logs_query(user_id, start_date, end_date)
+        async for doc in pagination.iterate_pages(collection, query, ("logged_at",), settings.EXPORT_PAGE_SIZE):
+            yield self._weight_log(doc)
+
+    def _weight_logs_query(
+        self,
+        user_id: str,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime]
+    ):
+        """Collection and filtered query for a user's weight logs in a date range"""
+        collection = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_weight_logs")
+        query = collection.where("user_id", "==", user_id)
+        if start_date:
+            query = query.where("logged_at", ">=", start_date)
+        if end_date:
+            query = query.where("logged_at", "<", end_date + timedelta(days=1))
+        return collection, query
+
+    def _weight_log(self, doc) -> WeightLog:
+        """Build a WeightLog from its document snapshot"""
+        data = doc.to_dict()
+        data["id"] = doc.id
+        return WeightLog(**data)
 
     @handle_exceptions
     async def update_weight_log(
@@ -129,17 +273,26 @@ class WeightService:
             
         # Get the document
         doc_ref = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_weight_logs").document(weight_log_id)
-        doc = doc_ref.get()
+        doc = await database.get_document(doc_ref)
         
         if not doc.exists:
             raise ValueError(f"Weight log with ID {weight_log_id} not found")
             
         # Verify owner
-        if doc.to_dict().get("user_id") != user_id:
+        current_data = doc.to_dict()
+        if current_data.get("user_id") != user_id:
             raise ValueError("Cannot update weight log: user ID mismatch")
             
+        # Validate the updated log so the statistics see well-typed values
+        updated_log = WeightLog(**{**current_data, **update_data, "id": weight_log_id})
+            
         # Update the document
-        doc_ref.update(update_data)
+        await database.update_document(doc_ref, update_data)
+        await self._apply_stats_change(
+            user_id,
+            removed=weight_stats.log_entry(weight_log_id, current_data),
+            added=weight_stats.log_entry(weight_log_id, updated_log.dict())
+        )
         
         # Update user's current weight if this is the most recent entry and weight changed
         if "weight_kg" in update_data:
@@ -166,7 +319,7 @@ class WeightService:
             
         # Get the document
         doc_ref = self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_weight_logs").document(weight_log_id)
-        doc = doc_ref.get()
+        doc = await database.get_document(doc_ref)
         
         if not doc.exists:
             raise ValueError(f"Weight log with ID {weight_log_id} not found")
@@ -183,7 +336,11 @@ class WeightService:
             is_latest = True
             
         # Delete the document
-        doc_ref.delete()
+        await database.delete_document(doc_ref)
+        await self._apply_stats_change(
+            user_id,
+            removed=weight_stats.log_entry(weight_log_id, doc_data)
+        )
         
         # Update user's current weight if needed
         if is_latest:
@@ -194,12 +351,17 @@ class WeightService:
         return True
 
     @handle_exceptions
-    async def get_weight_stats(self, user_id: str) -> WeightStats:
+    async def get_weight_stats(self, user_id: str, user: Optional[UserInDB] = None) -> WeightStats:
         """
         Get weight statistics for a user
         
+        Answered from the user's maintained stats record, without reading
+        the weight log history.
+        
         Args:
             user_id: User ID
+            user: Profile to take target and BMI data from; read from the
+                database when not given
             
         Returns:
             Weight statistics
@@ -208,16 +370,19 @@ class WeightService:
             raise ValueError("Firestore not initialized - cannot retrieve weight stats")
             
         # Get user data
-        user_doc = self.db.collection("users").document(user_id).get()
-        if not user_doc.exists:
-            raise ValueError(f"User with ID {user_id} not found")
-            
-        user_data = user_doc.to_dict()
+        if user is not None:
+            user_data = user.dict()
+        else:
+            user_doc = await database.get_document(self.db.collection("users").document(user_id))
+            if not user_doc.exists:
+                raise ValueError(f"User with ID {user_id} not found")
+            user_data = user_doc.to_dict()
         
-        # Get weight logs
-        all_logs = await self.get_weight_logs(user_id)
+        # Get the statistics record
+        record = await self._get_stats_record(user_id)
+        recent = record["recent"]
         
-        if not all_logs:
+        if not recent:
             # No weight logs, use user data
             return WeightStats(
                 current_weight=user_data.get("current_weight", 0),
@@ -229,16 +394,13 @@ class WeightService:
                 weight_logs=[]
             )
             
-        # Sort logs by date
-        all_logs.sort(key=lambda x: x.logged_at)
-        
         # Current weight (latest log)
-        current_weight = all_logs[-1].weight_kg
+        current_weight = recent[-1]["weight_kg"]
         
-        # Starting weight (first log or user starting weight)
+        # Starting weight (user starting weight or first log)
         starting_weight = user_data.get("starting_weight")
         if not starting_weight:
-            starting_weight = all_logs[0].weight_kg
+            starting_weight = record["first_weight"]
             
         # Target weight from user data
         target_weight = user_data.get("target_weight", 0)
@@ -246,45 +408,24 @@ class WeightService:
         # Total change
         total_change = current_weight - starting_weight
         
-        # Weekly and monthly changes
-        now = datetime.utcnow()
-        week_ago = now - timedelta(days=7)
-        month_ago = now - timedelta(days=30)
-        
+        # Weekly and monthly changes against the logs nearest to 7 and 30 days ago
+        now = time.time()
         weekly_change = None
         monthly_change = None
         
-        # Find log closest to a week ago
-        week_ago_log = None
-        min_week_diff = float('inf')
-        
-        for log in all_logs:
-            diff = abs((log.logged_at - week_ago).total_seconds())
-            if diff < min_week_diff:
-                min_week_diff = diff
-                week_ago_log = log
-                
-        if week_ago_log and min_week_diff < 86400 * 4:  # Within 4 days
-            weekly_change = current_weight - week_ago_log.weight_kg
-            
-        # Find log closest to a month ago
-        month_ago_log = None
-        min_month_diff = float('inf')
-        
-        for log in all_logs:
-            diff = abs((log.logged_at - month_ago).total_seconds())
-            if diff < min_month_diff:
-                min_month_diff = diff
-                month_ago_log = log
-                
-        if month_ago_log and min_month_diff < 86400 * 7:  # Within 7 days
-            monthly_change = current_weight - month_ago_log.weight_kg
+        week_ago_log = weight_stats.nearest_log(recent, now - 7 * 86400)
+        if week_ago_log and abs(week_ago_log["t"] - (now - 7 * 86400)) < 86400 * 4:  # Within 4 days
+            weekly_change = current_weight - week_ago_log["weight_kg"]
+            
+        month_ago_log = weight_stats.nearest_log(recent, now - 30 * 86400)
+        if month_ago_log and abs(month_ago_log["t"] - (now - 30 * 86400)) < 86400 * 7:  # Within 7 days
+            monthly_change = current_weight - month_ago_log["weight_kg"]
             
         # Calculate BMI if height is available
         bmi = user_data.get("bmi")
         bmi_category = user_data.get("bmi_category")
         
-        if not bmi and "height_cm" in user_data:
+        if not bmi and user_data.get("height_cm"):
             height_m = user_data["height_cm"] / 100
             bmi = current_weight / (height_m * height_m)
             
@@ -298,30 +439,44 @@ class WeightService:
             else:
                 bmi_category = "Obese"
                 
-        # Prepare trend data
-        trend_data = []
-        for log in all_logs:
-            trend_data.append({
+        # Recent logs and trend data
+        weight_logs = [
+            WeightLog(
+                id=entry["id"],
+                user_id=user_id,
+                weight_kg=entry["weight_kg"],
+                notes=entry.get("notes"),
+                logged_at=entry["logged_at"],
+                created_at=entry["created_at"]
+            )
+            for entry in recent
+        ]
+        trend_data = [
+            {
                 "date": log.logged_at.strftime("%Y-%m-%d"),
                 "weight": log.weight_kg,
                 "notes": log.notes
-            })
+            }
+            for log in weight_logs
+        ]
+        
+        # Long-term trend from the running regression over all logs
+        slope_per_day = weight_stats.regression_slope(record)
+        trend_kg_per_week = slope_per_day * 7 if slope_per_day is not None else None
             
-        # Calculate estimated completion date based on recent trend
+        # Calculate estimated completion date based on the last 30 days
         estimated_completion_date = None
-        if len(all_logs) >= 2 and target_weight != current_weight:
-            # Use the most recent 30 days or less of data
-            recent_cutoff = now - timedelta(days=30)
-            recent_logs = [log for log in all_logs if log.logged_at >= recent_cutoff]
+        if len(recent) >= 2 and target_weight != current_weight:
+            recent_logs = [entry for entry in recent if entry["t"] >= now - 30 * 86400]
             
             if len(recent_logs) >= 2:
                 # Calculate average daily change
                 first_recent = recent_logs[0]
                 last_recent = recent_logs[-1]
-                days_diff = (last_recent.logged_at - first_recent.logged_at).days
+                days_diff = int((last_recent["t"] - first_recent["t"]) // 86400)
                 
                 if days_diff > 0:
-                    avg_daily_change = (last_recent.weight_kg - first_recent.weight_kg) / days_diff
+                    avg_daily_change = (last_recent["weight_kg"] - first_recent["weight_kg"]) / days_diff
                     
                     if avg_daily_change != 0:
                         # Calculate days until target
@@ -333,7 +488,7 @@ class WeightService:
                         is_trending_down = avg_daily_change < 0
                         
                         if (is_losing and is_trending_down) or (not is_losing and not is_trending_down):
-                            estimated_completion_date = now + timedelta(days=days_to_target)
+                            estimated_completion_date = datetime.utcnow() + timedelta(days=days_to_target)
                             
         # Target date from user data
         target_date = user_data.get("target_date")
@@ -345,14 +500,85 @@ class WeightService:
             total_change=total_change,
             weekly_change=weekly_change,
             monthly_change=monthly_change,
+            min_weight=record["min_weight"],
+            max_weight=record["max_weight"],
+            trend_kg_per_week=trend_kg_per_week,
             bmi=bmi,
             bmi_category=bmi_category,
-            weight_logs=all_logs,
+            weight_logs=weight_logs,
             trend_data=trend_data,
             target_date=target_date,
             estimated_completion_date=estimated_completion_date
         )
 
+    @handle_exceptions
+    async def rebuild_weight_stats(self, user_id: str) -> Dict[str, Any]:
+        """
+        Recompute a user's weight statistics record from their full log history
+        
+        Args:
+            user_id: User ID
+            
+        Returns:
+            The rebuilt statistics record
+        """
+        if not self.db:
+            raise ValueError("Firestore not initialized - cannot rebuild weight stats")
+            
+        query = (
+            self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_weight_logs")
+            .where("user_id", "==", user_id)
+        )
+        return await database.run_transaction(
+            self.db, weight_stats.rebuild_in_transaction, self._stats_ref(user_id), query, user_id
+        )
+
+    def _stats_ref(self, user_id: str):
+        """Document reference for a user's weight statistics record"""
+        return self.db.collection(settings.APP_NAME.lower().replace(" ", "_") + "_weight_stats").document(user_id)
+
+    async def _get_stats_record(self, user_id: str) -> Dict[str, Any]:
+        """
+        Get a user's weight statistics record, building it on first use
+        
+        Args:
+            user_id: User ID
+            
+        Returns:
+            Statistics record
+        """
+        doc = await database.get_document(self._stats_ref(user_id))
+        if doc.exists:
+            return doc.to_dict()
+        return await self.rebuild_weight_stats(user_id)
+
+    async def _apply_stats_change(
+        self,
+        user_id: str,
+        removed: Optional[Dict[str, Any]] = None,
+        added: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Fold a weight log change into the user's statistics record
+        
+        Falls back to a full rebuild when the record is missing or the change
+        cannot be applied exactly (e.g. deleting the minimum weight).
+        
+        Args:
+            user_id: User ID
+            removed: Log entry being removed or replaced
+            added: Log entry being added or its replacement
+        """
+        needs_rebuild = await database.run_transaction(
+            self.db,
+            weight_stats.apply_change_in_transaction,
+            self._stats_ref(user_id),
+            removed,
+            added
+        )
+        if needs_rebuild:
+            await self.rebuild_weight_stats(user_id)
+
     @handle_exceptions
     async def _get_latest_weight_log(self, user_id: str) -> Optional[WeightLog]:
         """
@@ -374,7 +600,7 @@ class WeightService:
             .limit(1)
         )
         
-        docs = list(query.stream())
+        docs = await database.stream_query(query)
         
         if not docs:
             return None
@@ -402,7 +628,7 @@ class WeightService:
             
         # Get user document
         user_ref = self.db.collection("users").document(user_id)
-        user_doc = user_ref.get()
+        user_doc = await database.get_document(user_ref)
         
         if not user_doc.exists:
             return False
@@ -412,14 +638,14 @@ class WeightService:
         
         # If this is the first weight, set starting weight too
         if "starting_weight" not in user_data or user_data["starting_weight"] is None:
-            user_ref.update({
+            await database.update_document(user_ref, {
                 "current_weight": weight_kg,
                 "starting_weight": weight_kg,
                 "updated_at": datetime.utcnow()
             })
         else:
             # Just update current weight
-            user_ref.update({
+            await database.update_document(user_ref, {
                 "current_weight": weight_kg,
                 "updated_at": datetime.utcnow()
             })
@@ -439,9 +665,10 @@ class WeightService:
             else:
                 bmi_category = "Obese"
                 
-            user_ref.update({
+            await database.update_document(user_ref, {
                 "bmi": bmi,
                 "bmi_category": bmi_category
             })
             
+        invalidate_cached_user(user_id)
         return True
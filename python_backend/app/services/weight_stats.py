@@ -0,0 +1,272 @@
+"""
+Incrementally maintained weight statistics
+
+Each user has one stats record that weight log writes keep up to date, so
+/weight/stats never scans the log history. The record holds all-time
+aggregates (count, first log, min/max, running regression sums) plus the
+most recent RECENT_LOG_LIMIT logs, which the rolling 7/30-day anchors and
+trend data are derived from.
+"""
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Number of most recent logs kept in the record (matches the history
+# get_weight_stats used to load)
+RECENT_LOG_LIMIT = 100
+
+# Regression times are measured in days from a fixed origin to keep the
+# running sums well conditioned
+_ORIGIN = datetime(2020, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+def to_timestamp(value: datetime) -> float:
+    """Convert a datetime to a UTC epoch timestamp, treating naive values as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def log_entry(log_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the compact form of a weight log stored in the stats record
+
+    Args:
+        log_id: Weight log ID
+        data: Stored weight log fields
+
+    Returns:
+        Log entry for the record
+    """
+    return {
+        "id": log_id,
+        "t": to_timestamp(data["logged_at"]),
+        "weight_kg": data["weight_kg"],
+        "notes": data.get("notes"),
+        "logged_at": data["logged_at"],
+        "created_at": data.get("created_at") or data["logged_at"],
+    }
+
+
+def new_record(user_id: str) -> Dict[str, Any]:
+    """Create an empty stats record"""
+    return {
+        "user_id": user_id,
+        "count": 0,
+        "first_t": None,
+        "first_weight": None,
+        "min_weight": None,
+        "max_weight": None,
+        "sum_t": 0.0,
+        "sum_w": 0.0,
+        "sum_tt": 0.0,
+        "sum_tw": 0.0,
+        "recent": [],
+    }
+
+
+def add_log(record: Dict[str, Any], entry: Dict[str, Any]) -> None:
+    """
+    Fold a new weight log into the record
+
+    Args:
+        record: Stats record to update in place
+        entry: Log entry from log_entry()
+    """
+    t = (entry["t"] - _ORIGIN) / 86400
+    weight = entry["weight_kg"]
+
+    record["count"] += 1
+    record["sum_t"] += t
+    record["sum_w"] += weight
+    record["sum_tt"] += t * t
+    record["sum_tw"] += t * weight
+
+    if record["first_t"] is None or entry["t"] < record["first_t"]:
+        record["first_t"] = entry["t"]
+        record["first_weight"] = weight
+    if record["min_weight"] is None or weight < record["min_weight"]:
+        record["min_weight"] = weight
+    if record["max_weight"] is None or weight > record["max_weight"]:
+        record["max_weight"] = weight
+
+    recent = record["recent"]
+    if len(recent) < RECENT_LOG_LIMIT or entry["t"] > recent[0]["t"]:
+        keys = [item["t"] for item in recent]
+        recent.insert(bisect_left(keys, entry["t"]), entry)
+        if len(recent) > RECENT_LOG_LIMIT:
+            recent.pop(0)
+
+
+def remove_log(record: Dict[str, Any], entry: Dict[str, Any]) -> bool:
+    """
+    Take a weight log out of the record
+
+    Args:
+        record: Stats record to update in place
+        entry: Log entry from log_entry() for the log being removed
+
+    Returns:
+        True if the record can no longer be kept exact incrementally (the log
+        was an extreme or the first log, or it leaves the recent window short)
+        and should be rebuilt from the logs
+    """
+    t = (entry["t"] - _ORIGIN) / 86400
+    weight = entry["weight_kg"]
+
+    record["count"] -= 1
+    record["sum_t"] -= t
+    record["sum_w"] -= weight
+    record["sum_tt"] -= t * t
+    record["sum_tw"] -= t * weight
+
+    recent = record["recent"]
+    was_full = len(recent) >= RECENT_LOG_LIMIT
+    removed_recent = False
+    for index, item in enumerate(recent):
+        if item["id"] == entry["id"]:
+            del recent[index]
+            removed_recent = True
+            break
+
+    return (
+        entry["t"] == record["first_t"]
+        or weight in (record["min_weight"], record["max_weight"])
+        or (removed_recent and was_full and record["count"] > len(recent))
+    )
+
+
+def build_record(user_id: str, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build a stats record from a user's full weight log history
+
+    Args:
+        user_id: User ID
+        entries: Log entries for all of the user's weight logs
+
+    Returns:
+        Stats record
+    """
+    record = new_record(user_id)
+    for entry in sorted(entries, key=lambda item: item["t"]):
+        add_log(record, entry)
+    return record
+
+
+def nearest_log(recent: List[Dict[str, Any]], t: float) -> Optional[Dict[str, Any]]:
+    """
+    Find the recent log closest in time to a timestamp
+
+    Args:
+        recent: Recent log entries, sorted by time
+        t: Epoch timestamp
+
+    Returns:
+        Closest log entry, or None if there are no logs
+    """
+    if not recent:
+        return None
+    index = bisect_left([item["t"] for item in recent], t)
+    candidates = recent[max(0, index - 1):index + 1]
+    return min(candidates, key=lambda item: abs(item["t"] - t))
+
+
+def regression_slope(record: Dict[str, Any]) -> Optional[float]:
+    """
+    Least-squares slope of weight over time across all logs
+
+    Args:
+        record: Stats record
+
+    Returns:
+        Trend in kg per day, or None with fewer than two distinct log times
+    """
+    n = record["count"]
+    if n < 2:
+        return None
+    denominator = n * record["sum_tt"] - record["sum_t"] ** 2
+    if abs(denominator) < 1e-9:
+        return None
+    return (n * record["sum_tw"] - record["sum_t"] * record["sum_w"]) / denominator
+
+
+def apply_change_in_transaction(
+    transaction,
+    stats_ref,
+    removed: Optional[Dict[str, Any]],
+    added: Optional[Dict[str, Any]],
+) -> bool:
+    """
+    Apply a log change to a stored stats record inside a Firestore transaction
+
+    Args:
+        transaction: Firestore transaction
+        stats_ref: Reference to the user's stats document
+        removed: Entry of the log being removed or replaced, if any
+        added: Entry of the log being added or its replacement, if any
+
+    Returns:
+        True if the record is missing or must be rebuilt from the logs
+    """
+    snapshot = stats_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return True
+
+    record = snapshot.to_dict()
+    needs_rebuild = False
+    if removed:
+        needs_rebuild = remove_log(record, removed)
+    if added:
+        add_log(record, added)
+    record["updated_at"] = datetime.utcnow()
+    transaction.set(stats_ref, record)
+    return needs_rebuild
+
+
+def add_logs_in_transaction(transaction, stats_ref, entries: List[Dict[str, Any]]) -> bool:
+    """
+    Fold several new logs into a stored stats record with a single write
+
+    Args:
+        transaction: Firestore transaction
+        stats_ref: Reference to the user's stats document
+        entries: Log entries from log_entry() for the new logs
+
+    Returns:
+        True if the record is missing and must be built from the logs
+    """
+    snapshot = stats_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return True
+
+    record = snapshot.to_dict()
+    for entry in entries:
+        add_log(record, entry)
+    record["updated_at"] = datetime.utcnow()
+    transaction.set(stats_ref, record)
+    return False
+
+
+def rebuild_in_transaction(transaction, stats_ref, logs_query, user_id: str) -> Dict[str, Any]:
+    """
+    Recompute a stats record from the user's logs inside a Firestore transaction
+
+    The record and the logs are both read in the transaction, so a log
+    written meanwhile (which also updates the record) makes Firestore retry
+    the rebuild instead of it overwriting the newer record.
+
+    Args:
+        transaction: Firestore transaction
+        stats_ref: Reference to the user's stats document
+        logs_query: Query for all of the user's weight logs
+        user_id: User ID
+
+    Returns:
+        The rebuilt record
+    """
+    stats_ref.get(transaction=transaction)
+    entries = [log_entry(doc.id, doc.to_dict()) for doc in logs_query.stream(transaction=transaction)]
+    record = build_record(user_id, entries)
+    record["updated_at"] = datetime.utcnow()
+    transaction.set(stats_ref, record)
+    return record
@@ -0,0 +1,64 @@
+"""
+Document storage used by the services
+
+STORAGE_BACKEND selects where documents live:
+
+- "firestore": the Firebase project (the default)
+- "memory": a process-local store, for tests and load runs
+- "sqlite": a local file at STORAGE_SQLITE_PATH
+
+The local backends implement the part of the Firestore client API the
+services use, with the same query semantics, so the full request path runs
+unchanged without a Firebase project.
+"""
+from ..config import settings
+from .local import LocalClient
+from .memory import MemoryClient
+from .sqlite import SQLiteClient
+
+import logging
+import threading
+from typing import Any, Optional
+import firebase_admin
+from firebase_admin import firestore
+
+BACKENDS = ("firestore", "memory", "sqlite")
+
+_client: Optional[LocalClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Any:
+    """
+    Get the document store client selected by STORAGE_BACKEND
+
+    Returns:
+        A Firestore client, or None if Firebase is not initialized, for the
+        firestore backend; otherwise the process-wide local client
+
+    Raises:
+        ValueError: If STORAGE_BACKEND is not a known backend
+    """
+    global _client
+    backend = settings.STORAGE_BACKEND
+    if backend == "firestore":
+        return firestore.client() if firebase_admin._apps else None
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', expected one of: {', '.join(BACKENDS)}")
+    with _client_lock:
+        if _client is None:
+            if backend == "memory":
+                _client = MemoryClient()
+            else:
+                _client = SQLiteClient(settings.STORAGE_SQLITE_PATH)
+            logging.info(f"Using the {backend} storage backend")
+    return _client
+
+
+def close_client() -> None:
+    """Close the local client, if one was opened"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,499 @@
+"""
+Firestore-compatible document store for running without a Firebase project
+
+The services are written against the Firestore client API. LocalClient
+implements the part of it they use, with the same query semantics: equality,
+range and membership filters, ordering (documents missing an order field are
+left out, and the document ID breaks ties), limits, start/end cursors,
+projections, merge writes, field transforms (Increment, ArrayUnion,
+ArrayRemove, DELETE_FIELD, SERVER_TIMESTAMP), batches and transactions.
+Timestamps come back timezone-aware in UTC, as Firestore returns them.
+
+Subclasses only provide storage: _get, _scan and _put. Every operation runs
+under one re-entrant lock, so batches and transactions are atomic and
+transactions are serializable.
+"""
+import copy
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from firebase_admin import firestore
+
+DOCUMENT_ID = "__name__"
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+_MISSING = object()
+
+
+def normalize(value: Any) -> Any:
+    """Copy a value for storage, making naive datetimes UTC as Firestore does"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    return value
+
+
+def sort_key(value: Any) -> tuple:
+    """Firestore's cross-type ordering: null, bool, number, timestamp, string, bytes, reference, array, map"""
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, normalize(value))
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, bytes):
+        return (5, value)
+    if isinstance(value, DocumentReference):
+        return (6, value.path)
+    if isinstance(value, (list, tuple)):
+        return (8, tuple(sort_key(item) for item in value))
+    if isinstance(value, dict):
+        return (9, tuple(sorted((key, sort_key(item)) for key, item in value.items())))
+    return (10, str(value))
+
+
+def get_field(data: Dict[str, Any], field_path: str) -> Any:
+    """Value at a dotted field path, or _MISSING"""
+    value: Any = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _matches(data: Dict[str, Any], field_path: str, op: str, expected: Any) -> bool:
+    value = get_field(data, field_path)
+    if value is _MISSING:
+        return False
+    key = sort_key(value)
+    if op == "==":
+        return key == sort_key(expected)
+    if op == "!=":
+        return value is not None and key != sort_key(expected)
+    if op == "in":
+        return key in {sort_key(item) for item in expected}
+    if op == "not-in":
+        return value is not None and key not in {sort_key(item) for item in expected}
+    if op == "array_contains":
+        return isinstance(value, list) and sort_key(expected) in {sort_key(item) for item in value}
+    if op == "array_contains_any":
+        return isinstance(value, list) and bool(
+            {sort_key(item) for item in value} & {sort_key(item) for item in expected}
+        )
+    # Range filters only match values of the same type
+    other = sort_key(expected)
+    if key[0] != other[0]:
+        return False
+    if op == "<":
+        return key < other
+    if op == "<=":
+        return key <= other
+    if op == ">":
+        return key > other
+    if op == ">=":
+        return key >= other
+    raise ValueError(f"Unsupported filter operator '{op}'")
+
+
+def _resolve(current: Any, value: Any) -> Any:
+    """Apply a field transform to the current value, or return the new value"""
+    if isinstance(value, firestore.Increment):
+        if isinstance(current, (int, float)) and not isinstance(current, bool):
+            return current + value.value
+        return value.value
+    if isinstance(value, firestore.ArrayUnion):
+        result = list(current) if isinstance(current, list) else []
+        keys = {sort_key(item) for item in result}
+        for item in normalize(list(value.values)):
+            if sort_key(item) not in keys:
+                result.append(item)
+                keys.add(sort_key(item))
+        return result
+    if isinstance(value, firestore.ArrayRemove):
+        removed = {sort_key(item) for item in value.values}
+        return [item for item in current if sort_key(item) not in removed] if isinstance(current, list) else []
+    if value is firestore.SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    return normalize(value)
+
+
+def _merge_into(target: Dict[str, Any], data: Dict[str, Any]) -> None:
+    for key, value in data.items():
+        if value is firestore.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict):
+            child = target.get(key)
+            if not isinstance(child, dict):
+                child = target[key] = {}
+            _merge_into(child, value)
+        else:
+            target[key] = _resolve(target.get(key, _MISSING), value)
+
+
+def apply_set(current: Optional[Dict[str, Any]], data: Dict[str, Any], merge: bool) -> Dict[str, Any]:
+    """Document contents after a set, merging into current when merge is true"""
+    document = copy.deepcopy(current) if merge and current is not None else {}
+    _merge_into(document, data)
+    return document
+
+
+def apply_update(current: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Document contents after an update whose keys are dotted field paths"""
+    document = copy.deepcopy(current)
+    for field_path, value in data.items():
+        parts = field_path.split(".")
+        parent = document
+        for part in parts[:-1]:
+            if not isinstance(parent.get(part), dict):
+                parent[part] = {}
+            parent = parent[part]
+        if value is firestore.DELETE_FIELD:
+            parent.pop(parts[-1], None)
+        else:
+            parent[parts[-1]] = _resolve(parent.get(parts[-1], _MISSING), value)
+    return document
+
+
+class DocumentSnapshot:
+    """Contents of a document at the time it was read"""
+
+    def __init__(self, reference: "DocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str) -> Any:
+        value = get_field(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class DocumentReference:
+    """Reference to a document in a LocalClient collection"""
+
+    def __init__(self, client: "LocalClient", collection: str, document_id: str):
+        self._client = client
+        self._collection = collection
+        self.id = document_id
+
+    @property
+    def path(self) -> str:
+        return f"{self._collection}/{self.id}"
+
+    @property
+    def parent(self) -> "CollectionReference":
+        return CollectionReference(self._client, self._collection)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, DocumentReference) and other._client is self._client and other.path == self.path
+
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+    def get(self, field_paths: Optional[Sequence[str]] = None, transaction: Optional["Transaction"] = None) -> DocumentSnapshot:
+        with self._client._lock:
+            data = self._client._get(self._collection, self.id)
+        return DocumentSnapshot(self, _project(data, field_paths))
+
+    def set(self, document_data: Dict[str, Any], merge: bool = False) -> None:
+        batch = self._client.batch()
+        batch.set(self, document_data, merge=merge)
+        batch.commit()
+
+    def create(self, document_data: Dict[str, Any]) -> None:
+        with self._client._lock:
+            if self._client._get(self._collection, self.id) is not None:
+                raise FileExistsError(f"Document already exists: {self.path}")
+            self.set(document_data)
+
+    def update(self, field_updates: Dict[str, Any]) -> None:
+        batch = self._client.batch()
+        batch.update(self, field_updates)
+        batch.commit()
+
+    def delete(self) -> None:
+        batch = self._client.batch()
+        batch.delete(self)
+        batch.commit()
+
+
+def _project(data: Optional[Dict[str, Any]], field_paths: Optional[Sequence[str]]) -> Optional[Dict[str, Any]]:
+    if data is None or field_paths is None:
+        return data
+    projected: Dict[str, Any] = {}
+    for field_path in field_paths:
+        value = get_field(data, field_path)
+        if value is _MISSING:
+            continue
+        parts = field_path.split(".")
+        target = projected
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return projected
+
+
+class Query:
+    """Immutable query over one LocalClient collection"""
+
+    def __init__(
+        self,
+        client: "LocalClient",
+        collection: str,
+        filters: Tuple[Tuple[str, str, Any], ...] = (),
+        orders: Tuple[Tuple[str, str], ...] = (),
+        limit: Optional[int] = None,
+        cursors: Tuple[Tuple[str, Any], ...] = (),
+        projection: Optional[Tuple[str, ...]] = None
+    ):
+        self._client = client
+        self._collection = collection
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._cursors = cursors
+        self._projection = projection
+
+    def _copy(self, **changes) -> "Query":
+        state = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit": self._limit,
+            "cursors": self._cursors,
+            "projection": self._projection,
+        }
+        state.update(changes)
+        return Query(self._client, self._collection, **state)
+
+    def where(self, field_path: str, op_string: str, value: Any) -> "Query":
+        return self._copy(filters=self._filters + ((field_path, op_string, normalize(value)),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> "Query":
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> "Query":
+        return self._copy(limit=count)
+
+    def select(self, field_paths: Sequence[str]) -> "Query":
+        return self._copy(projection=tuple(field_paths))
+
+    def start_at(self, document_fields_or_snapshot: Any) -> "Query":
+        return self._copy(cursors=self._cursors + (("start_at", document_fields_or_snapshot),))
+
+    def start_after(self, document_fields_or_snapshot: Any) -> "Query":
+        return self._copy(cursors=self._cursors + (("start_after", document_fields_or_snapshot),))
+
+    def end_at(self, document_fields_or_snapshot: Any) -> "Query":
+        return self._copy(cursors=self._cursors + (("end_at", document_fields_or_snapshot),))
+
+    def end_before(self, document_fields_or_snapshot: Any) -> "Query":
+        return self._copy(cursors=self._cursors + (("end_before", document_fields_or_snapshot),))
+
+    def get(self, transaction: Optional["Transaction"] = None) -> List[DocumentSnapshot]:
+        return list(self.stream(transaction))
+
+    def stream(self, transaction: Optional["Transaction"] = None) -> Iterator[DocumentSnapshot]:
+        with self._client._lock:
+            rows = [
+                (document_id, data)
+                for document_id, data in self._client._scan(self._collection, self._filters)
+                if all(_matches(data, *condition) for condition in self._filters)
+            ]
+
+        orders = self._effective_orders()
+        rows = [row for row in rows if all(
+            field == DOCUMENT_ID or get_field(row[1], field) is not _MISSING for field, _ in orders
+        )]
+        # Stable sorts from the last order field to the first
+        for field, direction in reversed(orders):
+            rows.sort(key=lambda row: self._row_key(row, field), reverse=direction == DESCENDING)
+
+        for kind, cursor in self._cursors:
+            values = self._cursor_keys(cursor, orders)
+            rows = [row for row in rows if self._keep(self._compare(row, values, orders), kind)]
+
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        for document_id, data in rows:
+            reference = DocumentReference(self._client, self._collection, document_id)
+            yield DocumentSnapshot(reference, _project(data, self._projection))
+
+    def _effective_orders(self) -> List[Tuple[str, str]]:
+        """Explicit orders, the inequality field if none, then the document ID"""
+        orders = list(self._orders)
+        if not orders:
+            inequality = [field for field, op, _ in self._filters if op in ("<", "<=", ">", ">=", "!=", "not-in")]
+            if inequality:
+                orders.append((inequality[0], ASCENDING))
+        if not any(field == DOCUMENT_ID for field, _ in orders):
+            orders.append((DOCUMENT_ID, orders[-1][1] if orders else ASCENDING))
+        return orders
+
+    @staticmethod
+    def _row_key(row: Tuple[str, Dict[str, Any]], field: str) -> tuple:
+        return sort_key(row[0] if field == DOCUMENT_ID else get_field(row[1], field))
+
+    def _cursor_keys(self, cursor: Any, orders: List[Tuple[str, str]]) -> List[tuple]:
+        if isinstance(cursor, DocumentSnapshot):
+            data = cursor._data or {}
+            return [sort_key(cursor.id if field == DOCUMENT_ID else get_field(data, field)) for field, _ in orders]
+        keys = []
+        for field, _ in orders:
+            if field not in cursor:
+                break
+            value = cursor[field]
+            if field == DOCUMENT_ID and isinstance(value, DocumentReference):
+                value = value.id
+            keys.append(sort_key(normalize(value)))
+        return keys
+
+    def _compare(self, row: Tuple[str, Dict[str, Any]], values: List[tuple], orders: List[Tuple[str, str]]) -> int:
+        for (field, direction), value in zip(orders, values):
+            key = self._row_key(row, field)
+            if key != value:
+                result = -1 if key < value else 1
+                return -result if direction == DESCENDING else result
+        return 0
+
+    @staticmethod
+    def _keep(comparison: int, kind: str) -> bool:
+        return {
+            "start_at": comparison >= 0,
+            "start_after": comparison > 0,
+            "end_at": comparison <= 0,
+            "end_before": comparison < 0,
+        }[kind]
+
+
+class CollectionReference(Query):
+    """A LocalClient collection"""
+
+    def __init__(self, client: "LocalClient", collection: str):
+        super().__init__(client, collection)
+        self.id = collection
+
+    def document(self, document_id: Optional[str] = None) -> DocumentReference:
+        return DocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, document_data: Dict[str, Any], document_id: Optional[str] = None) -> Tuple[None, DocumentReference]:
+        reference = self.document(document_id)
+        reference.create(document_data)
+        return None, reference
+
+
+class WriteBatch:
+    """Writes applied together when committed"""
+
+    def __init__(self, client: "LocalClient"):
+        self._client = client
+        self._writes: List[Tuple[str, DocumentReference, Optional[Dict[str, Any]], bool]] = []
+
+    def set(self, reference: DocumentReference, document_data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append(("set", reference, document_data, merge))
+
+    def update(self, reference: DocumentReference, field_updates: Dict[str, Any]) -> None:
+        self._writes.append(("update", reference, field_updates, False))
+
+    def delete(self, reference: DocumentReference) -> None:
+        self._writes.append(("delete", reference, None, False))
+
+    def commit(self) -> List[Any]:
+        with self._client._lock:
+            documents: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+            for kind, reference, data, merge in self._writes:
+                key = (reference._collection, reference.id)
+                current = documents[key] if key in documents else self._client._get(*key)
+                if kind == "set":
+                    documents[key] = apply_set(current, data, merge)
+                elif kind == "update":
+                    if current is None:
+                        raise FileNotFoundError(f"No document to update: {reference.path}")
+                    documents[key] = apply_update(current, data)
+                else:
+                    documents[key] = None
+            self._client._put([(collection, document_id, data) for (collection, document_id), data in documents.items()])
+        results = [None] * len(self._writes)
+        self._writes = []
+        return results
+
+
+class Transaction(WriteBatch):
+    """Writes buffered by LocalClient.run_transaction and committed when it returns"""
+
+    def get(self, reference: DocumentReference) -> DocumentSnapshot:
+        return reference.get(transaction=self)
+
+
+class LocalClient:
+    """Base for Firestore-compatible clients backed by local storage"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    def collection(self, collection_id: str) -> CollectionReference:
+        return CollectionReference(self, collection_id)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def transaction(self) -> Transaction:
+        return Transaction(self)
+
+    def get_all(
+        self,
+        references: Iterable[DocumentReference],
+        field_paths: Optional[Sequence[str]] = None,
+        transaction: Optional[Transaction] = None
+    ) -> Iterator[DocumentSnapshot]:
+        with self._lock:
+            snapshots = [reference.get(field_paths) for reference in references]
+        return iter(snapshots)
+
+    def run_transaction(self, func, *args) -> Any:
+        """
+        Run func(transaction, *args) atomically
+
+        The lock is held for the whole call, so reads inside it see no
+        concurrent writes. Buffered writes are discarded if func raises.
+        """
+        with self._lock:
+            transaction = self.transaction()
+            result = func(transaction, *args)
+            transaction.commit()
+            return result
+
+    def close(self) -> None:
+        """Release any resources held by the store"""
+
+    def _get(self, collection: str, document_id: str) -> Optional[Dict[str, Any]]:
+        """Stored contents of a document, or None; callers must not mutate it"""
+        raise NotImplementedError
+
+    def _scan(self, collection: str, filters: Sequence[Tuple[str, str, Any]]) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        """
+        Candidate (document ID, contents) pairs for a query
+
+        May apply some of the filters to narrow the scan; all of them are
+        checked again afterwards.
+        """
+        raise NotImplementedError
+
+    def _put(self, writes: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> None:
+        """Atomically store (collection, document ID, contents or None to delete) writes"""
+        raise NotImplementedError
@@ -0,0 +1,32 @@
+"""
+In-memory document store
+
+Keeps every collection in a dictionary inside the process. Data is lost on
+restart and is not shared between worker processes, which suits tests and
+single-process load runs.
+"""
+from .local import LocalClient
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class MemoryClient(LocalClient):
+    """Firestore-compatible client holding documents in memory"""
+
+    def __init__(self):
+        super().__init__()
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def _get(self, collection: str, document_id: str) -> Optional[Dict[str, Any]]:
+        return self._collections.get(collection, {}).get(document_id)
+
+    def _scan(self, collection: str, filters: Sequence[Tuple[str, str, Any]]) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        return list(self._collections.get(collection, {}).items())
+
+    def _put(self, writes: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> None:
+        # Documents are replaced, never changed in place, so earlier snapshots stay consistent
+        for collection, document_id, data in writes:
+            if data is None:
+                self._collections.get(collection, {}).pop(document_id, None)
+            else:
+                self._collections.setdefault(collection, {})[document_id] = data
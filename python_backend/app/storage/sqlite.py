@@ -0,0 +1,129 @@
+"""
+SQLite document store
+
+Stores each document as a JSON row keyed by collection and ID in a single
+SQLite file, so data survives restarts. Transactions are only serialized
+within one process, so run a single worker against a file. The user_id and
+logged_at fields are copied into indexed columns, so the per-user and
+date-range queries the services run do not scan the whole collection.
+"""
+from .local import LocalClient, normalize
+
+import base64
+import json
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    user_id TEXT,
+    logged_at TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (collection, id)
+);
+CREATE INDEX IF NOT EXISTS documents_user_logged_at ON documents (collection, user_id, logged_at);
+"""
+
+_RANGE_OPERATORS = {"<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"$bytes": base64.b64encode(value).decode()}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and "$dt" in value:
+            return datetime.fromisoformat(value["$dt"])
+        if len(value) == 1 and "$bytes" in value:
+            return base64.b64decode(value["$bytes"])
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def _timestamp_column(value: Any) -> Optional[str]:
+    """Fixed-width UTC text, so string order in SQLite is time order"""
+    if not isinstance(value, datetime):
+        return None
+    return normalize(value).astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+class SQLiteClient(LocalClient):
+    """Firestore-compatible client backed by a SQLite file"""
+
+    def __init__(self, path: str):
+        """
+        Open (creating if needed) a SQLite document store
+
+        Args:
+            path: Database file, or ":memory:"
+        """
+        super().__init__()
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _get(self, collection: str, document_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection.execute(
+            "SELECT data FROM documents WHERE collection = ? AND id = ?", (collection, document_id)
+        ).fetchone()
+        return _decode(json.loads(row[0])) if row else None
+
+    def _scan(self, collection: str, filters: Sequence[Tuple[str, str, Any]]) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        sql = "SELECT id, data FROM documents WHERE collection = ?"
+        params: List[Any] = [collection]
+        for field_path, op, value in filters:
+            if field_path == "user_id" and op == "==" and isinstance(value, str):
+                sql += " AND user_id = ?"
+                params.append(value)
+            elif field_path == "logged_at" and op in _RANGE_OPERATORS and isinstance(value, datetime):
+                sql += f" AND logged_at {_RANGE_OPERATORS[op]} ?"
+                params.append(_timestamp_column(value))
+        return [
+            (document_id, _decode(json.loads(data)))
+            for document_id, data in self._connection.execute(sql, params)
+        ]
+
+    def _put(self, writes: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> None:
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for collection, document_id, data in writes:
+                if data is None:
+                    cursor.execute("DELETE FROM documents WHERE collection = ? AND id = ?", (collection, document_id))
+                    continue
+                user_id = data.get("user_id")
+                cursor.execute(
+                    "INSERT OR REPLACE INTO documents (collection, id, user_id, logged_at, data) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        collection,
+                        document_id,
+                        user_id if isinstance(user_id, str) else None,
+                        _timestamp_column(data.get("logged_at")),
+                        json.dumps(_encode(data), separators=(",", ":")),
+                    )
+                )
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
@@ -4,31 +4,33 @@ from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 from ..config import settings
-from ..services.user_service import UserService
+from ..services.user_service import UserService, is_deleted_user
 from ..models.user import UserInDB
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PREFIX}/users/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
+def _credentials_exception() -> HTTPException:
+    """Build the exception raised when authentication fails"""
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def _decode_user_id(token: str) -> str:
     """
-    Get the current user from the JWT token
+    Verify a JWT token and extract the user ID from its subject claim
     
     Args:
         token: JWT token from OAuth2 scheme
         
     Returns:
-        Current user information
+        User ID from the token
         
     Raises:
-        HTTPException: If authentication fails
+        HTTPException: If the token is invalid or has no subject
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
     try:
         # Decode the token
         payload = jwt.decode(
@@ -36,22 +38,65 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
             settings.SECRET_KEY, 
             algorithms=[settings.ALGORITHM]
         )
+    except JWTError:
+        raise _credentials_exception()
         
-        # Extract user ID from token
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-            
-        # Get user from database
-        user_service = UserService()
-        user = await user_service.get_user(user_id)
+    # Extract user ID from token
+    user_id: str = payload.get("sub")
+    if user_id is None:
+        raise _credentials_exception()
         
-        if user is None:
-            raise credentials_exception
-            
-        return user
-    except JWTError:
-        raise credentials_exception
+    return user_id
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
+    """
+    Get the current user from the JWT token
+    
+    Args:
+        token: JWT token from OAuth2 scheme
+        
+    Returns:
+        Current user information
+        
+    Raises:
+        HTTPException: If authentication fails
+    """
+    user_id = _decode_user_id(token)
+        
+    # Get user from the authenticated-user cache or the database
+    user_service = UserService()
+    user = await user_service.get_cached_user(user_id)
+    
+    if user is None:
+        raise _credentials_exception()
+        
+    return user
+
+async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> str:
+    """
+    Get the current user's ID from the JWT token
+    
+    For endpoints that only need the caller's ID. When AUTH_TRUST_TOKEN_CLAIMS
+    is enabled the signed subject claim is trusted and no user lookup happens;
+    only accounts deleted by this process are rejected.
+    
+    Args:
+        token: JWT token from OAuth2 scheme
+        
+    Returns:
+        Current user ID
+        
+    Raises:
+        HTTPException: If authentication fails
+    """
+    if settings.AUTH_TRUST_TOKEN_CLAIMS:
+        user_id = _decode_user_id(token)
+        if is_deleted_user(user_id):
+            raise _credentials_exception()
+        return user_id
+        
+    user = await get_current_user(token)
+    return user.id
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
@@ -0,0 +1,318 @@
+from ..config import settings
+from .singleflight import SingleFlight
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+_redis_client = None
+
+# Every TieredCache in the process, so their counters can be exported as metrics
+caches: List["TieredCache"] = []
+
+
+def get_redis_client():
+    """
+    Get the shared async Redis client
+
+    Returns:
+        redis.asyncio.Redis client, or None if REDIS_URL is not configured
+    """
+    global _redis_client
+    if _redis_client is None and settings.REDIS_URL:
+        try:
+            import redis.asyncio as redis
+
+            _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+        except Exception as e:
+            logging.warning(f"Redis not available - using in-process cache only: {e}")
+    return _redis_client
+
+
+async def close_redis_client() -> None:
+    """Close the shared Redis client"""
+    global _redis_client
+    if _redis_client is not None:
+        await _redis_client.close()
+        _redis_client = None
+
+
+class LRUCache:
+    """Bounded in-process cache with least-recently-used eviction and expiry"""
+
+    def __init__(self, max_entries: int):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of entries kept before evicting
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        """
+        Get an entry that has not yet passed its stale deadline
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Tuple of (value, fresh_until, stale_until), or None if absent
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, value: Any, fresh_until: float, stale_until: float) -> None:
+        """Store an entry, evicting the least recently used one if full"""
+        self._entries[key] = (value, fresh_until, stale_until)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Remove an entry if present"""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TieredCache:
+    """
+    Two-tier cache: an in-process LRU in front of an optional shared Redis
+
+    Entries are fresh for `ttl` seconds and may then be served stale for a
+    further `stale_ttl` seconds while a background task reloads them. Values
+    must be JSON-serializable so they can be shared through Redis.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        stale_ttl: Optional[float] = None,
+        max_entries: int = 10000,
+        redis_client: Any = None,
+        use_redis: bool = True,
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            namespace: Prefix for Redis keys, also used in stats
+            ttl: Seconds an entry is considered fresh
+            stale_ttl: Extra seconds an entry may be served while revalidating
+                (defaults to `ttl`)
+            max_entries: Size of the in-process tier
+            redis_client: Redis client to use instead of the shared one
+            use_redis: Whether to use a Redis tier at all
+        """
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self.local = LRUCache(max_entries)
+        self._redis_client = redis_client
+        self._use_redis = use_redis
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.flights = SingleFlight()
+        self.counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_errors": 0,
+            "redis_errors": 0,
+        }
+        caches.append(self)
+
+    @property
+    def redis(self):
+        """Redis client for the shared tier, if any"""
+        if not self._use_redis:
+            return None
+        return self._redis_client or get_redis_client()
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def _redis_get(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        redis = self.redis
+        if redis is None:
+            return None
+        try:
+            raw = await redis.get(self._redis_key(key))
+        except Exception as e:
+            self.counters["redis_errors"] += 1
+            logging.warning(f"Redis read failed for {self.namespace}: {e}")
+            return None
+        if raw is None:
+            return None
+        payload = json.loads(raw)
+        return payload["value"], payload["fresh_until"], payload["stale_until"]
+
+    async def _redis_set(self, key: str, value: Any, fresh_until: float, stale_until: float) -> None:
+        redis = self.redis
+        if redis is None:
+            return
+        payload = json.dumps(
+            {"value": value, "fresh_until": fresh_until, "stale_until": stale_until},
+            default=str,
+        )
+        try:
+            await redis.set(
+                self._redis_key(key),
+                payload,
+                ex=max(1, int(stale_until - time.time())),
+            )
+        except Exception as e:
+            self.counters["redis_errors"] += 1
+            logging.warning(f"Redis write failed for {self.namespace}: {e}")
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        """
+        Look a key up in both tiers without loading it
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Tuple of (value, fresh_until, stale_until), or None on a miss
+        """
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry
+        entry = await self._redis_get(key)
+        if entry is not None and entry[2] > time.time():
+            self.counters["redis_hits"] += 1
+            self.local.set(key, *entry)
+            return entry
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value in both tiers
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+            ttl: Freshness override for this entry
+        """
+        now = time.time()
+        fresh_until = now + (self.ttl if ttl is None else ttl)
+        stale_until = fresh_until + self.stale_ttl
+        self.local.set(key, value, fresh_until, stale_until)
+        await self._redis_set(key, value, fresh_until, stale_until)
+
+    async def delete(self, key: str) -> None:
+        """Remove a key from both tiers"""
+        self.local.delete(key)
+        redis = self.redis
+        if redis is not None:
+            try:
+                await redis.delete(self._redis_key(key))
+            except Exception as e:
+                self.counters["redis_errors"] += 1
+                logging.warning(f"Redis delete failed for {self.namespace}: {e}")
+
+    async def get_fresh(self, key: str) -> Optional[Any]:
+        """
+        Get a fresh value without loading it on a miss, counting the lookup
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The value, or None if it is absent or stale
+        """
+        entry = await self.get(key)
+        if entry is not None and entry[1] > time.time():
+            self.counters["hits"] += 1
+            return entry[0]
+        self.counters["misses"] += 1
+        return None
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Get a value, loading and caching it on a miss
+
+        Stale entries are returned immediately and refreshed in the background.
+
+        Args:
+            key: Cache key
+            loader: Coroutine function producing the value on a miss
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        entry = await self.get(key)
+        if entry is not None:
+            value, fresh_until, _ = entry
+            if fresh_until > time.time():
+                self.counters["hits"] += 1
+            else:
+                self.counters["stale_hits"] += 1
+                self._schedule_refresh(key, loader)
+            return value
+
+        self.counters["misses"] += 1
+        return await self._load(key, loader)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        # Concurrent misses for the same key share one load
+        return await self.flights.do(key, lambda: self._load_and_store(key, loader))
+
+    async def _load_and_store(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        self.counters["loads"] += 1
+        try:
+            value = await loader()
+        except Exception:
+            self.counters["load_errors"] += 1
+            raise
+        await self.set(key, value)
+        return value
+
+    def _schedule_refresh(self, key: str, loader: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self._load(key, loader)
+            except Exception as e:
+                logging.warning(f"Background refresh failed for {self.namespace}:{key}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters for the cache
+
+        Returns:
+            Dictionary of counters plus collapsed loads, the local tier size
+            and hit rate
+        """
+        lookups = self.counters["hits"] + self.counters["stale_hits"] + self.counters["misses"]
+        served = self.counters["hits"] + self.counters["stale_hits"]
+        return {
+            **self.counters,
+            "collapsed": self.flights.counters["collapsed"],
+            "local_entries": len(self.local),
+            "hit_rate": served / lookups if lookups else 0.0,
+        }
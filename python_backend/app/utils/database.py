@@ -0,0 +1,132 @@
+from ..config import settings
+from . import metrics
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+# The firebase_admin Firestore client is synchronous: every get(), stream(),
+# set() and commit() blocks the calling thread for a full network round trip.
+# All service code goes through the helpers below so that those calls run on a
+# bounded thread pool instead of stalling the event loop.
+_executor: Optional[ThreadPoolExecutor] = None
+
+# Firestore limits a batched write to 500 operations
+MAX_BATCH_WRITES = 500
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Create the shared Firestore executor on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.FIRESTORE_MAX_WORKERS,
+            thread_name_prefix="firestore",
+        )
+    return _executor
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking Firestore call on the shared executor
+
+    Args:
+        func: Blocking callable to run
+        *args: Positional arguments for the callable
+        **kwargs: Keyword arguments for the callable
+
+    Returns:
+        Whatever the callable returns
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+async def _call(operation: str, func: Callable, *args, **kwargs) -> Any:
+    """Run a Firestore call on the executor, recording it in the metrics"""
+    start = time.perf_counter()
+    try:
+        return await run_blocking(func, *args, **kwargs)
+    finally:
+        metrics.record_firestore(operation, time.perf_counter() - start)
+
+
+async def get_document(doc_ref) -> Any:
+    """Fetch a document snapshot without blocking the event loop"""
+    return await _call("read", doc_ref.get)
+
+
+async def get_documents(db, doc_refs: List[Any]) -> List[Any]:
+    """Fetch several document snapshots in a single round trip"""
+    if not doc_refs:
+        return []
+    return await _call("read", lambda: list(db.get_all(doc_refs)))
+
+
+async def stream_query(query) -> List[Any]:
+    """Execute a query and return all matching document snapshots"""
+    return await _call("read", lambda: list(query.stream()))
+
+
+async def set_document(doc_ref, data: dict, merge: bool = False) -> Any:
+    """Create or overwrite a document"""
+    return await _call("write", doc_ref.set, data, merge=merge)
+
+
+async def update_document(doc_ref, data: dict) -> Any:
+    """Update fields of an existing document"""
+    return await _call("write", doc_ref.update, data)
+
+
+async def delete_document(doc_ref) -> Any:
+    """Delete a document"""
+    return await _call("write", doc_ref.delete)
+
+
+async def commit_batch(batch) -> Any:
+    """Commit a write batch"""
+    return await _call("write", batch.commit)
+
+
+async def run_transaction(db, func: Callable, *args) -> Any:
+    """
+    Run a read-modify-write function inside a Firestore transaction
+
+    The function is called as func(transaction, *args) on the executor and is
+    retried by Firestore on contention, so it must not have side effects
+    beyond its transactional reads and writes.
+
+    Args:
+        db: Firestore client
+        func: Synchronous transactional function
+        *args: Extra arguments for the function
+
+    Returns:
+        Whatever the function returns
+    """
+    from firebase_admin import firestore
+    from ..storage import LocalClient
+
+    if isinstance(db, LocalClient):
+        return await _call("transaction", db.run_transaction, func, *args)
+
+    def run():
+        @firestore.transactional
+        def transactional(transaction):
+            return func(transaction, *args)
+
+        return transactional(db.transaction())
+
+    return await _call("transaction", run)
+
+
+def shutdown_executor() -> None:
+    """Stop the Firestore executor, waiting for in-flight calls to finish"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -38,6 +38,10 @@ def handle_exceptions(func: Callable) -> Callable:
             # Convert NotImplementedError to HTTP 501 Not Implemented
             logger.error(f"Not implemented error in {func.__name__}: {str(e)}")
             raise HTTPException(status_code=501, detail=str(e))
+        except TimeoutError as e:
+            # Convert TimeoutError to HTTP 504 Gateway Timeout
+            logger.error(f"Timeout in {func.__name__}: {str(e)}")
+            raise HTTPException(status_code=504, detail=str(e))
         except Exception as e:
             # Convert any other exception to HTTP 500 Internal Server Error
             logger.exception(f"Unexpected error in {func.__name__}: {str(e)}")
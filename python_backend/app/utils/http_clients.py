@@ -0,0 +1,127 @@
+from ..config import settings
+
+import asyncio
+from typing import Optional
+
+# Long-lived HTTP clients shared by every service instance in the process.
+# They are created lazily on first use and closed on application shutdown.
+_openai_client = None
+_openai_slots: Optional[asyncio.Semaphore] = None
+_nutritionix_session = None
+_webhook_client = None
+
+
+def get_openai_client():
+    """
+    Get the shared async OpenAI client
+
+    The client sits on a single httpx connection pool so concurrent
+    completions reuse keep-alive connections instead of opening new ones.
+
+    Returns:
+        AsyncOpenAI client
+    """
+    global _openai_client
+    if _openai_client is None:
+        import httpx
+        from openai import AsyncOpenAI
+
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+            ),
+            timeout=settings.OPENAI_TIMEOUT_SECONDS,
+        )
+        _openai_client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None,
+            timeout=settings.OPENAI_TIMEOUT_SECONDS,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+            http_client=http_client,
+        )
+    return _openai_client
+
+
+def get_openai_slots() -> asyncio.Semaphore:
+    """
+    Get the semaphore bounding OpenAI completions in flight in this process
+
+    Every service instance and background worker shares it, so at most
+    OPENAI_MAX_CONCURRENCY completions run at once however many callers there
+    are. Created on first use so it binds to the running event loop.
+
+    Returns:
+        asyncio.Semaphore
+    """
+    global _openai_slots
+    if _openai_slots is None:
+        _openai_slots = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+    return _openai_slots
+
+
+def get_nutritionix_session():
+    """
+    Get the shared aiohttp session for the Nutritionix API
+
+    Must be called from within a running event loop. Connections to
+    Nutritionix are kept alive between requests and DNS lookups are cached,
+    so a search costs one round trip once the pool is warm.
+
+    Returns:
+        aiohttp.ClientSession bound to the Nutritionix base URL
+    """
+    global _nutritionix_session
+    if _nutritionix_session is None or _nutritionix_session.closed:
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=settings.NUTRITIONIX_MAX_CONNECTIONS,
+            limit_per_host=settings.NUTRITIONIX_MAX_CONNECTIONS_PER_HOST,
+            ttl_dns_cache=settings.NUTRITIONIX_DNS_CACHE_TTL,
+            keepalive_timeout=settings.NUTRITIONIX_KEEPALIVE_SECONDS,
+        )
+        _nutritionix_session = aiohttp.ClientSession(
+            base_url=settings.NUTRITIONIX_BASE_URL,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=settings.NUTRITIONIX_TIMEOUT_SECONDS),
+        )
+    return _nutritionix_session
+
+
+def get_webhook_client():
+    """
+    Get the shared HTTP client for outgoing webhook deliveries
+
+    Returns:
+        httpx.AsyncClient
+    """
+    global _webhook_client
+    if _webhook_client is None:
+        import httpx
+
+        _webhook_client = httpx.AsyncClient(
+            timeout=settings.AI_JOB_WEBHOOK_TIMEOUT_SECONDS,
+            follow_redirects=False,
+        )
+    return _webhook_client
+
+
+async def open_http_clients() -> None:
+    """Create the shared HTTP clients up front so the first request is not penalised"""
+    get_nutritionix_session()
+
+
+async def close_http_clients() -> None:
+    """Close all shared HTTP clients"""
+    global _openai_client, _openai_slots, _nutritionix_session, _webhook_client
+    _openai_slots = None
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+    if _nutritionix_session is not None:
+        await _nutritionix_session.close()
+        _nutritionix_session = None
+    if _webhook_client is not None:
+        await _webhook_client.aclose()
+        _webhook_client = None
@@ -0,0 +1,142 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+Path = Tuple[Any, ...]
+
+
+class _Frame:
+    """An open object or array in the document being parsed"""
+
+    __slots__ = ("is_object", "path", "start", "key", "index", "expect_key", "children")
+
+    def __init__(self, is_object: bool, path: Path, start: int):
+        self.is_object = is_object
+        self.path = path
+        self.start = start
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expect_key = is_object
+        self.children = 0
+
+    def child_path(self) -> Path:
+        return self.path + ((self.key,) if self.is_object else (self.index,))
+
+
+class JSONSectionParser:
+    """
+    Incremental parser that reports JSON values as soon as they are complete
+
+    Text is fed in arbitrary chunks (e.g. streamed model output). Every value
+    whose path from the root is at most `max_depth` long is returned once its
+    closing character arrives. Containers at depth one are only reported if
+    none of their children were, so each part of the document is reported
+    once: {"a": 1, "b": {"x": [..]}} yields ("a",) and ("b", "x").
+    """
+
+    def __init__(self, max_depth: int = 2):
+        """
+        Initialize the parser
+
+        Args:
+            max_depth: Deepest path that is reported
+        """
+        self.max_depth = max_depth
+        self.text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._token_start = 0
+        self._string_is_key = False
+        self._scalar_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        """
+        Add text and return the values it completed
+
+        Args:
+            chunk: Next piece of the document
+
+        Returns:
+            List of (path, value) pairs in document order
+        """
+        self.text += chunk
+        completed: List[Tuple[Path, Any]] = []
+        text = self.text
+
+        for i in range(self._pos, len(text)):
+            c = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._end_string(i + 1, completed)
+                continue
+
+            if self._scalar_start is not None:
+                if c not in ",]}" and not c.isspace():
+                    continue
+                self._end_value(self._scalar_start, i, completed)
+                self._scalar_start = None
+
+            if c.isspace():
+                continue
+
+            frame = self._stack[-1] if self._stack else None
+            if c == '"':
+                self._in_string = True
+                self._token_start = i
+                self._string_is_key = frame is not None and frame.expect_key
+            elif c in "{[":
+                path = frame.child_path() if frame else ()
+                self._stack.append(_Frame(c == "{", path, i))
+            elif c in "}]":
+                if self._stack:
+                    self._end_value(self._stack[-1].start, i + 1, completed)
+            elif c == ":":
+                if frame:
+                    frame.expect_key = False
+            elif c == ",":
+                if frame and frame.is_object:
+                    frame.expect_key = True
+                    frame.key = None
+                elif frame:
+                    frame.index += 1
+            else:
+                self._scalar_start = i
+
+        self._pos = len(text)
+        return completed
+
+    def _end_string(self, end: int, completed: List[Tuple[Path, Any]]) -> None:
+        if self._string_is_key:
+            frame = self._stack[-1]
+            frame.key = json.loads(self.text[self._token_start:end])
+        else:
+            self._end_value(self._token_start, end, completed)
+
+    def _end_value(self, start: int, end: int, completed: List[Tuple[Path, Any]]) -> None:
+        """Handle a complete scalar, string or container spanning text[start:end]"""
+        closing = self.text[end - 1] if end > start else ""
+        if closing in "}]" and self._stack and self._stack[-1].start == start:
+            frame = self._stack.pop()
+            path = frame.path
+            skip = len(path) < self.max_depth and frame.children > 0
+        else:
+            path = self._stack[-1].child_path() if self._stack else ()
+            skip = False
+
+        if self._stack:
+            self._stack[-1].children += 1 if 0 < len(path) <= self.max_depth else 0
+
+        if skip or not 0 < len(path) <= self.max_depth:
+            return
+        try:
+            completed.append((path, json.loads(self.text[start:end])))
+        except ValueError:
+            # Malformed output; the final parse of the whole document reports it
+            pass
@@ -0,0 +1,271 @@
+"""
+Prometheus metrics for the API
+
+Request latency is recorded per route template by MetricsMiddleware. The
+Firestore helpers in app.utils.database, and the services' Nutritionix and
+OpenAI calls, report into the histograms below. Firestore calls are also
+added up for the request they were made in, so the cost of a route can be
+read off as operations and seconds per request. Cache counters are read from
+the caches when /metrics is scraped.
+
+Everything is recorded on the event loop thread with a dictionary lookup and
+a bisect per observation, and rendered in the Prometheus text format on demand.
+"""
+from .cache import caches
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000, 5000)
+
+FIRESTORE_OPERATIONS = ("read", "write", "transaction")
+
+_registry: List[Any] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with a fixed set of labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        _registry.append(self)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Add to the counter for a combination of label values"""
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Histogram with fixed buckets and a fixed set of labels"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(float(bound) for bound in buckets)
+        # Per label values: a count per bucket (the last one is +Inf) and the sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        _registry.append(self)
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record one observation for a combination of label values"""
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total[0])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time to handle a request, including streaming the body, by route template",
+    ("method", "route", "status"),
+)
+request_firestore_operations = Histogram(
+    "http_request_firestore_operations",
+    "Firestore calls made while handling one request",
+    ("method", "route", "operation"),
+    COUNT_BUCKETS,
+)
+request_firestore_seconds = Histogram(
+    "http_request_firestore_seconds",
+    "Time spent waiting on Firestore while handling one request",
+    ("method", "route", "operation"),
+)
+firestore_duration = Histogram(
+    "firestore_operation_duration_seconds",
+    "Duration of Firestore calls, including the wait for an executor thread",
+    ("operation",),
+)
+upstream_duration = Histogram(
+    "upstream_request_duration_seconds",
+    "Duration of calls to external APIs",
+    ("service", "operation", "outcome"),
+)
+openai_tokens = Counter(
+    "openai_tokens_total",
+    "OpenAI tokens used; streamed completions count one token per content chunk",
+    ("kind", "mode"),
+)
+
+# Firestore time and call counts for the request being handled, by operation
+_request_firestore: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_firestore", default=None)
+
+
+def record_firestore(operation: str, seconds: float) -> None:
+    """
+    Record one Firestore call
+
+    Args:
+        operation: "read", "write" or "transaction"
+        seconds: How long the call took
+    """
+    firestore_duration.observe(seconds, operation)
+    usage = _request_firestore.get()
+    if usage is not None:
+        totals = usage[operation]
+        totals[0] += 1
+        totals[1] += seconds
+
+
+@contextmanager
+def track_upstream(service: str, operation: str) -> Iterator[None]:
+    """
+    Time a call to an external API
+
+    The call is recorded with outcome "error" if the block raises.
+
+    Args:
+        service: API called, e.g. "openai" or "nutritionix"
+        operation: Endpoint or kind of call
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        upstream_duration.observe(time.perf_counter() - start, service, operation, outcome)
+
+
+def record_openai_usage(usage: Any) -> None:
+    """
+    Count the tokens reported for a (non-streamed) OpenAI completion
+
+    Args:
+        usage: The response's usage object, if any
+    """
+    if usage is None:
+        return
+    openai_tokens.inc("prompt", "complete", amount=usage.prompt_tokens or 0)
+    openai_tokens.inc("completion", "complete", amount=usage.completion_tokens or 0)
+
+
+# Redis hits are also counted as hits, so they are not a separate result
+_CACHE_RESULTS = (("hits", "hit"), ("stale_hits", "stale_hit"), ("misses", "miss"))
+
+
+def _collect_caches() -> List[str]:
+    lines = [
+        "# HELP cache_requests_total Cache lookups by result",
+        "# TYPE cache_requests_total counter",
+    ]
+    for cache in caches:
+        for counter, result in _CACHE_RESULTS:
+            labels = _labels(("cache", "result"), (cache.namespace, result))
+            lines.append(f"cache_requests_total{labels} {cache.counters[counter]}")
+    lines += [
+        "# HELP cache_hit_ratio Share of lookups served from the cache, fresh or stale",
+        "# TYPE cache_hit_ratio gauge",
+    ]
+    for cache in caches:
+        lines.append(f"cache_hit_ratio{_labels(('cache',), (cache.namespace,))} {_number(cache.stats()['hit_rate'])}")
+    return lines
+
+
+_collectors: List[Callable[[], List[str]]] = [_collect_caches]
+
+
+def render() -> str:
+    """
+    Render every metric in the Prometheus text exposition format
+
+    Returns:
+        The /metrics response body
+    """
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and Firestore usage per request
+
+    Requests are labelled with the route template (e.g.
+    /api/v1/nutrition/logs/{date}) so that path parameters do not create a
+    series per value; requests that match no route share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        usage = {operation: [0, 0.0] for operation in FIRESTORE_OPERATIONS}
+        token = _request_firestore.set(usage)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_firestore.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            request_duration.observe(time.perf_counter() - start, method, route, str(status))
+            for operation, (count, seconds) in usage.items():
+                request_firestore_operations.observe(count, method, route, operation)
+                request_firestore_seconds.observe(seconds, method, route, operation)
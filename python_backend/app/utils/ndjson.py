@@ -0,0 +1,60 @@
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+import json
+import logging
+from typing import Any, AsyncIterator, List, Optional
+
+
+def format_line(row: Any) -> str:
+    """
+    Encode one newline-delimited JSON record
+
+    Args:
+        row: Pydantic model or JSON-serializable value
+
+    Returns:
+        The record as a single line of JSON
+    """
+    if isinstance(row, BaseModel):
+        return row.json() + "\n"
+    return json.dumps(row, default=str) + "\n"
+
+
+async def _encode(first: List[Any], rows: AsyncIterator[Any]) -> AsyncIterator[str]:
+    for row in first:
+        yield format_line(row)
+    try:
+        async for row in rows:
+            yield format_line(row)
+    except Exception as e:
+        # Headers are already sent, so failures are reported in-band
+        logging.error(f"NDJSON stream failed: {e}")
+        detail = getattr(e, "detail", None) or str(e)
+        yield format_line({"error": detail})
+
+
+async def ndjson_response(rows: AsyncIterator[Any], filename: Optional[str] = None) -> StreamingResponse:
+    """
+    Stream an async iterator of records as application/x-ndjson
+
+    Each record is encoded as it arrives, so memory use does not grow with
+    the number of records. The first record is awaited before the response
+    starts, so errors raised up front still become normal HTTP errors; a
+    failure part way through is sent as a final {"error": ...} line.
+
+    Args:
+        rows: Async iterator of models or JSON-serializable values
+        filename: Optional download name for a Content-Disposition header
+
+    Returns:
+        A streaming response
+    """
+    try:
+        first = [await rows.__anext__()]
+    except StopAsyncIteration:
+        first = []
+    headers = {"X-Accel-Buffering": "no"}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return StreamingResponse(_encode(first, rows), media_type="application/x-ndjson", headers=headers)
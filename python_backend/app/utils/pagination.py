@@ -0,0 +1,160 @@
+"""
+Keyset (cursor) pagination over Firestore queries
+
+A page is ordered on one or more fields plus the document ID. The next page
+starts after the last document of the previous one, so every page costs one
+indexed query with a small limit, however deep into a user's history it is.
+Cursors are opaque URL-safe strings that hold the ordering, sort values and
+ID of the last document returned, so a cursor cannot be replayed against a
+query ordered differently.
+"""
+from . import database
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+from firebase_admin import firestore
+
+DOCUMENT_ID = "__name__"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+
+def encode_cursor(fields: Sequence[str], values: Sequence[Any], document_id: str, descending: bool = False) -> str:
+    """
+    Build the cursor for the page after a document
+
+    Args:
+        fields: Fields the query is ordered by
+        values: The document's values for those fields
+        document_id: The document's ID
+        descending: Whether the query orders from the highest values down
+
+    Returns:
+        Opaque URL-safe cursor
+    """
+    payload = {
+        "f": list(fields),
+        "d": descending,
+        "v": [_encode_value(value) for value in values],
+        "id": document_id,
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, fields: Sequence[str], descending: bool = False) -> Tuple[List[Any], str]:
+    """
+    Read a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor from a previous page
+        fields: Fields the query is ordered by
+        descending: Whether the query orders from the highest values down
+
+    Returns:
+        The sort values and document ID to start after
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another ordering
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values = [_decode_value(value) for value in payload["v"]]
+        document_id = payload["id"]
+        valid = (
+            payload["f"] == list(fields)
+            and payload["d"] is descending
+            and len(values) == len(fields)
+            and isinstance(document_id, str)
+        )
+    except (ValueError, TypeError, KeyError):
+        valid = False
+    if not valid:
+        raise ValueError("Invalid cursor")
+    return values, document_id
+
+
+async def fetch_page(
+    collection,
+    query,
+    fields: Sequence[str],
+    limit: int,
+    cursor: Optional[str] = None,
+    descending: bool = False
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page of a query in keyset order
+
+    Args:
+        collection: Collection the query runs against
+        query: Filtered query, without ordering or limit
+        fields: Fields to order by; the document ID breaks ties
+        limit: Maximum number of documents in the page
+        cursor: Cursor returned with the previous page
+        descending: Order from the highest values down
+
+    Returns:
+        The page's document snapshots and the cursor for the next page, or
+        None if this is the last page
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+    for field in fields:
+        query = query.order_by(field, direction=direction)
+    # Matching the last field's direction keeps the query on the same index
+    query = query.order_by(DOCUMENT_ID, direction=direction)
+    if cursor:
+        values, document_id = decode_cursor(cursor, fields, descending)
+        query = query.start_after({**dict(zip(fields, values)), DOCUMENT_ID: collection.document(document_id)})
+
+    # One extra document tells whether another page follows
+    docs = await database.stream_query(query.limit(limit + 1))
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1].to_dict()
+    return docs, encode_cursor(fields, [last.get(field) for field in fields], docs[-1].id, descending)
+
+
+async def iterate_pages(
+    collection,
+    query,
+    fields: Sequence[str],
+    page_size: int,
+    descending: bool = False
+) -> AsyncIterator[Any]:
+    """
+    Yield every document of a query, fetching one page at a time
+
+    Only one page is held in memory, however many documents match.
+
+    Args:
+        collection: Collection the query runs against
+        query: Filtered query, without ordering or limit
+        fields: Fields to order by; the document ID breaks ties
+        page_size: Documents fetched per round trip
+        descending: Order from the highest values down
+
+    Yields:
+        Document snapshots in order
+    """
+    cursor = None
+    while True:
+        docs, cursor = await fetch_page(collection, query, fields, page_size, cursor, descending)
+        for doc in docs:
+            yield doc
+        if cursor is None:
+            return
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one upstream call
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it is in flight await the same task instead of starting their own.
+    The task is shielded, so a caller that is cancelled (e.g. a client
+    disconnect) does not cancel the call for everyone else.
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight"""
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.counters = {
+            "calls": 0,
+            "collapsed": 0,
+        }
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run func for a key, or join the call already in flight for it
+
+        Args:
+            key: Identity of the call
+            func: Coroutine function making the upstream call
+
+        Returns:
+            The result of the shared call (exceptions are shared too)
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.counters["collapsed"] += 1
+        else:
+            self.counters["calls"] += 1
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get call counters
+
+        Returns:
+            Dictionary with upstream calls made, calls collapsed into them and
+            calls currently in flight
+        """
+        return {
+            **self.counters,
+            "in_flight": len(self._calls),
+        }
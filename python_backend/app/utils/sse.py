@@ -0,0 +1,55 @@
+from fastapi.responses import StreamingResponse
+
+import json
+import logging
+from typing import Any, AsyncIterator, Tuple
+
+Event = Tuple[str, Any]
+
+
+def format_event(event: str, data: Any) -> str:
+    """
+    Encode one server-sent event
+
+    Args:
+        event: Event name
+        data: JSON-serializable payload
+
+    Returns:
+        The event in text/event-stream format
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _encode(first: Event, events: AsyncIterator[Event]) -> AsyncIterator[str]:
+    yield format_event(*first)
+    try:
+        async for event, data in events:
+            yield format_event(event, data)
+    except Exception as e:
+        # Headers are already sent, so failures are reported in-band
+        logging.error(f"Event stream failed: {e}")
+        detail = getattr(e, "detail", None) or str(e)
+        yield format_event("error", {"detail": detail})
+
+
+async def event_stream_response(events: AsyncIterator[Event]) -> StreamingResponse:
+    """
+    Turn an async iterator of (event, data) pairs into an SSE response
+
+    The first event is awaited before the response starts, so errors raised
+    up front (bad input, missing configuration) still become normal HTTP
+    errors. Later errors are sent as an "error" event.
+
+    Args:
+        events: Async iterator of (event name, payload) pairs
+
+    Returns:
+        A text/event-stream StreamingResponse
+    """
+    first = await events.__anext__()
+    return StreamingResponse(
+        _encode(first, events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,110 @@
+"""
+Concurrency benchmark for the Firestore access layer
+
+Simulates Firestore round trips with a fake document reference whose get()
+blocks the calling thread, then compares calling it inline on the event loop
+(the old behaviour) against going through app.utils.database. For each
+concurrency level it reports p50/p99 latency of the Firestore requests and of
+a cheap "probe" request running alongside them.
+
+Usage (from python_backend/):
+    python -m benchmarks.firestore_concurrency --latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List
+
+from app.utils import database
+
+
+class FakeSnapshot:
+    """Minimal stand-in for a Firestore DocumentSnapshot"""
+
+    exists = True
+
+    def to_dict(self) -> dict:
+        return {"weight_kg": 80.0}
+
+
+class FakeDocumentReference:
+    """Document reference whose get() blocks like the real client"""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+
+    def get(self) -> FakeSnapshot:
+        time.sleep(self.latency_s)
+        return FakeSnapshot()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_level(mode: str, concurrency: int, latency_s: float, rounds: int) -> Dict[str, float]:
+    """Run one concurrency level and collect request and probe latencies"""
+    doc_ref = FakeDocumentReference(latency_s)
+    request_latencies: List[float] = []
+    probe_latencies: List[float] = []
+
+    async def firestore_request(issued: float):
+        if mode == "inline":
+            doc_ref.get()
+        else:
+            await database.get_document(doc_ref)
+        request_latencies.append(time.perf_counter() - issued)
+
+    async def probe_request(issued: float):
+        await asyncio.sleep(0)
+        probe_latencies.append(time.perf_counter() - issued)
+
+    for _ in range(rounds):
+        # Latencies are measured from when the burst is issued, so time spent
+        # waiting for a blocked event loop counts against the request
+        issued = time.perf_counter()
+        tasks = [asyncio.create_task(firestore_request(issued)) for _ in range(concurrency)]
+        tasks += [asyncio.create_task(probe_request(issued)) for _ in range(concurrency)]
+        await asyncio.gather(*tasks)
+
+    return {
+        "concurrency": concurrency,
+        "request_p50_ms": statistics.median(request_latencies) * 1000,
+        "request_p99_ms": percentile(request_latencies, 99) * 1000,
+        "probe_p50_ms": statistics.median(probe_latencies) * 1000,
+        "probe_p99_ms": percentile(probe_latencies, 99) * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    latency_s = args.latency_ms / 1000
+    results = {}
+    for mode in ("inline", "offloaded"):
+        results[mode] = []
+        for concurrency in args.levels:
+            level = await run_level(mode, concurrency, latency_s, args.rounds)
+            results[mode].append(level)
+            print(
+                f"{mode:>9} c={concurrency:<4} "
+                f"request p50={level['request_p50_ms']:.1f}ms p99={level['request_p99_ms']:.1f}ms  "
+                f"probe p99={level['probe_p99_ms']:.2f}ms"
+            )
+    database.shutdown_executor()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated Firestore round trip")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--rounds", type=int, default=10, help="Bursts per concurrency level")
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    asyncio.run(main(parser.parse_args()))
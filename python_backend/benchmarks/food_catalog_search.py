@@ -0,0 +1,134 @@
+"""
+Typeahead benchmark for the local food catalog
+
+Builds a synthetic catalog (500k foods by default) from combinations of
+brands, descriptors and food names, then times app.services.food_catalog
+searches for three kinds of query: prefixes of real names as a user types
+them, names with a swapped pair of letters (answered by the typo fallback), and gibberish
+that misses. Reports build time and p50/p99 latency per query kind.
+
+Usage (from python_backend/):
+    python -m benchmarks.food_catalog_search --items 500000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from app.services.food_catalog import FoodCatalog
+
+BRANDS = [
+    "Acme", "Blue Ridge", "Chobani", "Del Monte", "Evergreen", "Fairlife", "Green Giant", "Harvest",
+    "Kirkland", "Lakeside", "Market Pantry", "Nature Valley", "Oak Farms", "Pacific", "Quaker",
+    "Riverbend", "Sunrise", "Trader", "Valley Fresh", "Wholesome",
+]
+DESCRIPTORS = [
+    "organic", "low fat", "reduced sodium", "whole grain", "grilled", "roasted", "smoked", "fresh",
+    "frozen", "unsweetened", "spicy", "honey", "vanilla", "chocolate", "garlic", "lemon", "classic",
+    "original", "light", "protein", "baked", "crispy", "steamed", "plain", "greek", "wild",
+]
+FOODS = [
+    "chicken breast", "turkey slices", "salmon fillet", "tuna", "yogurt", "almond milk", "oatmeal",
+    "granola bar", "peanut butter", "brown rice", "quinoa", "black beans", "lentil soup", "tofu",
+    "cheddar cheese", "cottage cheese", "whole wheat bread", "bagel", "tortilla", "pasta", "broccoli",
+    "spinach", "sweet potato", "banana", "blueberries", "apple slices", "orange juice", "hummus",
+    "trail mix", "protein shake", "egg whites", "beef jerky", "pita chips", "rice cakes", "ice cream",
+]
+SERVINGS = [(1.0, "cup"), (100.0, "g"), (1.0, "serving"), (2.0, "tbsp"), (1.0, "bar"), (28.0, "g")]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def synthetic_items(count: int, rng: random.Random):
+    """Yield FoodSearchResult dicts with distinct names until count foods are cataloged"""
+    seen = set()
+    while len(seen) < count:
+        descriptors = " ".join(rng.sample(DESCRIPTORS, rng.randint(0, 3)))
+        size = f"{rng.randint(1, 64)} oz" if rng.random() < 0.8 else ""
+        brand = rng.choice(BRANDS) if rng.random() < 0.7 else None
+        name = " ".join(part for part in (descriptors, rng.choice(FOODS), size) if part)
+        if (name, brand) in seen:
+            continue
+        seen.add((name, brand))
+        serving_size, serving_unit = rng.choice(SERVINGS)
+        yield {
+            "food_name": name,
+            "serving_size": serving_size,
+            "serving_unit": serving_unit,
+            "calories": rng.randint(20, 600),
+            "photo_url": None,
+            "brand": brand,
+            "barcode": None,
+        }
+
+
+def typo(text: str, rng: random.Random) -> str:
+    """Swap two adjacent letters within a word"""
+    positions = [i for i in range(len(text) - 1) if " " not in text[i:i + 2] and text[i] != text[i + 1]]
+    position = rng.choice(positions)
+    return text[:position] + text[position + 1] + text[position] + text[position + 2:]
+
+
+def time_queries(catalog: FoodCatalog, queries: List[str], limit: int) -> Dict[str, float]:
+    """Time each search and summarise latency in microseconds"""
+    latencies = []
+    empty = 0
+    for query in queries:
+        start = time.perf_counter()
+        results = catalog.search(query, limit)
+        latencies.append((time.perf_counter() - start) * 1_000_000)
+        empty += not results
+    return {
+        "queries": len(queries),
+        "empty": empty,
+        "p50_us": statistics.median(latencies),
+        "p99_us": percentile(latencies, 99),
+        "max_us": max(latencies),
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    catalog = FoodCatalog()
+    start = time.perf_counter()
+    catalog.load(synthetic_items(args.items, rng))
+    build_seconds = time.perf_counter() - start
+
+    typeahead = []
+    for _ in range(args.queries // 5):
+        # Every keystroke of a food name, as a search box would send them
+        name = f"{rng.choice(DESCRIPTORS)} {rng.choice(FOODS)}"
+        typeahead.extend(name[:length] for length in range(2, 7))
+    typos = [typo(rng.choice(FOODS), rng) for _ in range(args.queries)]
+    misses = ["".join(rng.choice("qxzjvk") for _ in range(6)) for _ in range(args.queries)]
+
+    results = {"items": len(catalog), "build_seconds": build_seconds}
+    for kind, queries in (("prefix", typeahead), ("fuzzy", typos), ("miss", misses)):
+        result = time_queries(catalog, queries, args.limit)
+        results[kind] = result
+        print(
+            f"{kind:>6}: p50={result['p50_us']:.0f}us p99={result['p99_us']:.0f}us "
+            f"max={result['max_us']:.0f}us ({result['empty']}/{result['queries']} empty)"
+        )
+    print(f" build: {len(catalog)} foods in {build_seconds:.1f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=500_000, help="Foods in the synthetic catalog")
+    parser.add_argument("--queries", type=int, default=2000, help="Queries per kind")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    main(parser.parse_args())
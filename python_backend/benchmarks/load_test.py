@@ -0,0 +1,634 @@
+"""
+End-to-end load test for the API
+
+Boots app.main:app under uvicorn with local stand-ins for everything it
+talks to:
+
+- Firestore: the in-memory storage backend (STORAGE_BACKEND=memory)
+- OpenAI: an OpenAI-compatible /v1/chat/completions endpoint that answers
+  after a configurable time to first token and streams a valid JSON answer
+  token by token
+- Nutritionix: /v2/search/instant, /v2/natural/nutrients and /v2/search/item
+  with a configurable latency
+
+It then registers users, seeds a month of weight and food history for each,
+and drives a weighted mix of /users, /weight, /nutrition and /ai traffic from
+concurrent clients for a fixed duration. It reports throughput, per-route
+p50/p95/p99 latency and errors, and the server's event-loop lag. With
+--output the results are written as JSON so runs against different versions
+can be compared.
+
+The stand-ins, the API and the load generator each run in their own process,
+so neither the fakes nor the clients compete with the server for its event
+loop.
+
+Usage (from python_backend/):
+    python -m benchmarks.load_test --users 50 --concurrency 64 --duration 60
+    python -m benchmarks.load_test --openai-token-ms 20 --output load.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.config import settings
+
+# A valid answer for every AI endpoint: each response model ignores the
+# fields that belong to the others
+AI_ANSWER = {
+    "recipe_name": "Grilled chicken quinoa bowl",
+    "calories": 520,
+    "protein": 42.0,
+    "carbs": 48.0,
+    "fat": 16.0,
+    "ingredients": ["150 g chicken breast", "80 g quinoa", "1 cup spinach", "1 tbsp olive oil", "1/2 lemon"],
+    "preparation_steps": [
+        "Rinse and simmer the quinoa for 15 minutes.",
+        "Season and grill the chicken for 6 minutes a side.",
+        "Wilt the spinach, slice the chicken and assemble the bowl.",
+        "Dress with olive oil and lemon juice.",
+    ],
+    "nutrition_facts": {"fiber": 6.5, "sugar": 3.1, "sodium": 420},
+    "meal_type": "lunch",
+    "prep_time_minutes": 10,
+    "cook_time_minutes": 20,
+    "difficulty": "easy",
+    "tags": ["high-protein", "gluten-free"],
+    "warm_up": [{"name": "Jumping jacks", "duration_minutes": 3}, {"name": "Arm circles", "duration_minutes": 2}],
+    "main_exercises": [
+        {"name": "Squats", "sets": 3, "reps": 12},
+        {"name": "Push-ups", "sets": 3, "reps": 10},
+        {"name": "Walking lunges", "sets": 3, "reps": 10},
+        {"name": "Plank", "sets": 3, "duration_seconds": 40},
+    ],
+    "cool_down": [{"name": "Hamstring stretch", "duration_minutes": 2}, {"name": "Child's pose", "duration_minutes": 2}],
+    "progression_tips": ["Add two reps a week.", "Slow the lowering phase once sets feel easy."],
+    "estimated_calories_burned": 280,
+    "workout_duration_minutes": 30,
+    "difficulty_level": "moderate",
+    "fitness_level": "intermediate",
+    "equipment_needed": ["none"],
+    "strengths": ["Consistent protein intake", "Regular breakfast"],
+    "improvement_areas": ["Low vegetable intake", "Late-evening snacking"],
+    "nutrient_analysis": {"protein": "adequate", "fiber": "low", "sodium": "high"},
+    "balanced_diet_score": 6.5,
+    "recommendations": ["Add a vegetable to lunch and dinner.", "Swap evening snacks for fruit."],
+    "tips": ["Plan meals for the week on Sunday.", "Keep a water bottle at your desk."],
+    "explanation": "A balanced plan built around whole foods and steady, sustainable progress.",
+}
+
+API = settings.API_PREFIX
+
+FOODS = [
+    "apple", "banana", "oatmeal", "greek yogurt", "chicken breast", "brown rice", "salmon", "broccoli",
+    "egg", "whole wheat bread", "almonds", "avocado", "spinach", "sweet potato", "cottage cheese", "lentils",
+]
+MEAL_TYPES = ["breakfast", "lunch", "dinner", "snack"]
+BARCODES = [f"0{700000000000 + index}" for index in range(50)]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def free_port() -> int:
+    """A TCP port that is free on the loopback interface"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from short sleeps"""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval_s)
+            # Anything beyond the requested sleep is time the loop was busy
+            self.samples.append(max(0.0, loop.time() - start - self.interval_s))
+
+    def summary(self, reset: bool = False) -> Dict[str, float]:
+        samples = self.samples or [0.0]
+        result = {
+            "samples": len(self.samples),
+            "p50_ms": percentile(samples, 50) * 1000,
+            "p95_ms": percentile(samples, 95) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+            "max_ms": max(samples) * 1000,
+        }
+        if reset:
+            self.samples = []
+        return result
+
+
+# Stand-in upstreams
+
+
+def _food_nutrients(name: str, quantity: float = 1.0, unit: str = "serving") -> Dict[str, Any]:
+    """Deterministic Nutritionix-shaped nutrients for a food name"""
+    seed = int(hashlib.sha256(name.encode()).hexdigest()[:8], 16)
+    calories = 50 + seed % 400
+    return {
+        "food_name": name,
+        "serving_qty": quantity,
+        "serving_unit": unit,
+        "nf_calories": calories * quantity,
+        "nf_protein": round((seed % 30) * quantity, 1),
+        "nf_total_carbohydrate": round((seed % 60) * quantity, 1),
+        "nf_total_fat": round((seed % 25) * quantity, 1),
+        "nf_dietary_fiber": round((seed % 8) * quantity, 1),
+        "nf_sugars": round((seed % 20) * quantity, 1),
+        "nf_sodium": (seed % 500) * quantity,
+        "photo": {"thumb": f"https://nix-tag-images.s3.amazonaws.com/{seed}_thumb.jpg"},
+    }
+
+
+def _parse_natural_line(line: str) -> Dict[str, Any]:
+    """Turn a "1.0 serving apple" query line into a food"""
+    parts = line.split(" ", 2)
+    try:
+        return _food_nutrients(parts[2].split(" by ")[0], float(parts[0]), parts[1])
+    except (IndexError, ValueError):
+        return _food_nutrients(line)
+
+
+def build_stub_app(args: argparse.Namespace):
+    """aiohttp application standing in for the OpenAI and Nutritionix APIs"""
+    from aiohttp import web
+
+    stats = {"openai_completions": 0, "openai_streams": 0, "nutritionix_requests": 0}
+    answer = json.dumps(AI_ANSWER)
+    # Roughly four characters per token, as for English text
+    tokens = [answer[offset:offset + 4] for offset in range(0, len(answer), 4)]
+    first_token_s = args.openai_first_token_ms / 1000
+    token_s = args.openai_token_ms / 1000
+    nutritionix_s = args.nutritionix_ms / 1000
+
+    async def chat_completions(request):
+        body = await request.json()
+        prompt_tokens = sum(len(message.get("content", "")) for message in body.get("messages", [])) // 4
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        await asyncio.sleep(first_token_s)
+
+        if not body.get("stream"):
+            stats["openai_completions"] += 1
+            await asyncio.sleep(token_s * len(tokens))
+            return web.json_response({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": prompt_tokens + len(tokens),
+                },
+            })
+
+        stats["openai_streams"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> bytes:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload)}\n\n".encode()
+
+        await response.write(chunk({"role": "assistant", "content": ""}))
+        for token in tokens:
+            await response.write(chunk({"content": token}))
+            await asyncio.sleep(token_s)
+        await response.write(chunk({}, "stop"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def search_instant(request):
+        stats["nutritionix_requests"] += 1
+        await asyncio.sleep(nutritionix_s)
+        query = request.query.get("query", "").strip().lower()
+        common = [_food_nutrients(f"{query}{suffix}") for suffix in ("", ", raw", ", cooked", " salad", " snack")]
+        branded = [
+            {**_food_nutrients(f"{query} bar"), "brand_name": "Acme", "nix_item_id": uuid.uuid5(uuid.NAMESPACE_URL, query).hex}
+        ]
+        return web.json_response({"common": common, "branded": branded})
+
+    async def natural_nutrients(request):
+        stats["nutritionix_requests"] += 1
+        await asyncio.sleep(nutritionix_s)
+        body = await request.json()
+        lines = [line.strip() for line in body.get("query", "").splitlines() if line.strip()]
+        return web.json_response({"foods": [_parse_natural_line(line) for line in lines]})
+
+    async def search_item(request):
+        stats["nutritionix_requests"] += 1
+        await asyncio.sleep(nutritionix_s)
+        upc = request.query.get("upc", "")
+        food = {**_food_nutrients(f"product {upc}"), "brand_name": "Acme", "nix_item_id": upc}
+        return web.json_response({"foods": [food]})
+
+    async def health(request):
+        return web.json_response({"status": "healthy"})
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_get("/v2/search/instant", search_instant)
+    app.router.add_post("/v2/natural/nutrients", natural_nutrients)
+    app.router.add_get("/v2/search/item", search_item)
+    app.router.add_get("/health", health)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+def serve_stubs(args: argparse.Namespace) -> None:
+    from aiohttp import web
+
+    web.run_app(build_stub_app(args), host="127.0.0.1", port=args.port, print=None, access_log=None)
+
+
+def serve_api(args: argparse.Namespace) -> None:
+    """Run the API with an event-loop lag probe at /__load_test/lag"""
+    import uvicorn
+    from app.main import app
+
+    monitor = LoopLagMonitor(args.lag_interval_ms / 1000)
+
+    async def lag(reset: bool = False) -> Dict[str, float]:
+        return monitor.summary(reset=reset)
+
+    app.add_api_route("/__load_test/lag", lag, methods=["GET"], include_in_schema=False)
+
+    async def serve() -> None:
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False))
+        monitor.start()
+        try:
+            await server.serve()
+        finally:
+            await monitor.stop()
+
+    asyncio.run(serve())
+
+
+# Load generator
+
+
+class User(NamedTuple):
+    id: str
+    headers: Dict[str, str]
+
+
+class Route(NamedTuple):
+    label: str
+    weight: int
+    request: Callable[[User, random.Random], Tuple[str, str, Dict[str, Any]]]
+
+
+def _day(rng: random.Random) -> str:
+    return (datetime.utcnow() - timedelta(days=rng.randrange(14))).strftime("%Y-%m-%d")
+
+
+def _food_log(user: User, rng: random.Random, days_ago: int = 0) -> Dict[str, Any]:
+    food = rng.choice(FOODS)
+    nutrients = _food_nutrients(food)
+    logged_at = datetime.utcnow() - timedelta(days=days_ago, minutes=rng.randrange(24 * 60))
+    return {
+        "user_id": user.id,
+        "food_name": food,
+        "meal_type": rng.choice(MEAL_TYPES),
+        "calories": int(nutrients["nf_calories"]),
+        "protein": nutrients["nf_protein"],
+        "carbs": nutrients["nf_total_carbohydrate"],
+        "fat": nutrients["nf_total_fat"],
+        "serving_size": 1.0,
+        "serving_unit": "serving",
+        "is_favorite": rng.random() < 0.1,
+        "logged_at": logged_at.isoformat(),
+    }
+
+
+# Weighted roughly like a mobile client: dashboards and logging dominate,
+# AI coaching is occasional but slow
+ROUTES = [
+    Route("GET /users/me", 8, lambda user, rng: ("GET", "/users/me", {})),
+    Route("GET /users/nutrition-goals", 4, lambda user, rng: ("GET", "/users/nutrition-goals", {})),
+    Route("POST /weight/log", 6, lambda user, rng: ("POST", "/weight/log", {
+        "json": {"user_id": user.id, "weight_kg": round(rng.uniform(70, 90), 1)},
+    })),
+    Route("GET /weight/logs", 6, lambda user, rng: ("GET", "/weight/logs", {"params": {"limit": 30}})),
+    Route("GET /weight/stats", 5, lambda user, rng: ("GET", "/weight/stats", {})),
+    Route("GET /nutrition/search", 10, lambda user, rng: ("GET", "/nutrition/search", {
+        "params": {"query": rng.choice(FOODS)[:rng.randint(3, 8)], "limit": 10},
+    })),
+    Route("GET /nutrition/nutrition", 5, lambda user, rng: ("GET", "/nutrition/nutrition", {
+        "params": {"food_name": rng.choice(FOODS), "serving_size": rng.choice([0.5, 1.0, 2.0])},
+    })),
+    Route("POST /nutrition/nutrition/batch", 2, lambda user, rng: ("POST", "/nutrition/nutrition/batch", {
+        "json": [{"food_name": food, "serving_size": 1.0, "serving_unit": "serving"} for food in rng.sample(FOODS, 4)],
+    })),
+    Route("GET /nutrition/barcode/{barcode}", 2, lambda user, rng: (
+        "GET", f"/nutrition/barcode/{rng.choice(BARCODES)}", {}
+    )),
+    Route("POST /nutrition/log", 8, lambda user, rng: ("POST", "/nutrition/log", {"json": _food_log(user, rng)})),
+    Route("GET /nutrition/logs/{date}", 6, lambda user, rng: ("GET", f"/nutrition/logs/{_day(rng)}", {})),
+    Route("GET /nutrition/summary/{date}", 6, lambda user, rng: ("GET", f"/nutrition/summary/{_day(rng)}", {})),
+    Route("GET /nutrition/favorites", 2, lambda user, rng: ("GET", "/nutrition/favorites", {"params": {"limit": 20}})),
+    Route("POST /ai/meal", 2, lambda user, rng: ("POST", "/ai/meal", {
+        "params": {"calories": rng.randrange(300, 900), "meal_type": rng.choice(MEAL_TYPES)},
+    })),
+    Route("POST /ai/meal/stream", 2, lambda user, rng: ("POST", "/ai/meal/stream", {
+        "params": {"calories": rng.randrange(300, 900), "meal_type": rng.choice(MEAL_TYPES)},
+    })),
+    Route("POST /ai/workout", 1, lambda user, rng: ("POST", "/ai/workout", {
+        "params": {"fitness_level": "intermediate", "goal": "fat loss", "available_minutes": rng.randrange(15, 60)},
+    })),
+    Route("POST /ai/workout/stream", 1, lambda user, rng: ("POST", "/ai/workout/stream", {
+        "params": {"fitness_level": "beginner", "goal": "fat loss", "available_minutes": rng.randrange(15, 60)},
+    })),
+    Route("POST /ai/analyze-diet", 1, lambda user, rng: ("POST", "/ai/analyze-diet", {})),
+    Route("POST /ai/forecast-weight", 2, lambda user, rng: ("POST", "/ai/forecast-weight", {})),
+    Route("POST /ai/weight-loss-plan", 1, lambda user, rng: ("POST", "/ai/weight-loss-plan", {
+        "params": {"target_weight": 68},
+    })),
+]
+
+
+async def wait_until_healthy(client, url: str, process: subprocess.Popen, timeout_s: float = 60) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode} before becoming healthy")
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become healthy within {timeout_s:.0f}s")
+
+
+async def create_users(client, count: int, history_days: int, rng: random.Random) -> List[User]:
+    """Register, log in and seed weight and food history for each user"""
+    run_id = uuid.uuid4().hex[:8]
+
+    async def create(index: int) -> User:
+        email = f"load-{run_id}-{index}@example.com"
+        password = "load-test-password"
+        weight = round(rng.uniform(75, 95), 1)
+        response = await client.post(f"{API}/users/register", json={
+            "email": email,
+            "password": password,
+            "full_name": f"Load Test {index}",
+            "gender": rng.choice(["male", "female"]),
+            "age": rng.randint(20, 60),
+            "height_cm": rng.randint(155, 195),
+            "activity_level": rng.choice(["sedentary", "light", "moderate", "active"]),
+            "dietary_preferences": rng.choice([[], ["vegetarian"], ["gluten-free"]]),
+            "current_weight": weight,
+            "target_weight": weight - 8,
+        })
+        response.raise_for_status()
+        response = await client.post(f"{API}/users/login", json={"email": email, "password": password})
+        response.raise_for_status()
+        login = response.json()
+        user = User(login["user"]["id"], {"Authorization": f"Bearer {login['access_token']}"})
+
+        now = datetime.utcnow()
+        weights = [
+            {"weight_kg": round(weight - day * 0.1 + rng.uniform(-0.4, 0.4), 1), "logged_at": (now - timedelta(days=day)).isoformat()}
+            for day in range(history_days)
+        ]
+        foods = [_food_log(user, rng, day) for day in range(history_days) for _ in range(4)]
+        for path, entries in (("/weight/logs/bulk", weights), ("/nutrition/logs/bulk", foods)):
+            response = await client.post(API + path, json=entries, headers=user.headers)
+            response.raise_for_status()
+        return user
+
+    return list(await asyncio.gather(*(create(index) for index in range(count))))
+
+
+async def drive(client, users: List[User], args: argparse.Namespace, rng: random.Random) -> Dict[str, Any]:
+    """Send the route mix from concurrent workers and collect timings"""
+    weights = [route.weight for route in ROUTES]
+    samples: Dict[str, List[Tuple[float, float]]] = {route.label: [] for route in ROUTES}
+    errors: Dict[str, int] = {route.label: 0 for route in ROUTES}
+    statuses: Dict[str, Dict[str, int]] = {route.label: {} for route in ROUTES}
+    loop = asyncio.get_running_loop()
+    measure_from = loop.time() + args.warmup
+    stop_at = measure_from + args.duration
+
+    async def worker() -> None:
+        while loop.time() < stop_at:
+            route = rng.choices(ROUTES, weights)[0]
+            user = rng.choice(users)
+            method, path, kwargs = route.request(user, rng)
+            started = loop.time()
+            first_byte = None
+            status = "error"
+            try:
+                async with client.stream(method, API + path, headers=user.headers, **kwargs) as response:
+                    async for _ in response.aiter_raw():
+                        if first_byte is None:
+                            first_byte = loop.time()
+                    status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            finished = loop.time()
+            if started < measure_from:
+                continue
+            statuses[route.label][status] = statuses[route.label].get(status, 0) + 1
+            if not status.startswith("2"):
+                errors[route.label] += 1
+            samples[route.label].append((finished - started, (first_byte or finished) - started))
+
+    warmed_up = asyncio.create_task(asyncio.sleep(args.warmup))
+    workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+    await warmed_up
+    # Only count server lag from the measured window
+    await client.get("/__load_test/lag", params={"reset": "true"})
+    await asyncio.gather(*workers)
+
+    routes = {}
+    for route in ROUTES:
+        timings = samples[route.label]
+        if not timings:
+            continue
+        latencies = [latency for latency, _ in timings]
+        first_bytes = [first_byte for _, first_byte in timings]
+        routes[route.label] = {
+            "requests": len(timings),
+            "errors": errors[route.label],
+            "statuses": statuses[route.label],
+            "requests_per_sec": len(timings) / args.duration,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": max(latencies) * 1000,
+            "first_byte_p50_ms": percentile(first_bytes, 50) * 1000,
+            "first_byte_p95_ms": percentile(first_bytes, 95) * 1000,
+        }
+    return routes
+
+
+def spawn(role: str, port: int, args: argparse.Namespace, env: Dict[str, str]) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "benchmarks.load_test", "--role", role, "--port", str(port),
+        "--openai-first-token-ms", str(args.openai_first_token_ms),
+        "--openai-token-ms", str(args.openai_token_ms),
+        "--nutritionix-ms", str(args.nutritionix_ms),
+        "--lag-interval-ms", str(args.lag_interval_ms),
+    ]
+    return subprocess.Popen(command, env=env)
+
+
+async def main(args: argparse.Namespace) -> None:
+    import httpx
+
+    rng = random.Random(args.seed)
+    stub_port, api_port = free_port(), free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    env = {
+        **os.environ,
+        "STORAGE_BACKEND": "memory",
+        "FIREBASE_CREDENTIALS": "",
+        "OPENAI_API_KEY": "sk-load-test",
+        "OPENAI_BASE_URL": f"{stub_url}/v1",
+        "NUTRITIONIX_APP_ID": "load-test",
+        "NUTRITIONIX_API_KEY": "load-test",
+        "NUTRITIONIX_BASE_URL": stub_url,
+        "REDIS_URL": "",
+        # Registration and login are part of the setup, not what is measured
+        "BCRYPT_ROUNDS": os.environ.get("BCRYPT_ROUNDS", "4"),
+    }
+    stubs = spawn("stubs", stub_port, args, env)
+    api = spawn("api", api_port, args, env)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{api_port}", limits=limits, timeout=args.timeout
+        ) as client:
+            await wait_until_healthy(client, f"{stub_url}/health", stubs)
+            await wait_until_healthy(client, "/health", api)
+
+            print(f"Creating {args.users} users with {args.history_days} days of history...")
+            users = await create_users(client, args.users, args.history_days, rng)
+
+            print(f"Running {args.concurrency} clients for {args.warmup:.0f}s warm-up + {args.duration:.0f}s...")
+            driver_lag = LoopLagMonitor(args.lag_interval_ms / 1000)
+            driver_lag.start()
+            routes = await drive(client, users, args, rng)
+            await driver_lag.stop()
+            server_lag = (await client.get("/__load_test/lag")).json()
+            upstream = (await client.get(f"{stub_url}/stats")).json()
+    finally:
+        for process in (api, stubs):
+            process.send_signal(signal.SIGINT)
+        for process in (api, stubs):
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    total = sum(route["requests"] for route in routes.values())
+    results = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {
+            "users": args.users,
+            "history_days": args.history_days,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "seed": args.seed,
+            "openai_first_token_ms": args.openai_first_token_ms,
+            "openai_token_ms": args.openai_token_ms,
+            "nutritionix_ms": args.nutritionix_ms,
+        },
+        "requests": total,
+        "errors": sum(route["errors"] for route in routes.values()),
+        "requests_per_sec": total / args.duration,
+        "routes": routes,
+        "event_loop_lag": {"server": server_lag, "load_generator": driver_lag.summary()},
+        "upstream_calls": upstream,
+    }
+
+    print(f"\n{'route':<34}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for label, route in routes.items():
+        print(
+            f"{label:<34}{route['requests_per_sec']:>8.1f}{route['p50_ms']:>9.1f}"
+            f"{route['p95_ms']:>9.1f}{route['p99_ms']:>9.1f}{route['errors']:>8}"
+        )
+    print(f"\nTotal: {results['requests_per_sec']:.1f} req/s, {results['errors']} errors")
+    print(
+        f"Server event-loop lag: p50={server_lag['p50_ms']:.1f}ms p99={server_lag['p99_ms']:.1f}ms "
+        f"max={server_lag['max_ms']:.1f}ms"
+    )
+    if results["event_loop_lag"]["load_generator"]["p99_ms"] > 50:
+        print("Warning: the load generator's own event loop is lagging; latencies include client-side delay")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--history-days", type=int, default=30, help="Days of weight and food logs seeded per user")
+    parser.add_argument("--concurrency", type=int, default=32, help="Clients sending requests back to back")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of load before measuring")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Client timeout per request")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--openai-first-token-ms", type=float, default=400.0)
+    parser.add_argument("--openai-token-ms", type=float, default=5.0, help="Delay between streamed tokens")
+    parser.add_argument("--nutritionix-ms", type=float, default=80.0, help="Latency of each Nutritionix call")
+    parser.add_argument("--lag-interval-ms", type=float, default=10.0, help="Event-loop lag sampling interval")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--role", choices=["driver", "api", "stubs"], default="driver", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == "stubs":
+        serve_stubs(args)
+    elif args.role == "api":
+        serve_api(args)
+    else:
+        asyncio.run(main(args))
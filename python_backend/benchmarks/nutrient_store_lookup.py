@@ -0,0 +1,125 @@
+"""
+Lookup and memory benchmark for the memory-mapped nutrient store
+
+Writes a synthetic store (one million foods by default) to a temporary
+file, maps it with app.services.nutrient_store and times random lookups by
+name and by barcode. It also reports how the process's memory changes. On
+Linux this comes from /proc/self/smaps_rollup: clean file-backed pages are
+page cache that every worker shares, while private dirty memory is what
+each worker pays for on its own.
+
+Usage (from python_backend/):
+    python -m benchmarks.nutrient_store_lookup --items 1000000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+from app.services import nutrient_store
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def memory_kb() -> Dict[str, int]:
+    """RSS breakdown from smaps_rollup, or empty where it is unavailable"""
+    try:
+        with open("/proc/self/smaps_rollup") as handle:
+            fields = dict(line.split(":", 1) for line in handle if ":" in line)
+    except OSError:
+        return {}
+    wanted = ("Rss", "Private_Dirty", "Private_Clean", "Shared_Clean")
+    return {name: int(fields[name].split()[0]) for name in wanted if name in fields}
+
+
+def synthetic_foods(count: int, rng: random.Random):
+    for index in range(count):
+        yield {
+            "food_name": f"food {index}",
+            "serving_size": rng.choice([1.0, 100.0, 28.0]),
+            "serving_unit": rng.choice(["cup", "g", "serving"]),
+            "calories": rng.randint(10, 800),
+            "protein": rng.random() * 40,
+            "carbs": rng.random() * 80,
+            "fat": rng.random() * 30,
+            "fiber": rng.random() * 10,
+            "sugar": rng.random() * 30,
+            "sodium": rng.random() * 900,
+            "cholesterol": None,
+            "brand": f"brand {index % 500}" if index % 3 else None,
+            "barcode": f"{index:012d}",
+            "micronutrients": {"potassium": rng.random() * 500, "iron": rng.random() * 20},
+        }
+
+
+def time_lookups(lookup, keys: List) -> Dict[str, float]:
+    """Time each lookup and summarise latency in microseconds"""
+    latencies = []
+    for key in keys:
+        start = time.perf_counter()
+        lookup(key)
+        latencies.append((time.perf_counter() - start) * 1_000_000)
+    return {
+        "lookups": len(keys),
+        "p50_us": statistics.median(latencies),
+        "p99_us": percentile(latencies, 99),
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "nutrients.store")
+        start = time.perf_counter()
+        rows = nutrient_store.write_store(path, synthetic_foods(args.items, rng))
+        build_seconds = time.perf_counter() - start
+
+        before = memory_kb()
+        store = nutrient_store.NutrientStore(path)
+        indexes = [rng.randrange(rows) for _ in range(args.lookups)]
+
+        def by_name(index: int):
+            brand = f"brand {index % 500}" if index % 3 else None
+            return store.details(store.find_food(f"food {index}", brand), 2, "serving")
+
+        def by_barcode(index: int):
+            return store.details(store.find_barcode(f"{index:012d}"))
+
+        results = {
+            "items": rows,
+            "file_mb": os.path.getsize(path) / 1e6,
+            "build_seconds": build_seconds,
+            "name": time_lookups(by_name, indexes),
+            "barcode": time_lookups(by_barcode, indexes),
+        }
+        after = memory_kb()
+        results["memory_delta_kb"] = {name: after[name] - before.get(name, 0) for name in after}
+        store.close()
+
+    for kind in ("name", "barcode"):
+        print(f"{kind:>7}: p50={results[kind]['p50_us']:.1f}us p99={results[kind]['p99_us']:.1f}us")
+    print(f"  store: {rows} foods, {results['file_mb']:.0f} MB, built in {build_seconds:.1f}s")
+    if results["memory_delta_kb"]:
+        print(f" memory: {results['memory_delta_kb']} (kB change after mapping and lookups)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=1_000_000, help="Foods in the synthetic store")
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    main(parser.parse_args())
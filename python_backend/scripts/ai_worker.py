@@ -0,0 +1,51 @@
+"""
+Run AI jobs from the Redis queue in a separate process
+
+Lets API processes run with AI_JOB_WORKERS=0 so LLM calls never occupy
+their event loops. Requires AI_JOB_BROKER=redis and REDIS_URL.
+
+Usage (from python_backend/):
+    python -m scripts.ai_worker [--concurrency N]
+"""
+import argparse
+import asyncio
+import os
+
+import firebase_admin
+from firebase_admin import credentials
+from loguru import logger
+
+from app.config import settings
+from app.services.ai_jobs import AIJobWorker, RedisJobBroker
+from app.utils import database
+from app.utils.cache import close_redis_client, get_redis_client
+from app.utils.http_clients import close_http_clients
+
+
+async def main(args: argparse.Namespace) -> None:
+    if os.path.exists(settings.FIREBASE_CREDENTIALS):
+        firebase_admin.initialize_app(credentials.Certificate(settings.FIREBASE_CREDENTIALS))
+
+    redis_client = get_redis_client()
+    if redis_client is None:
+        raise SystemExit("REDIS_URL must be set to run a separate AI worker")
+
+    worker = AIJobWorker(broker=RedisJobBroker(redis_client), concurrency=args.concurrency)
+    worker.start()
+    logger.info(f"AI worker running with concurrency {worker.concurrency}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await worker.stop()
+        await close_http_clients()
+        await close_redis_client()
+        database.shutdown_executor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=None, help="Jobs run at once (defaults to AI_JOB_WORKERS)")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
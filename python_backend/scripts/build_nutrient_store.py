@@ -0,0 +1,46 @@
+"""
+Build the memory-mapped nutrient store from a JSON-lines export
+
+Each input line is a FoodNutritionDetails object. The store is written
+next to the output path and moved into place atomically; restart the API
+workers to map the new file.
+
+Usage (from python_backend/):
+    python -m scripts.build_nutrient_store foods.jsonl --output data/nutrients.store
+"""
+import argparse
+import json
+
+from loguru import logger
+from pydantic import ValidationError
+
+from app.config import settings
+from app.models.nutrition import FoodNutritionDetails
+from app.services import nutrient_store
+
+
+def read_foods(path: str):
+    """Yield validated FoodNutritionDetails dictionaries, skipping bad lines"""
+    with open(path, encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, 1):
+            if not line.strip():
+                continue
+            try:
+                yield FoodNutritionDetails(**json.loads(line)).dict()
+            except (ValueError, ValidationError) as e:
+                logger.warning(f"Skipping line {line_number}: {e}")
+
+
+def main(args: argparse.Namespace) -> None:
+    output = args.output or settings.NUTRIENT_STORE_PATH
+    if not output:
+        raise SystemExit("Pass --output or set NUTRIENT_STORE_PATH")
+    rows = nutrient_store.write_store(output, read_foods(args.input))
+    logger.info(f"Wrote {rows} foods to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("input", help="JSON-lines file of FoodNutritionDetails objects")
+    parser.add_argument("--output", help="Store file, defaults to NUTRIENT_STORE_PATH")
+    main(parser.parse_args())
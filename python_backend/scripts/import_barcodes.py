@@ -0,0 +1,34 @@
+"""
+Bulk-load products into the persistent barcode index
+
+Each input line is a FoodNutritionDetails object; lines without a barcode
+are skipped. Existing entries for the same barcode, including cached
+misses, are overwritten.
+
+Usage (from python_backend/):
+    python -m scripts.import_barcodes products.jsonl
+"""
+import argparse
+import asyncio
+
+import firebase_admin
+from firebase_admin import credentials
+from loguru import logger
+
+from app.config import settings
+from app.services.barcode_index import BarcodeIndex
+from scripts.build_nutrient_store import read_foods
+
+
+async def main(args: argparse.Namespace) -> None:
+    firebase_admin.initialize_app(credentials.Certificate(settings.FIREBASE_CREDENTIALS))
+
+    written = await BarcodeIndex().bulk_load(read_foods(args.input), source=args.source)
+    logger.info(f"Loaded {written} barcodes into the index")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("input", help="JSON-lines file of FoodNutritionDetails objects")
+    parser.add_argument("--source", default="import", help="Source recorded on each entry")
+    asyncio.run(main(parser.parse_args()))
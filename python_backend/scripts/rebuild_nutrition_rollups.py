@@ -0,0 +1,33 @@
+"""
+Recompute daily nutrition rollups from the raw food logs
+
+Run once after deploying rollups, and whenever rollups are suspected to
+have drifted from the logs.
+
+Usage (from python_backend/):
+    python -m scripts.rebuild_nutrition_rollups [--user-id USER_ID]
+"""
+import argparse
+import asyncio
+
+import firebase_admin
+from firebase_admin import credentials
+from loguru import logger
+
+from app.config import settings
+from app.services.nutrition_service import NutritionService
+
+
+async def main(args: argparse.Namespace) -> None:
+    firebase_admin.initialize_app(credentials.Certificate(settings.FIREBASE_CREDENTIALS))
+
+    nutrition_service = NutritionService()
+    written = await nutrition_service.rebuild_daily_rollups(user_id=args.user_id)
+    scope = f"user {args.user_id}" if args.user_id else "all users"
+    logger.info(f"Rebuilt {written} daily nutrition rollups for {scope}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--user-id", help="Only rebuild this user's rollups")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,70 @@
+"""
+Shared test setup
+
+The API runs on the in-memory storage backend with no Firebase project,
+Redis or API keys, so the suite needs nothing beyond requirements-dev.txt.
+Settings are read at import time, so the environment is set before any
+app module is imported.
+"""
+import os
+
+os.environ.update({
+    "STORAGE_BACKEND": "memory",
+    "FIREBASE_CREDENTIALS": "",
+    "REDIS_URL": "",
+    "OPENAI_API_KEY": "",
+    "NUTRITIONIX_APP_ID": "",
+    "NUTRITIONIX_API_KEY": "",
+    "FOOD_CATALOG_ENABLED": "False",
+    "BCRYPT_ROUNDS": "4",
+    "ACCOUNT_DELETION_SWEEP_SECONDS": "0",
+})
+
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def redis_server():
+    """A fresh in-process Redis server"""
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Test client for the API, started once for the session"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def register_user(client, **overrides):
+    """
+    Register and log in a new user
+
+    Returns:
+        The user's ID and the Authorization header for their token
+    """
+    import uuid
+
+    email = f"user-{uuid.uuid4().hex[:12]}@example.com"
+    profile = {
+        "email": email,
+        "password": "correct horse battery",
+        "full_name": "Test User",
+        "gender": "female",
+        "age": 34,
+        "height_cm": 168,
+        "activity_level": "moderate",
+        "current_weight": 82.0,
+        "target_weight": 70.0,
+        **overrides,
+    }
+    response = client.post("/api/v1/users/register", json=profile)
+    assert response.status_code == 200, response.text
+    response = client.post("/api/v1/users/login", json={"email": email, "password": profile["password"]})
+    assert response.status_code == 200, response.text
+    login = response.json()
+    return login["user"]["id"], {"Authorization": f"Bearer {login['access_token']}"}
@@ -0,0 +1,137 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import storage
+from app.config import settings
+from app.services import account_deletion
+from app.utils import database
+
+PREFIX = settings.APP_NAME.lower().replace(" ", "_") + "_"
+# Enough weight logs for three pages at concurrency 1
+LOG_COUNTS = {"weight_logs": 2 * database.MAX_BATCH_WRITES + 100, "food_logs": 30, "daily_nutrition": 7}
+
+
+def seed_user(db, user_id):
+    """Store a profile, statistics and logs for a user straight in the backend"""
+    db.collection("users").document(user_id).set({"id": user_id, "email": f"{user_id}@example.com"})
+    db.collection(PREFIX + "weight_stats").document(user_id).set({"user_id": user_id, "current_weight": 80.0})
+    for name, count in LOG_COUNTS.items():
+        batch = db.batch()
+        for index in range(count):
+            batch.set(db.collection(PREFIX + name).document(), {"user_id": user_id, "index": index})
+        batch.commit()
+
+
+def remaining(db, user_id):
+    """Count what is left of a user's data in every collection"""
+    counts = {
+        name: len(list(db.collection(PREFIX + name).where("user_id", "==", user_id).stream()))
+        for name in account_deletion.USER_COLLECTIONS
+    }
+    counts["users"] = int(db.collection("users").document(user_id).get().exists)
+    counts["weight_stats"] = int(db.collection(PREFIX + "weight_stats").document(user_id).get().exists)
+    return counts
+
+
+def get_job(db, job_id):
+    return db.collection(PREFIX + "account_deletions").document(job_id).get().to_dict()
+
+
+def test_sweeper_finishes_a_job_interrupted_mid_cascade(monkeypatch):
+    db = storage.get_client()
+    user_id, other_id = uuid.uuid4().hex, uuid.uuid4().hex
+    seed_user(db, user_id)
+    seed_user(db, other_id)
+
+    crashed = account_deletion.AccountDeletionRunner(concurrency=1)
+    # Run the job by hand so it can be interrupted
+    monkeypatch.setattr(crashed, "schedule", lambda job_id: None)
+    commit_batch = database.commit_batch
+    commits = []
+
+    async def crash_on_second_page(batch):
+        commits.append(batch)
+        if len(commits) == 2:
+            # The process dies part way through the weight logs
+            raise asyncio.CancelledError()
+        return await commit_batch(batch)
+
+    async def interrupt():
+        job = await crashed.submit(user_id)
+        monkeypatch.setattr(database, "commit_batch", crash_on_second_page)
+        with pytest.raises(asyncio.CancelledError):
+            await crashed.run(job["id"])
+        monkeypatch.setattr(database, "commit_batch", commit_batch)
+        return job["id"]
+
+    job_id = asyncio.run(interrupt())
+
+    job = get_job(db, job_id)
+    assert (job["status"], job["phase"], job["owner"]) == ("running", "weight_logs", crashed.owner)
+    assert job["deleted"]["account"] == 1 and job["deleted"]["weight_stats"] == 1
+    assert job["deleted"]["weight_logs"] == database.MAX_BATCH_WRITES
+    assert remaining(db, user_id)["weight_logs"] == LOG_COUNTS["weight_logs"] - database.MAX_BATCH_WRITES
+
+    sweeper = account_deletion.AccountDeletionRunner(concurrency=1)
+
+    async def sweep():
+        scheduled = await sweeper.resume()
+        await asyncio.gather(*list(sweeper._tasks))
+        return scheduled
+
+    # The crashed runner's lease still holds the job
+    assert asyncio.run(sweep()) == 0
+
+    db.collection(PREFIX + "account_deletions").document(job_id).update(
+        {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}
+    )
+    assert asyncio.run(sweep()) == 1
+
+    job = get_job(db, job_id)
+    assert (job["status"], job["owner"], job["attempts"], job["error"]) == ("succeeded", sweeper.owner, 2, None)
+    assert job["lease_expires_at"] is None and job["finished_at"] is not None
+    assert job["deleted"] == {"account": 1, "weight_stats": 1, **LOG_COUNTS}
+    assert set(remaining(db, user_id).values()) == {0}
+    # Other users' data is untouched
+    assert remaining(db, other_id) == {**LOG_COUNTS, "users": 1, "weight_stats": 1}
+
+    # A finished job is not picked up again
+    assert asyncio.run(sweep()) == 0
+
+
+def test_failed_page_is_retried_from_saved_progress(monkeypatch):
+    db = storage.get_client()
+    user_id = uuid.uuid4().hex
+    seed_user(db, user_id)
+
+    runner = account_deletion.AccountDeletionRunner(concurrency=2)
+    monkeypatch.setattr(runner, "schedule", lambda job_id: None)
+    commit_batch = database.commit_batch
+    commits = []
+
+    async def fail_third_batch(batch):
+        commits.append(batch)
+        if len(commits) == 3:
+            raise RuntimeError("Deadline exceeded")
+        return await commit_batch(batch)
+
+    async def run():
+        job = await runner.submit(user_id)
+        monkeypatch.setattr(database, "commit_batch", fail_third_batch)
+        failed = await runner.run(job["id"])
+        monkeypatch.setattr(database, "commit_batch", commit_batch)
+        return failed, await runner.run(job["id"])
+
+    failed, finished = asyncio.run(run())
+
+    # The first page went as two batches in parallel; the third batch failed
+    assert (failed["status"], failed["phase"], failed["error"]) == ("queued", "weight_logs", "Deadline exceeded")
+    assert failed["deleted"]["weight_logs"] == 2 * database.MAX_BATCH_WRITES
+    assert failed["lease_expires_at"] is None and failed["finished_at"] is None
+
+    assert (finished["status"], finished["attempts"]) == ("succeeded", 2)
+    assert get_job(db, finished["id"])["deleted"] == {"account": 1, "weight_stats": 1, **LOG_COUNTS}
+    assert set(remaining(db, user_id).values()) == {0}
@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import hmac
+import json
+
+import fakeredis
+import httpx
+import pytest
+from pydantic import BaseModel
+
+from app.config import settings
+from app.models.ai import AIJobCreate
+from app.services import ai_jobs
+from conftest import register_user
+
+PUBLIC_WEBHOOK = "https://93.184.216.34/hooks/ai"
+
+
+class Meal(BaseModel):
+    name: str
+    calories: int
+
+
+class FakeAIService:
+    """Stands in for AIService; fails when asked for a 'failing' meal and blocks on 'blocking'"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def get_meal_recommendation(self, calories, meal_type, dietary_restrictions, available_ingredients):
+        if meal_type == "failing":
+            raise ValueError("OpenAI is unavailable")
+        if meal_type == "blocking":
+            await self.release.wait()
+        return Meal(name=f"{meal_type} bowl", calories=calories)
+
+
+@pytest.fixture
+def user_id(client):
+    return register_user(client)[0]
+
+
+@pytest.fixture
+def broker(redis_server):
+    return ai_jobs.RedisJobBroker(fakeredis.FakeAsyncRedis(server=redis_server), prefix="test:ai_jobs")
+
+
+@pytest.fixture
+def webhooks(monkeypatch):
+    """Requests sent to webhooks, answered with 200"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ai_jobs, "get_webhook_client", lambda: client)
+    return requests
+
+
+def meal_job(meal_type="lunch", webhook_url=None):
+    return AIJobCreate(kind="meal", params={"calories": 600, "meal_type": meal_type}, webhook_url=webhook_url)
+
+
+async def run_next(broker, ai_service=None):
+    worker = ai_jobs.AIJobWorker(broker=broker, concurrency=1, ai_service=ai_service or FakeAIService())
+    return await worker.process(await broker.dequeue(timeout=1))
+
+
+def test_submitted_job_is_polled_until_it_succeeds(broker, user_id):
+    async def run():
+        job = await ai_jobs.submit_job(user_id, meal_job(), broker=broker)
+        assert (await ai_jobs.get_job(user_id, job["id"], broker=broker))["status"] == "queued"
+        assert await broker.depth() == 1
+
+        await run_next(broker)
+        finished = await ai_jobs.get_job(user_id, job["id"], broker=broker)
+        assert finished["status"] == "succeeded"
+        assert finished["result"] == {"name": "lunch bowl", "calories": 600}
+        assert finished["attempts"] == 1
+        assert await broker.depth() == 0
+        assert await broker.redis.llen(broker.processing_key) == 0
+
+        with pytest.raises(FileNotFoundError):
+            await ai_jobs.get_job("someone-else", job["id"], broker=broker)
+
+    asyncio.run(run())
+
+
+def test_failed_generation_is_recorded(broker, user_id):
+    async def run():
+        job = await ai_jobs.submit_job(user_id, meal_job("failing"), broker=broker)
+        await run_next(broker)
+        failed = await ai_jobs.get_job(user_id, job["id"], broker=broker)
+        assert failed["status"] == "failed"
+        assert failed["error"] == "OpenAI is unavailable"
+        assert await broker.redis.llen(broker.processing_key) == 0
+
+    asyncio.run(run())
+
+
+def test_webhook_receives_signed_job(broker, user_id, webhooks):
+    async def run():
+        job = await ai_jobs.submit_job(user_id, meal_job(webhook_url=PUBLIC_WEBHOOK), broker=broker)
+        await run_next(broker)
+
+        [request] = webhooks
+        assert str(request.url) == PUBLIC_WEBHOOK
+        expected = hmac.new(settings.SECRET_KEY.encode(), request.content, hashlib.sha256).hexdigest()
+        assert request.headers["X-SlimSense-Signature"] == expected
+        body = json.loads(request.content)
+        assert body["id"] == job["id"]
+        assert body["status"] == "succeeded"
+        assert "user_id" not in body and "webhook_url" not in body
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("url", [
+    "http://93.184.216.34/hook",
+    "https://127.0.0.1/hook",
+    "https://localhost:8000/hook",
+    "https://10.0.0.5/hook",
+    "https://192.168.1.20/hook",
+    "https://169.254.169.254/latest/meta-data",
+    "https://[::1]/hook",
+    "https://[::ffff:127.0.0.1]/hook",
+    "https:///hook",
+])
+def test_webhook_to_non_public_address_is_rejected(broker, user_id, url):
+    with pytest.raises(ValueError):
+        asyncio.run(ai_jobs.submit_job(user_id, meal_job(webhook_url=url), broker=broker))
+
+
+def test_allowed_webhook_host_may_be_private(broker, user_id, monkeypatch):
+    monkeypatch.setattr(settings, "AI_JOB_WEBHOOK_ALLOWED_HOSTS", "hooks.internal, localhost")
+    job = asyncio.run(ai_jobs.submit_job(user_id, meal_job(webhook_url="https://localhost/hook"), broker=broker))
+    assert job["webhook_url"] == "https://localhost/hook"
+
+
+def test_webhook_address_is_checked_again_on_delivery(broker, user_id, webhooks):
+    async def run():
+        job = await ai_jobs.submit_job(user_id, meal_job(webhook_url=PUBLIC_WEBHOOK), broker=broker)
+        # e.g. the host now resolves to an internal address
+        job["webhook_url"] = "https://127.0.0.1/hook"
+        await broker.save(job)
+        failures = ai_jobs.metrics.counters["webhook_failures"]
+
+        await run_next(broker)
+        assert webhooks == []
+        assert ai_jobs.metrics.counters["webhook_failures"] == failures + 1
+
+    asyncio.run(run())
+
+
+def test_job_of_crashed_worker_is_requeued(broker, user_id):
+    async def run():
+        job = await ai_jobs.submit_job(user_id, meal_job(), broker=broker)
+        taken = await broker.dequeue(timeout=1)
+        assert taken["id"] == job["id"]
+        assert await broker.depth() == 0
+
+        # The worker is still within its lease
+        assert await broker.requeue_stale() == 0
+        # ... then dies and the lease expires
+        await broker.redis.delete(broker._lease_key(job["id"]))
+        assert await broker.requeue_stale() == 1
+        assert await broker.depth() == 1
+        assert await broker.redis.llen(broker.processing_key) == 0
+
+        await run_next(broker)
+        assert (await broker.get(job["id"]))["status"] == "succeeded"
+
+    asyncio.run(run())
+
+
+def test_job_is_failed_after_max_attempts(broker, user_id, monkeypatch):
+    monkeypatch.setattr(settings, "AI_JOB_MAX_ATTEMPTS", 1)
+
+    async def run():
+        job = await ai_jobs.submit_job(user_id, meal_job(), broker=broker)
+        taken = await broker.dequeue(timeout=1)
+        taken["attempts"] = 1
+        await broker.save(taken)
+        await broker.redis.delete(broker._lease_key(job["id"]))
+
+        assert await broker.requeue_stale() == 0
+        failed = await broker.get(job["id"])
+        assert failed["status"] == "failed"
+        assert "gave up after 1 attempts" in failed["error"]
+        assert await broker.depth() == 0
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("use_redis", [True, False])
+def test_stopping_worker_hands_back_running_job(broker, user_id, monkeypatch, use_redis):
+    monkeypatch.setattr(settings, "OPENAI_TIMEOUT_SECONDS", 0.2)
+    if not use_redis:
+        broker = ai_jobs.InMemoryJobBroker()
+
+    async def run():
+        worker = ai_jobs.AIJobWorker(broker=broker, concurrency=1, ai_service=FakeAIService())
+        worker.start()
+        job = await ai_jobs.submit_job(user_id, meal_job("blocking"), broker=broker)
+        for _ in range(100):
+            if (await broker.get(job["id"]))["status"] == "running":
+                break
+            await asyncio.sleep(0.02)
+
+        await worker.stop()
+        job = await broker.get(job["id"])
+        if use_redis:
+            assert job["status"] == "queued"
+            assert await broker.depth() == 1
+        else:
+            assert job["status"] == "failed"
+            assert job["error"] == "Worker stopped before the job finished"
+
+    asyncio.run(run())
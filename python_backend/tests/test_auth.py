@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from app.config import settings
+from app.services import user_service
+from app.utils import database
+from conftest import register_user
+
+
+@pytest.fixture
+def profile_reads(monkeypatch):
+    """Count reads of users/{id} documents"""
+    reads = []
+    get_document = database.get_document
+
+    async def counting_get_document(doc_ref):
+        if doc_ref.path.startswith("users/"):
+            reads.append(doc_ref.id)
+        return await get_document(doc_ref)
+
+    monkeypatch.setattr(database, "get_document", counting_get_document)
+    return reads
+
+
+def wait_for_deletion(client, job_id):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/v1/users/deletions/{job_id}").json()
+        if job["status"] == "succeeded":
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Deletion job did not finish: {job}")
+
+
+def test_invalid_token_is_rejected(client):
+    response = client.get("/api/v1/weight/logs", headers={"Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
+
+
+def test_profile_is_read_once_while_cached(client, profile_reads):
+    user_id, headers = register_user(client)
+    profile_reads.clear()
+    for _ in range(3):
+        assert client.get("/api/v1/users/me", headers=headers).status_code == 200
+        assert client.get("/api/v1/weight/logs", headers=headers).status_code == 200
+    assert profile_reads.count(user_id) == 1
+
+
+def test_profile_update_invalidates_cache(client):
+    _, headers = register_user(client)
+    assert client.get("/api/v1/users/me", headers=headers).json()["full_name"] == "Test User"
+    response = client.put("/api/v1/users/me", json={"full_name": "Renamed User"}, headers=headers)
+    assert response.status_code == 200
+    assert client.get("/api/v1/users/me", headers=headers).json()["full_name"] == "Renamed User"
+
+
+def test_weight_log_invalidates_cached_current_weight(client):
+    user_id, headers = register_user(client)
+    assert client.get("/api/v1/users/me", headers=headers).json()["current_weight"] == 82.0
+    response = client.post("/api/v1/weight/log", json={"user_id": user_id, "weight_kg": 80.5}, headers=headers)
+    assert response.status_code == 200
+    assert client.get("/api/v1/users/me", headers=headers).json()["current_weight"] == 80.5
+
+
+def test_trusted_claims_skip_profile_read(client, profile_reads, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    user_id, headers = register_user(client)
+    profile_reads.clear()
+    assert client.get("/api/v1/weight/logs", headers=headers).status_code == 200
+    assert user_id not in profile_reads
+
+
+@pytest.mark.parametrize("trust_claims", [False, True])
+def test_deleted_account_token_is_rejected(client, monkeypatch, trust_claims):
+    monkeypatch.setattr(settings, "AUTH_TRUST_TOKEN_CLAIMS", trust_claims)
+    user_id, headers = register_user(client)
+    assert client.get("/api/v1/weight/logs", headers=headers).status_code == 200
+
+    response = client.delete("/api/v1/users/me", headers=headers)
+    assert response.status_code == 202
+    wait_for_deletion(client, response.json()["id"])
+
+    response = client.post("/api/v1/weight/log", json={"user_id": user_id, "weight_kg": 80.0}, headers=headers)
+    assert response.status_code == 401
+    assert client.get("/api/v1/weight/logs", headers=headers).status_code == 401
+    assert client.get("/api/v1/users/me", headers=headers).status_code == 401
+
+
+def test_deleted_account_is_rejected_once_its_cache_entry_is_gone(client, monkeypatch):
+    # Another worker deleted the account: this process has no revocation
+    # entry, but the profile read after the cache expires finds no user
+    user_id, headers = register_user(client)
+    assert client.get("/api/v1/weight/logs", headers=headers).status_code == 200
+    response = client.delete("/api/v1/users/me", headers=headers)
+    wait_for_deletion(client, response.json()["id"])
+
+    user_service.deleted_users.delete(user_id)
+    assert client.get("/api/v1/weight/logs", headers=headers).status_code == 401
@@ -0,0 +1,166 @@
+import asyncio
+
+import fakeredis
+
+from app.utils.cache import TieredCache
+
+
+def make_cache(server=None, ttl=60.0, stale_ttl=60.0, namespace="test"):
+    client = fakeredis.FakeAsyncRedis(server=server) if server is not None else None
+    return TieredCache(namespace, ttl=ttl, stale_ttl=stale_ttl, redis_client=client, use_redis=server is not None)
+
+
+def counting_loader(values):
+    calls = []
+
+    async def load():
+        calls.append(len(calls))
+        return values[min(len(calls) - 1, len(values) - 1)]
+
+    return load, calls
+
+
+def test_miss_loads_then_hits_locally(redis_server):
+    async def run():
+        cache = make_cache(redis_server)
+        load, calls = counting_loader(["value"])
+        assert await cache.get_or_load("key", load) == "value"
+        assert await cache.get_or_load("key", load) == "value"
+        assert len(calls) == 1
+        assert cache.counters["misses"] == 1
+        assert cache.counters["hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_redis_tier_is_shared_between_processes(redis_server):
+    async def run():
+        writer = make_cache(redis_server)
+        reader = make_cache(redis_server)
+        await writer.get_or_load("key", counting_loader([{"calories": 95}])[0])
+
+        load, calls = counting_loader([{"calories": 0}])
+        assert await reader.get_or_load("key", load) == {"calories": 95}
+        assert calls == []
+        assert reader.counters["redis_hits"] == 1
+        assert reader.counters["hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_concurrent_misses_share_one_load(redis_server):
+    async def run():
+        cache = make_cache(redis_server)
+        calls = []
+
+        async def slow_load():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "value"
+
+        results = await asyncio.gather(*(cache.get_or_load("key", slow_load) for _ in range(10)))
+        assert results == ["value"] * 10
+        assert len(calls) == 1
+
+    asyncio.run(run())
+
+
+def test_stale_entry_is_served_and_refreshed_in_background(redis_server):
+    async def run():
+        cache = make_cache(redis_server, ttl=0.05)
+        load, calls = counting_loader(["old", "new"])
+        assert await cache.get_or_load("key", load) == "old"
+        await asyncio.sleep(0.1)
+
+        # Served stale straight away while the reload runs
+        assert await cache.get_or_load("key", load) == "old"
+        assert cache.counters["stale_hits"] == 1
+        await asyncio.sleep(0.01)
+        assert len(calls) == 2
+        assert await cache.get_or_load("key", load) == "new"
+        assert cache.counters["hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_failed_background_refresh_keeps_stale_value(redis_server):
+    async def run():
+        cache = make_cache(redis_server, ttl=0.05)
+        await cache.get_or_load("key", counting_loader(["old"])[0])
+        await asyncio.sleep(0.1)
+
+        async def failing_load():
+            raise ValueError("upstream down")
+
+        assert await cache.get_or_load("key", failing_load) == "old"
+        await asyncio.sleep(0.01)
+        assert cache.counters["load_errors"] == 1
+        assert await cache.get_or_load("key", failing_load) == "old"
+
+    asyncio.run(run())
+
+
+def test_expired_entry_is_reloaded(redis_server):
+    async def run():
+        cache = make_cache(redis_server, ttl=0.02, stale_ttl=0.02)
+        load, calls = counting_loader(["old", "new"])
+        await cache.get_or_load("key", load)
+        await asyncio.sleep(0.1)
+        assert await cache.get_or_load("key", load) == "new"
+        assert cache.counters["misses"] == 2
+
+    asyncio.run(run())
+
+
+def test_negative_results_are_cached_with_their_own_ttl(redis_server):
+    async def run():
+        cache = make_cache(redis_server, ttl=3600)
+        await cache.set("unknown-barcode", None, ttl=0.05)
+        entry = await cache.get("unknown-barcode")
+        assert entry is not None and entry[0] is None
+
+        load, calls = counting_loader([None])
+        assert await cache.get_or_load("unknown-barcode", load) is None
+        assert calls == []
+
+        # The short TTL applies to the negative entry, not the cache default
+        await asyncio.sleep(0.1)
+        assert await cache.get_fresh("unknown-barcode") is None
+        assert cache.counters["misses"] == 1
+
+    asyncio.run(run())
+
+
+def test_falls_back_to_local_tier_when_redis_is_down(redis_server):
+    async def run():
+        redis_server.connected = False
+        cache = make_cache(redis_server)
+        load, calls = counting_loader(["value"])
+        assert await cache.get_or_load("key", load) == "value"
+        assert await cache.get_or_load("key", load) == "value"
+        assert len(calls) == 1
+        assert cache.counters["redis_errors"] >= 1
+
+    asyncio.run(run())
+
+
+def test_delete_removes_both_tiers(redis_server):
+    async def run():
+        cache = make_cache(redis_server)
+        await cache.set("key", "value")
+        await cache.delete("key")
+        assert await cache.get("key") is None
+        assert await make_cache(redis_server).get("key") is None
+
+    asyncio.run(run())
+
+
+def test_without_redis_uses_local_tier_only():
+    async def run():
+        cache = make_cache()
+        load, calls = counting_loader(["value"])
+        await cache.get_or_load("key", load)
+        assert await cache.get_or_load("key", load) == "value"
+        assert cache.counters["redis_errors"] == 0
+
+    asyncio.run(run())
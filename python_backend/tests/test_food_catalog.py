@@ -0,0 +1,79 @@
+import pytest
+
+from app.services.food_catalog import FoodCatalog, edit_distance, prefix_edit_distance
+
+FOODS = [
+    {"food_name": "Apple", "serving_size": 1.0, "serving_unit": "medium", "calories": 95},
+    {"food_name": "Apple Juice", "serving_size": 1.0, "serving_unit": "cup", "calories": 114},
+    {"food_name": "Chicken Breast", "serving_size": 100.0, "serving_unit": "g", "calories": 165},
+    {"food_name": "Greek Yogurt Plain", "serving_size": 170.0, "serving_unit": "g", "calories": 100, "brand": "Chobani"},
+    {"food_name": "Peanut Butter", "serving_size": 2.0, "serving_unit": "tbsp", "calories": 190, "brand": "Jif"},
+    {"food_name": "Brown Rice", "serving_size": 1.0, "serving_unit": "cup", "calories": 216},
+]
+
+
+@pytest.fixture
+def catalog():
+    catalog = FoodCatalog()
+    catalog.load(FOODS)
+    return catalog
+
+
+def names(results):
+    return [result["food_name"] for result in results]
+
+
+def test_edit_distances():
+    assert edit_distance("apple", "aplpe", 2) == 1  # transposition
+    assert edit_distance("apple", "aple", 2) == 1
+    assert edit_distance("apple", "orange", 1) == 2  # capped at max_distance + 1
+    assert prefix_edit_distance("aple", "apple", 1) == 1
+    assert prefix_edit_distance("brest", "breast", 1) == 1
+    assert prefix_edit_distance("xyz", "apple", 1) == 2
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("app", ["Apple", "Apple Juice"]),
+    ("Apple", ["Apple", "Apple Juice"]),
+    ("apple j", ["Apple Juice"]),
+    ("yogurt", ["Greek Yogurt Plain"]),  # a later word of the name
+    ("breast", ["Chicken Breast"]),
+    ("chobani greek", ["Greek Yogurt Plain"]),  # brand first
+    ("jif pea", ["Peanut Butter"]),
+    ("greek yogurt plain chobani", ["Greek Yogurt Plain"]),
+])
+def test_prefix_search(catalog, query, expected):
+    assert names(catalog.search(query)) == expected
+
+
+def test_whole_name_matches_rank_before_later_words(catalog):
+    catalog.add({"food_name": "Rice Cakes", "serving_size": 1.0, "serving_unit": "cake", "calories": 35})
+    assert names(catalog.search("rice")) == ["Rice Cakes", "Brown Rice"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("aple", "Apple"),  # dropped letter while typing
+    ("appple", "Apple"),  # extra letter
+    ("aplpe", "Apple"),  # swapped letters
+    ("chicken brest", "Chicken Breast"),
+    ("chiken breast", "Chicken Breast"),  # typo in a finished word
+    ("peanut buter", "Peanut Butter"),
+    ("brwon", "Brown Rice"),
+])
+def test_typos_are_corrected(catalog, query, expected):
+    assert names(catalog.search(query))[0] == expected
+
+
+def test_unmatched_query_returns_nothing(catalog):
+    assert catalog.search("zzzzqqq") == []
+    assert catalog.search("  ") == []
+    assert catalog.stats()["misses"] == 1
+
+
+def test_added_foods_are_searchable_and_not_duplicated(catalog):
+    new = {"food_name": "Banana", "serving_size": 1.0, "serving_unit": "medium", "calories": 105}
+    assert catalog.add_many([new, FOODS[0]]) == [new]
+    assert names(catalog.search("ban")) == ["Banana"]
+    assert names(catalog.search("banan")) == ["Banana"]
+    assert len(catalog) == len(FOODS) + 1
+    assert catalog.search("ban")[0]["is_custom"] is False
@@ -0,0 +1,139 @@
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.models.user import UserInDB
+from app.services import energy, forecasting
+from app.services.user_service import compute_nutrition_goals
+
+START = datetime(2026, 8, 1, 7, 0)
+
+
+def make_user(current_weight=90.0, target_weight=80.0, **overrides):
+    now = datetime(2026, 10, 1)
+    profile = {
+        "id": "forecast-user",
+        "email": "forecast@example.com",
+        "full_name": "Forecast User",
+        "gender": "female",
+        "age": 40,
+        "height_cm": 170,
+        "activity_level": "lightly active",
+        "created_at": now,
+        "updated_at": now,
+        "current_weight": current_weight,
+        "target_weight": target_weight,
+        "starting_weight": current_weight,
+        **overrides,
+    }
+    return UserInDB(**profile)
+
+
+def daily_logs(weights, every_days=1):
+    return [
+        {"logged_at": START + timedelta(days=index * every_days), "weight_kg": weight}
+        for index, weight in enumerate(weights)
+    ]
+
+
+def projections(forecast):
+    return [week["projected_weight"] for week in forecast.weekly_projections]
+
+
+def test_energy_helpers_match_mifflin_st_jeor():
+    user = make_user(gender="male", age=30, height_cm=180, activity_level="very active")
+    bmr, tdee = energy.estimate_energy_expenditure(user, 80.0)
+    assert bmr == 10 * 80 + 6.25 * 180 - 5 * 30 + 5
+    assert tdee == pytest.approx(bmr * 1.725)
+    # Unknown activity levels count as moderately active
+    assert energy.activity_multiplier(make_user(activity_level="moderate")) == 1.55
+
+
+def test_goals_and_forecast_share_the_energy_model():
+    user = make_user(current_weight=70.0, target_weight=70.0, calorie_goal=None)
+    _, tdee = energy.estimate_energy_expenditure(user)
+    assert compute_nutrition_goals(user)["calorie_goal"] == int(tdee)
+    forecast = forecasting.forecast_weight(user, daily_logs([70.0]), 70.0)
+    assert any(f"{tdee:.0f} kcal TDEE" in text for text in forecast.recommendations)
+
+
+def test_long_history_follows_the_measured_trend():
+    # 0.1 kg a day for six weeks: past FULL_TRUST_DAYS, so the trend alone drives the projection
+    weights = [90.0 - 0.1 * day for day in range(43)]
+    forecast = forecasting.forecast_weight(make_user(current_weight=weights[-1]), daily_logs(weights), 80.0)
+
+    assert projections(forecast)[:3] == [85.1, 84.4, 83.7]
+    assert "(100%)" in forecast.explanation and "-0.70 kg per week" in forecast.explanation
+    weeks_to_target = (weights[-1] - 80.0) / 0.7
+    expected = datetime.utcnow() + timedelta(weeks=weeks_to_target)
+    assert forecast.expected_completion_date == expected.strftime("%Y-%m-%d")
+    assert forecast.calorie_deficit_required > 0
+    assert all(week["required_calorie_deficit"] > 0 for week in forecast.weekly_projections)
+
+
+def test_short_history_blends_trend_with_energy_model():
+    # Two weeks of history: the trend gets half the weight
+    weights = [85.0 - 0.1 * day for day in range(15)]
+    user = make_user(current_weight=weights[-1], calorie_goal=1500)
+    forecast = forecasting.forecast_weight(user, daily_logs(weights), 80.0)
+
+    week_days = np.arange(1, 13) * 7.0
+    energy_model = forecasting.energy_balance_projection(user, weights[-1], 1500.0, week_days)
+    trend = weights[-1] - 0.1 * week_days
+    expected = [round(float(value), 1) for value in 0.5 * trend + 0.5 * energy_model]
+    assert projections(forecast) == expected
+    assert "(50%)" in forecast.explanation
+
+
+def test_single_log_uses_the_energy_model():
+    user = make_user(current_weight=90.0, calorie_goal=1600)
+    forecast = forecasting.forecast_weight(user, daily_logs([90.0]), 80.0)
+
+    week_days = np.arange(1, 13) * 7.0
+    energy_model = forecasting.energy_balance_projection(user, 90.0, 1600.0, week_days)
+    assert projections(forecast) == [round(float(value), 1) for value in energy_model]
+    assert "not yet enough history" in forecast.explanation
+    assert "Limited weight history makes the trend uncertain" in forecast.challenges
+    assert all(a > b for a, b in zip(projections(forecast), projections(forecast)[1:]))
+
+
+def test_user_at_target_is_maintaining():
+    weights = [70.1, 69.9, 70.0, 70.1, 70.0, 69.9, 70.0]
+    user = make_user(current_weight=70.0, target_weight=70.0)
+    forecast = forecasting.forecast_weight(user, daily_logs(weights, every_days=3), 70.0)
+
+    assert forecast.calorie_deficit_required == 0
+    assert forecast.sustainable_rate == 0.0
+    assert all(week["required_calorie_deficit"] == 0 for week in forecast.weekly_projections)
+    assert forecast.expected_completion_date == datetime.utcnow().strftime("%Y-%m-%d")
+    assert not any("surplus" in text or "deficit" in text for text in forecast.recommendations)
+    assert "hold it there" in forecast.explanation
+
+
+def test_gaining_asks_for_a_surplus():
+    weights = [55.0 + 0.05 * day for day in range(29)]
+    user = make_user(current_weight=weights[-1], target_weight=60.0)
+    forecast = forecasting.forecast_weight(user, daily_logs(weights), 60.0)
+
+    assert forecast.calorie_deficit_required < 0
+    assert any("surplus" in text for text in forecast.recommendations)
+    assert projections(forecast)[0] > weights[-1]
+    assert forecast.expected_completion_date is not None
+
+
+def test_forecast_takes_under_a_millisecond():
+    # Twice-daily logs for the 90 days the API loads
+    weights = [90.0 - 0.05 * index + 0.3 * np.sin(index) for index in range(180)]
+    user = make_user(current_weight=weights[-1])
+    logs = daily_logs(weights, every_days=0.5)
+    forecasting.forecast_weight(user, logs, 80.0)
+
+    timings = []
+    for _ in range(50):
+        start = time.perf_counter()
+        forecasting.forecast_weight(user, logs, 80.0)
+        timings.append(time.perf_counter() - start)
+    # The fastest run is the forecast's own cost, free of noise from other processes
+    assert min(timings) < 0.001
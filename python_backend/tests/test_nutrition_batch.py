@@ -0,0 +1,63 @@
+import uuid
+
+import pytest
+
+from app.routers import nutrition as nutrition_router
+from conftest import register_user
+
+
+def nutritionix_food(name):
+    return {
+        "food_name": name,
+        "nf_calories": 95,
+        "nf_protein": 0.5,
+        "nf_total_carbohydrate": 25,
+        "nf_total_fat": 0.3,
+    }
+
+
+@pytest.fixture
+def nutritionix(monkeypatch):
+    """Stub Nutritionix that knows every food except those named unknown-*"""
+    queries = []
+
+    async def fetch_natural_nutrients(query):
+        queries.append(query)
+        names = [line.split(" ", 2)[2] for line in query.splitlines()]
+        return [nutritionix_food(name) for name in names if not name.startswith("unknown-")]
+
+    service = nutrition_router.nutrition_service
+    monkeypatch.setattr(service, "nutritionix_app_id", "test-app")
+    monkeypatch.setattr(service, "nutritionix_api_key", "test-key")
+    monkeypatch.setattr(service, "_fetch_natural_nutrients", fetch_natural_nutrients)
+    return queries
+
+
+def batch(client, headers, names):
+    items = [{"food_name": name, "serving_size": 1.0, "serving_unit": "serving"} for name in names]
+    response = client.post("/api/v1/nutrition/nutrition/batch", json=items, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_batch_is_answered_by_one_query(client, nutritionix):
+    _, headers = register_user(client)
+    names = [f"apple-{uuid.uuid4().hex[:8]}", f"pear-{uuid.uuid4().hex[:8]}"]
+    results = batch(client, headers, names)
+    assert [result["food_name"] for result in results] == names
+    assert len(nutritionix) == 1
+
+
+def test_unknown_food_maps_to_null(client, nutritionix):
+    _, headers = register_user(client)
+    known = f"apple-{uuid.uuid4().hex[:8]}"
+    unknown = f"unknown-{uuid.uuid4().hex[:8]}"
+    results = batch(client, headers, [known, unknown, known])
+    assert results[0]["food_name"] == known
+    assert results[1] is None
+    assert results[2] == results[0]
+
+    # The known food was cached; the unknown one is asked for again
+    nutritionix.clear()
+    assert batch(client, headers, [known, unknown]) == [results[0], None]
+    assert len(nutritionix) == 1
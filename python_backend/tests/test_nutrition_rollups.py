@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime, timezone
+
+from app import storage
+from app.config import settings
+from app.services.nutrition_service import NutritionService
+from conftest import register_user
+
+LOGS = settings.APP_NAME.lower().replace(" ", "_") + "_food_logs"
+
+
+def food_log(user_id, logged_at, calories=95, meal_type="snack"):
+    return {
+        "user_id": user_id,
+        "food_name": "Apple",
+        "meal_type": meal_type,
+        "calories": calories,
+        "protein": 0.5,
+        "carbs": 25.0,
+        "fat": 0.3,
+        "serving_size": 1,
+        "serving_unit": "medium",
+        "logged_at": logged_at,
+    }
+
+
+def summary_calories(client, headers, day):
+    response = client.get(f"/api/v1/nutrition/summary/{day}", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["total_calories"]
+
+
+def log_ids(client, headers, day):
+    response = client.get(f"/api/v1/nutrition/logs/{day}", headers=headers)
+    assert response.status_code == 200, response.text
+    return [log["id"] for log in response.json()]
+
+
+def test_offset_timestamp_is_rolled_up_on_its_utc_day(client):
+    user_id, headers = register_user(client)
+    # 23:30 at UTC-5 is 04:30 UTC the next day
+    response = client.post("/api/v1/nutrition/log", json=food_log(user_id, "2026-10-16T23:30:00-05:00"), headers=headers)
+    log_id = response.json()
+
+    assert summary_calories(client, headers, "2026-10-16") == 0
+    assert summary_calories(client, headers, "2026-10-17") == 95
+    assert log_ids(client, headers, "2026-10-16") == []
+    assert log_ids(client, headers, "2026-10-17") == [log_id]
+
+    assert client.delete(f"/api/v1/nutrition/log/{log_id}", headers=headers).json() is True
+    assert summary_calories(client, headers, "2026-10-16") == 0
+    assert summary_calories(client, headers, "2026-10-17") == 0
+
+
+def test_update_moves_log_between_utc_days(client):
+    user_id, headers = register_user(client)
+    response = client.post("/api/v1/nutrition/log", json=food_log(user_id, "2026-10-16T23:30:00-05:00"), headers=headers)
+    log_id = response.json()
+
+    update = {"logged_at": "2026-10-16T12:00:00-05:00", "calories": 120}
+    assert client.put(f"/api/v1/nutrition/log/{log_id}", json=update, headers=headers).json() is True
+
+    assert summary_calories(client, headers, "2026-10-16") == 120
+    assert summary_calories(client, headers, "2026-10-17") == 0
+    assert log_ids(client, headers, "2026-10-16") == [log_id]
+    assert log_ids(client, headers, "2026-10-17") == []
+
+
+def test_bulk_logs_are_grouped_by_utc_day(client):
+    user_id, headers = register_user(client)
+    entries = [
+        food_log(user_id, "2026-10-16T23:30:00-05:00"),
+        food_log(user_id, "2026-10-17T08:00:00+00:00", calories=200),
+        food_log(user_id, "2026-10-17T01:00:00+09:00", calories=50),
+    ]
+    result = client.post("/api/v1/nutrition/logs/bulk", json=entries, headers=headers).json()
+    assert result["written"] == 3
+
+    assert summary_calories(client, headers, "2026-10-16") == 50
+    assert summary_calories(client, headers, "2026-10-17") == 295
+
+
+def test_day_without_rollup_is_rebuilt_from_raw_logs(client):
+    # Logs written before rollups existed have no rollup document; changing
+    # one must not leave a rollup holding only that change
+    user_id, headers = register_user(client)
+    collection = storage.get_client().collection(LOGS)
+    for hour, calories in ((10, 100), (12, 200)):
+        data = food_log(user_id, datetime(2026, 10, 10, hour, tzinfo=timezone.utc), calories=calories)
+        collection.document().set({**data, "created_at": datetime.now(timezone.utc)})
+    old_ids = log_ids(client, headers, "2026-10-10")
+    assert summary_calories(client, headers, "2026-10-10") == 300
+
+    assert client.delete(f"/api/v1/nutrition/log/{old_ids[0]}", headers=headers).json() is True
+    assert summary_calories(client, headers, "2026-10-10") == 200
+
+    client.post("/api/v1/nutrition/log", json=food_log(user_id, "2026-10-10T18:00:00Z", calories=40), headers=headers)
+    assert summary_calories(client, headers, "2026-10-10") == 240
+
+    update = {"logged_at": "2026-10-11T09:00:00+02:00"}
+    assert client.put(f"/api/v1/nutrition/log/{old_ids[1]}", json=update, headers=headers).json() is True
+    assert summary_calories(client, headers, "2026-10-10") == 40
+    assert summary_calories(client, headers, "2026-10-11") == 200
+
+
+def test_concurrent_changes_to_one_log_apply_once(client):
+    user_id, headers = register_user(client)
+    ids = [
+        client.post("/api/v1/nutrition/log", json=food_log(user_id, f"2026-10-12T{hour}:00:00Z", calories=400), headers=headers).json()
+        for hour in ("08", "12")
+    ]
+    assert summary_calories(client, headers, "2026-10-12") == 800
+
+    service = NutritionService()
+
+    async def race(*changes):
+        return await asyncio.gather(*changes, return_exceptions=True)
+
+    outcomes = asyncio.run(race(
+        service.delete_food_log(ids[0], user_id),
+        service.delete_food_log(ids[0], user_id),
+    ))
+    assert sum(outcome is True for outcome in outcomes) == 1
+    assert summary_calories(client, headers, "2026-10-12") == 400
+
+    outcomes = asyncio.run(race(
+        service.update_food_log(ids[1], user_id, {"calories": 300}),
+        service.delete_food_log(ids[1], user_id),
+    ))
+    assert outcomes[1] is True
+    assert summary_calories(client, headers, "2026-10-12") == 0
+    assert log_ids(client, headers, "2026-10-12") == []
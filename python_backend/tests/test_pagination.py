@@ -0,0 +1,176 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import firestore as cloud_firestore
+
+from app import storage
+from app.utils import database, pagination
+from conftest import register_user
+
+START = datetime(2026, 9, 1, 8, 0, tzinfo=timezone.utc)
+
+
+def seed_logs(count=12, per_time=3):
+    """Store logs in a fresh collection, several sharing each logged_at"""
+    db = storage.get_client()
+    collection = db.collection(f"pagination_{uuid.uuid4().hex[:8]}")
+    for index in range(count):
+        collection.document().set({
+            "user_id": "user",
+            "index": index,
+            "logged_at": START + timedelta(hours=index // per_time),
+        })
+    # Another user's logs at the same times must not leak into the pages
+    collection.document().set({"user_id": "other", "index": -1, "logged_at": START})
+    return collection, collection.where("user_id", "==", "user")
+
+
+def fetch_all_pages(collection, query, limit, descending):
+    async def fetch():
+        pages, cursor = [], None
+        while True:
+            docs, cursor = await pagination.fetch_page(
+                collection, query, ("logged_at",), limit, cursor, descending
+            )
+            pages.append(docs)
+            if cursor is None:
+                return pages
+
+    return asyncio.run(fetch())
+
+
+def expected_order(collection, query, descending):
+    """Every matching document sorted on (logged_at, ID) in the given direction"""
+    docs = sorted(query.stream(), key=lambda doc: (doc.to_dict()["logged_at"], doc.id), reverse=descending)
+    return [doc.id for doc in docs]
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("limit", [1, 2, 4, 5, 12, 50])
+def test_pages_with_tied_timestamps_have_no_gaps_or_duplicates(limit, descending):
+    collection, query = seed_logs()
+    pages = fetch_all_pages(collection, query, limit, descending)
+
+    ids = [doc.id for page in pages for doc in page]
+    assert ids == expected_order(collection, query, descending)
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_iterate_pages_yields_every_document_once(descending):
+    collection, query = seed_logs(count=10, per_time=4)
+
+    async def collect():
+        return [
+            doc.id
+            async for doc in pagination.iterate_pages(collection, query, ("logged_at",), 3, descending)
+        ]
+
+    assert asyncio.run(collect()) == expected_order(collection, query, descending)
+
+
+def test_cursor_is_bound_to_its_ordering():
+    collection, query = seed_logs()
+
+    async def first_cursor(fields, descending):
+        _, cursor = await pagination.fetch_page(collection, query, fields, 2, None, descending)
+        return cursor
+
+    descending_cursor = asyncio.run(first_cursor(("logged_at",), True))
+    ascending_cursor = asyncio.run(first_cursor(("logged_at",), False))
+    other_fields_cursor = asyncio.run(first_cursor(("index",), False))
+
+    for cursor, fields, descending in (
+        (descending_cursor, ("logged_at",), False),
+        (ascending_cursor, ("logged_at",), True),
+        (other_fields_cursor, ("logged_at",), False),
+    ):
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            asyncio.run(pagination.fetch_page(collection, query, fields, 2, cursor, descending))
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    "e30",  # {}
+    "W10",  # []
+    pagination.encode_cursor(("logged_at",), [], "abc"),
+    pagination.encode_cursor(("logged_at",), [{"$dt": 12}], "abc"),
+    pagination.encode_cursor(("logged_at",), [START], 7),
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        pagination.decode_cursor(cursor, ("logged_at",))
+
+
+def test_cursor_round_trips_timestamps():
+    cursor = pagination.encode_cursor(("logged_at",), [START + timedelta(microseconds=7)], "abc", descending=True)
+    assert pagination.decode_cursor(cursor, ("logged_at",), descending=True) == (
+        [START + timedelta(microseconds=7)], "abc"
+    )
+
+
+def test_firestore_cursor_starts_after_the_document_reference(monkeypatch):
+    client = cloud_firestore.Client(project="slim-sense-test", credentials=AnonymousCredentials())
+    collection = client.collection("weight_logs")
+    queries = []
+
+    async def capture(query, transaction=None):
+        queries.append(query)
+        return []
+
+    monkeypatch.setattr(database, "stream_query", capture)
+    cursor = pagination.encode_cursor(("logged_at",), [START], "abc", descending=True)
+    asyncio.run(pagination.fetch_page(
+        collection, collection.where("user_id", "==", "user"), ("logged_at",), 10, cursor, descending=True
+    ))
+
+    request = queries[0]._to_protobuf()
+    assert [(order.field.field_path, order.direction.name) for order in request.order_by] == [
+        ("logged_at", "DESCENDING"), ("__name__", "DESCENDING")
+    ]
+    assert request.start_at.before is False
+    timestamp, reference = request.start_at.values
+    assert timestamp.timestamp_value == START
+    assert reference.reference_value == "projects/slim-sense-test/databases/(default)/documents/weight_logs/abc"
+    assert request.limit == 11
+
+
+def test_weight_log_pages_through_the_api(client):
+    user_id, headers = register_user(client)
+    logged = []
+    for index in range(7):
+        response = client.post(
+            "/api/v1/weight/log",
+            # Pairs of logs share a timestamp
+            json={"user_id": user_id, "weight_kg": 80.0 - index / 10, "logged_at": f"2026-10-0{1 + index // 2}T08:00:00Z"},
+            headers=headers,
+        )
+        assert response.status_code == 200, response.text
+        logged.append(response.json())
+
+    ids, cursor = [], None
+    while True:
+        response = client.get("/api/v1/weight/logs", params={"limit": 2, "cursor": cursor}, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        # Each page is oldest first, and pages walk back in time
+        assert [log["logged_at"] for log in page] == sorted(log["logged_at"] for log in page)
+        ids = [log["id"] for log in page] + ids
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert sorted(ids) == sorted(logged) and len(set(ids)) == len(logged)
+
+    response = client.get("/api/v1/weight/logs", params={"cursor": "not a cursor"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_food_log_api_rejects_malformed_cursor(client):
+    _, headers = register_user(client)
+    response = client.get("/api/v1/nutrition/logs", params={"cursor": "e30"}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,48 @@
+from app import storage
+from app.config import settings
+from conftest import register_user
+
+STATS = settings.APP_NAME.lower().replace(" ", "_") + "_weight_stats"
+
+
+def log_weight(client, headers, user_id, weight_kg, logged_at):
+    response = client.post(
+        "/api/v1/weight/log",
+        json={"user_id": user_id, "weight_kg": weight_kg, "logged_at": logged_at},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def get_stats(client, headers):
+    response = client.get("/api/v1/weight/stats", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_stats_follow_log_changes(client):
+    user_id, headers = register_user(client)
+    log_weight(client, headers, user_id, 82.0, "2026-10-01T08:00:00Z")
+    lightest = log_weight(client, headers, user_id, 80.0, "2026-10-05T08:00:00Z")
+    log_weight(client, headers, user_id, 81.0, "2026-10-09T08:00:00Z")
+    stats = get_stats(client, headers)
+    assert (stats["min_weight"], stats["max_weight"], stats["current_weight"]) == (80.0, 82.0, 81.0)
+
+    # Deleting the minimum cannot be applied incrementally and forces a rebuild
+    assert client.delete(f"/api/v1/weight/log/{lightest}", headers=headers).json() is True
+    stats = get_stats(client, headers)
+    assert (stats["min_weight"], stats["max_weight"]) == (81.0, 82.0)
+    assert len(stats["weight_logs"]) == 2
+
+
+def test_missing_stats_record_is_rebuilt_from_logs(client):
+    user_id, headers = register_user(client)
+    log_weight(client, headers, user_id, 82.0, "2026-10-01T08:00:00Z")
+    log_weight(client, headers, user_id, 79.5, "2026-10-05T08:00:00Z")
+    storage.get_client().collection(STATS).document(user_id).delete()
+
+    log_weight(client, headers, user_id, 80.5, "2026-10-09T08:00:00Z")
+    stats = get_stats(client, headers)
+    assert (stats["min_weight"], stats["max_weight"], stats["current_weight"]) == (79.5, 82.0, 80.5)
+    assert len(stats["weight_logs"]) == 3